@@ -1,17 +1,33 @@
 """Command Line Interface"""
 
 from datetime import datetime, UTC
+from pathlib import Path
+import subprocess
 from typing_extensions import Annotated
 
 import typer
 
 from cli import forecast, emaps, scenarios
+from src.config.squirrel_conf import Config
 from src.errors.scheduling import (
     NoSuitableNodeException,
     NoWindowAllocatedException,
     JobTooLongException,
+    ScheduleConflictException,
+)
+from src.data.timetable import read_schedule
+from src.sched.timetable import Timetable
+from src.submit import interruptible as executor
+from src.submit import workflow
+from src.submit.replan import replace_failed_nodes, replan_jobs
+from src.submit.sbatch import (
+    STRATEGIES,
+    plan_sbatch,
+    precompute_placements,
+    submit_sbatch,
+    simulate_submit_sbatch,
+    update_runtime_history,
 )
-from src.submit.sbatch import submit_sbatch, simulate_submit_sbatch
 
 app = typer.Typer()
 
@@ -42,8 +58,8 @@ def submit(
         typer.Argument(help="""Other sbatch commands, e.g. "--priority=<value>"."""),
     ],
     runtime: Annotated[
-        int,
-        typer.Argument(help="Reserved amount of time (hours), e.g. '1'."),
+        float,
+        typer.Argument(help="Reserved amount of time (hours), e.g. '1' or '0.25'."),
     ],
     partition: Annotated[
         str,
@@ -53,6 +69,50 @@ def submit(
         str,
         typer.Option(help="Request one or more GPUs. Use this form: [type:]number."),
     ] = None,
+    begin_after: Annotated[
+        str,
+        typer.Option(help="Earliest start as ISO format date string (default: UTC)."),
+    ] = None,
+    deadline: Annotated[
+        str,
+        typer.Option(help="Latest end as ISO format date string (default: UTC)."),
+    ] = None,
+    shared: Annotated[
+        bool,
+        typer.Option(help="Share nodes with other jobs instead of exclusive use."),
+    ] = False,
+    cpus: Annotated[
+        int,
+        typer.Option(help="Amount of CPUs to reserve in shared mode."),
+    ] = None,
+    mem: Annotated[
+        int,
+        typer.Option(help="Amount of memory (MB) to reserve in shared mode."),
+    ] = None,
+    interruptible: Annotated[
+        bool,
+        typer.Option(
+            help="Run the job in the cheapest hours, suspending it in between."
+        ),
+    ] = False,
+    nodes: Annotated[
+        int,
+        typer.Option(help="Amount of nodes which the job needs at the same time."),
+    ] = 1,
+    power_profile: Annotated[
+        str,
+        typer.Option(
+            help="Comma separated power draw (W) for each hour, e.g. '113.15,7.87'."
+        ),
+    ] = None,
+    multisite: Annotated[
+        bool,
+        typer.Option(help="Place the job on the cheapest of the configured sites."),
+    ] = False,
+    max_delay: Annotated[
+        float,
+        typer.Option(help="Start the job at most this amount of hours from now."),
+    ] = None,
 ):
     """Submit an sbatch job."""
     # Parse arguments
@@ -75,11 +135,29 @@ def submit(
             raise typer.Exit(code=1)
     # Schedule batch job
     try:
-        submit_sbatch(command, runtime, partitions, num_gpus, gpu_name)
+        submit_sbatch(
+            command,
+            runtime,
+            partitions,
+            num_gpus,
+            gpu_name,
+            begin_after=_parse_date(begin_after),
+            deadline=_parse_date(deadline),
+            shared=shared,
+            num_cpus=cpus,
+            memory=mem,
+            interruptible=interruptible,
+            num_nodes=nodes,
+            power_profile=_parse_profile(power_profile),
+            multisite=multisite,
+            max_delay=max_delay,
+        )
     except (
         NoWindowAllocatedException,
         NoSuitableNodeException,
         JobTooLongException,
+        ScheduleConflictException,
+        ValueError,
     ) as e:
         print(e)
         raise typer.Exit(1)
@@ -93,8 +171,8 @@ def simulate_submit(
         typer.Argument(help="""Other sbatch commands, e.g. "--priority=<value>"."""),
     ],
     runtime: Annotated[
-        int,
-        typer.Argument(help="Reserved amount of time (hours), e.g. '1'."),
+        float,
+        typer.Argument(help="Reserved amount of time (hours), e.g. '1' or '0.25'."),
     ],
     partition: Annotated[
         str,
@@ -104,6 +182,46 @@ def simulate_submit(
         str,
         typer.Option(help="Request one or more GPUs. Use this form: [type:]number."),
     ] = None,
+    begin_after: Annotated[
+        str,
+        typer.Option(help="Earliest start as ISO format date string (default: UTC)."),
+    ] = None,
+    deadline: Annotated[
+        str,
+        typer.Option(help="Latest end as ISO format date string (default: UTC)."),
+    ] = None,
+    shared: Annotated[
+        bool,
+        typer.Option(help="Share nodes with other jobs instead of exclusive use."),
+    ] = False,
+    cpus: Annotated[
+        int,
+        typer.Option(help="Amount of CPUs to reserve in shared mode."),
+    ] = None,
+    mem: Annotated[
+        int,
+        typer.Option(help="Amount of memory (MB) to reserve in shared mode."),
+    ] = None,
+    interruptible: Annotated[
+        bool,
+        typer.Option(
+            help="Run the job in the cheapest hours, suspending it in between."
+        ),
+    ] = False,
+    nodes: Annotated[
+        int,
+        typer.Option(help="Amount of nodes which the job needs at the same time."),
+    ] = 1,
+    power_profile: Annotated[
+        str,
+        typer.Option(
+            help="Comma separated power draw (W) for each hour, e.g. '113.15,7.87'."
+        ),
+    ] = None,
+    max_delay: Annotated[
+        float,
+        typer.Option(help="Start the job at most this amount of hours from now."),
+    ] = None,
     submit_date: Annotated[
         str,
         typer.Option(help="Submit date of the simulation."),
@@ -137,13 +255,362 @@ def simulate_submit(
     # Submit batch job
     try:
         simulate_submit_sbatch(
-            command, runtime, submit_date, partitions, num_gpus, gpu_name
+            command,
+            runtime,
+            submit_date,
+            partitions,
+            num_gpus,
+            gpu_name,
+            begin_after=_parse_date(begin_after),
+            deadline=_parse_date(deadline),
+            shared=shared,
+            num_cpus=cpus,
+            memory=mem,
+            interruptible=interruptible,
+            num_nodes=nodes,
+            power_profile=_parse_profile(power_profile),
+            max_delay=max_delay,
         )
     except (
         NoWindowAllocatedException,
         NoSuitableNodeException,
         JobTooLongException,
+        ScheduleConflictException,
+        ValueError,
     ) as e:
         print(e)
         raise typer.Exit(1)
     raise typer.Exit()
+
+
+@app.command(rich_help_panel="Squirrel")
+def plan(
+    runtime: Annotated[
+        float,
+        typer.Argument(help="Reserved amount of time (hours), e.g. '1' or '0.25'."),
+    ],
+    partition: Annotated[
+        str,
+        typer.Option(help="Comma separated list of partitions, e.g. 'gpu,cpu'."),
+    ] = None,
+    gpus_per_node: Annotated[
+        str,
+        typer.Option(help="Request one or more GPUs. Use this form: [type:]number."),
+    ] = None,
+    top: Annotated[
+        int,
+        typer.Option(help="Amount of placements to show."),
+    ] = 3,
+    strategy: Annotated[
+        str,
+        typer.Option(help=f"Planning strategy, one of {', '.join(STRATEGIES)}."),
+    ] = None,
+    begin_after: Annotated[
+        str,
+        typer.Option(help="Earliest start as ISO format date string (default: UTC)."),
+    ] = None,
+    deadline: Annotated[
+        str,
+        typer.Option(help="Latest end as ISO format date string (default: UTC)."),
+    ] = None,
+    shared: Annotated[
+        bool,
+        typer.Option(help="Share nodes with other jobs instead of exclusive use."),
+    ] = False,
+    cpus: Annotated[
+        int,
+        typer.Option(help="Amount of CPUs to reserve in shared mode."),
+    ] = None,
+    mem: Annotated[
+        int,
+        typer.Option(help="Amount of memory (MB) to reserve in shared mode."),
+    ] = None,
+    interruptible: Annotated[
+        bool,
+        typer.Option(
+            help="Run the job in the cheapest hours, suspending it in between."
+        ),
+    ] = False,
+    nodes: Annotated[
+        int,
+        typer.Option(help="Amount of nodes which the job needs at the same time."),
+    ] = 1,
+    power_profile: Annotated[
+        str,
+        typer.Option(
+            help="Comma separated power draw (W) for each hour, e.g. '113.15,7.87'."
+        ),
+    ] = None,
+    max_delay: Annotated[
+        float,
+        typer.Option(help="Start the job at most this amount of hours from now."),
+    ] = None,
+    pareto: Annotated[
+        bool,
+        typer.Option(
+            help="Show all placements on the Pareto frontier of delay and CO2."
+        ),
+    ] = False,
+    submit_date: Annotated[
+        str,
+        typer.Option(help="Submit date of the preview."),
+    ] = None,
+):
+    """Preview the best placements of a job without submitting it."""
+    partitions = partition.split(",") if partition is not None else None
+    num_gpus = None
+    gpu_name = None
+    if gpus_per_node:
+        gpu_options = gpus_per_node.split(":")
+        if len(gpu_options) == 2:
+            gpu_name = gpu_options[0]
+            num_gpus = int(gpu_options[1])
+        elif len(gpu_options) == 1:
+            try:
+                num_gpus = int(gpu_options[0])
+            except ValueError as _:
+                print("GPU options should be given in this format: [type:]number")
+                raise typer.Exit(1)
+        else:
+            print("GPU options should be given in this format: [type:]number")
+            raise typer.Exit(code=1)
+    if strategy is not None and strategy not in STRATEGIES:
+        print(f"Unknown strategy {strategy}. Use one of {', '.join(STRATEGIES)}.")
+        raise typer.Exit(1)
+    submit_date = (
+        datetime.fromisoformat(submit_date)
+        if submit_date is not None
+        else datetime.now(tz=UTC)
+    )
+    try:
+        candidates = plan_sbatch(
+            runtime,
+            submit_date,
+            partitions,
+            num_gpus,
+            gpu_name,
+            k=top,
+            strategy=strategy,
+            begin_after=_parse_date(begin_after),
+            deadline=_parse_date(deadline),
+            shared=shared,
+            num_cpus=cpus,
+            memory=mem,
+            interruptible=interruptible,
+            num_nodes=nodes,
+            power_profile=_parse_profile(power_profile),
+            max_delay=max_delay,
+            pareto=pareto,
+        )
+    except (
+        NoWindowAllocatedException,
+        NoSuitableNodeException,
+        JobTooLongException,
+        ValueError,
+    ) as e:
+        print(e)
+        raise typer.Exit(1)
+    if len(candidates) == 0:
+        print("There is no feasible placement.")
+        raise typer.Exit(1)
+    # Compare against the earliest start
+    baseline = min(candidates, key=lambda candidate: candidate["start"])["footprint"]
+    for candidate in candidates:
+        hours = (candidate["start"] - submit_date).total_seconds() / 3600
+        change = ""
+        if 0 < baseline < float("inf"):
+            change = f" ({(candidate['footprint'] / baseline - 1) * 100:+.0f} % CO2)"
+        print(
+            f"Start in {max(hours, 0):.1f} h on {candidate['node']}: "
+            f"{candidate['footprint']:.1f} gCO2e{change}"
+        )
+    raise typer.Exit()
+
+
+@app.command(name="precompute-placements", rich_help_panel="Squirrel")
+def precompute(
+    submit_date: Annotated[
+        str,
+        typer.Option(help="Date for which placements are computed."),
+    ] = None,
+):
+    """Precompute placements of common job shapes.
+    Run it after the schedule or the forecast changed.
+    """
+    submit_date = (
+        datetime.fromisoformat(submit_date)
+        if submit_date is not None
+        else datetime.now(tz=UTC)
+    )
+    try:
+        placements = precompute_placements(submit_date)
+    except ValueError as e:
+        print(e)
+        raise typer.Exit(1)
+    print(f"Cached placements of {len(placements)} job shapes.")
+    raise typer.Exit()
+
+
+@app.command(name="update-runtimes", rich_help_panel="Squirrel")
+def update_runtimes():
+    """Update the runtime history from the Slurm accounting.
+    Run it regularly, if submissions do not refresh the history.
+    """
+    try:
+        amount = update_runtime_history()
+    except (ValueError, OSError, subprocess.CalledProcessError) as e:
+        print(e)
+        raise typer.Exit(1)
+    print(f"Added {amount} completed jobs to the runtime history.")
+    raise typer.Exit()
+
+
+@app.command(rich_help_panel="Squirrel")
+def replan(
+    threshold: Annotated[
+        float,
+        typer.Option(help="Relative change of a job's window cost to re-plan it."),
+    ] = 0.1,
+    dry_run: Annotated[
+        bool,
+        typer.Option(help="Show the moves without changing Slurm or the schedule."),
+    ] = False,
+):
+    """Move pending jobs to cheaper windows with the latest forecast.
+    Run it after the forecast was updated.
+    """
+    try:
+        moves = replan_jobs(threshold=threshold, dry_run=dry_run)
+    except ValueError as e:
+        print(e)
+        raise typer.Exit(1)
+    for job_id, start in moves.items():
+        print(f"Move job {job_id} to {start.isoformat()}.")
+    print(f"Moved {len(moves)} jobs.")
+    raise typer.Exit()
+
+
+@app.command(name="replace-nodes", rich_help_panel="Squirrel")
+def replace_nodes(
+    nodes: Annotated[
+        str,
+        typer.Option(
+            help="Comma separated list of failed nodes. "
+            "By default, nodes which are down or drained in Slurm."
+        ),
+    ] = None,
+    dry_run: Annotated[
+        bool,
+        typer.Option(help="Show the moves without changing Slurm or the schedule."),
+    ] = False,
+):
+    """Move pending jobs away from nodes which are down or drained."""
+    try:
+        placements = replace_failed_nodes(
+            nodes=nodes.split(",") if nodes else None, dry_run=dry_run
+        )
+    except ValueError as e:
+        print(e)
+        raise typer.Exit(1)
+    for job_id, placement in placements.items():
+        if placement is None:
+            print(
+                f"Job {job_id} does not fit on other nodes and keeps its reservation."
+            )
+        else:
+            print(f"Move job {job_id} to {placement[1]} at {placement[0].isoformat()}.")
+    print(f"Moved {sum(p is not None for p in placements.values())} jobs.")
+    raise typer.Exit()
+
+
+@app.command(rich_help_panel="Squirrel")
+def submit_workflow(
+    path: Annotated[
+        str,
+        typer.Argument(help="Path to the workflow file (JSON or YAML)."),
+    ],
+):
+    """Submit a workflow of dependent sbatch jobs."""
+    try:
+        workflow.submit_workflow(Path(path))
+    except (
+        NoWindowAllocatedException,
+        NoSuitableNodeException,
+        JobTooLongException,
+        ScheduleConflictException,
+        ValueError,
+    ) as e:
+        print(e)
+        raise typer.Exit(1)
+    raise typer.Exit()
+
+
+@app.command(rich_help_panel="Simulation")
+def simulate_submit_workflow(
+    path: Annotated[
+        str,
+        typer.Argument(help="Path to the workflow file (JSON or YAML)."),
+    ],
+    submit_date: Annotated[
+        str,
+        typer.Option(help="Submit date of the simulation."),
+    ] = None,
+):
+    """Simulate submitting a workflow of dependent sbatch jobs."""
+    submit_date = (
+        datetime.fromisoformat(submit_date)
+        if submit_date is not None
+        else datetime.now(tz=UTC)
+    )
+    try:
+        workflow.simulate_submit_workflow(Path(path), submit_date)
+    except (
+        NoWindowAllocatedException,
+        NoSuitableNodeException,
+        JobTooLongException,
+        ScheduleConflictException,
+        ValueError,
+    ) as e:
+        print(e)
+        raise typer.Exit(1)
+    raise typer.Exit()
+
+
+@app.command(rich_help_panel="Squirrel")
+def run_interruptible(
+    job_id: Annotated[
+        str,
+        typer.Argument(help="Slurm job ID of a job submitted with --interruptible."),
+    ],
+):
+    """Suspend and resume an interruptible job according to the schedule."""
+    timetable = Timetable()
+    read_schedule(timetable, Config.get_local_paths()["schedule"])
+    intervals = executor.get_run_intervals(timetable=timetable, job_id=job_id)
+    if len(intervals) == 0:
+        print(f"There is no reservation for job {job_id}.")
+        raise typer.Exit(1)
+    executor.run_interruptible(slurm_job_id=job_id, intervals=intervals)
+    raise typer.Exit()
+
+
+def _parse_profile(profile: str | None) -> list[float] | None:
+    """Parse comma separated power profile."""
+    if profile is None:
+        return None
+    return [float(watts) for watts in profile.split(",")]
+
+
+def _parse_date(datestr: str | None) -> datetime | None:
+    """Parse ISO format date string. Dates without timezone are UTC."""
+    if datestr is None:
+        return None
+    try:
+        date = datetime.fromisoformat(datestr)
+    except ValueError as e:
+        raise typer.BadParameter(
+            f"'{datestr}' is not a date in ISO format, e.g. 2024-01-01T12:00."
+        ) from e
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=UTC)
+    return date
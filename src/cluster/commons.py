@@ -5,9 +5,12 @@ DOI: 10.1016/j.adhoc.2014.11.012
 https://github.com/goiri/greenslot/blob/master/gslurmcommons.py
 """
 
+from datetime import datetime
+from itertools import groupby
 from json import loads
 from pathlib import Path
-from subprocess import call, PIPE, check_output
+import re
+from subprocess import call, PIPE, check_output, run
 from typing import Any
 
 from src.config.cluster_info import NodesMeta
@@ -27,6 +30,104 @@ def sbatch(suffix: str) -> str:
     return out
 
 
+def parse_job_id(sbatch_output: str) -> str | None:
+    """Get the job ID from the output of sbatch, e.g. 'Submitted batch job 42'."""
+    for word in reversed(sbatch_output.split()):
+        if word.isdigit():
+            return word
+    return None
+
+
+def to_hostlist(node_names: list[str]) -> str:
+    """Compress node names into a Slurm hostlist expression,
+    e.g. ['gx01', 'gx02', 'gx03', 'cx16'] becomes 'cx16,gx[01-03]'.
+    """
+    parsed = []
+    for name in node_names:
+        match = re.fullmatch(r"(.*?)(\d+)", name)
+        if match:
+            parsed.append((match.group(1), len(match.group(2)), int(match.group(2))))
+        else:
+            parsed.append((name, 0, None))
+    expressions = []
+    for (prefix, width), group in groupby(sorted(set(parsed)), key=lambda x: x[:2]):
+        numbers = [number for _, _, number in group]
+        if width == 0:
+            expressions.append(prefix)
+            continue
+        ranges = []
+        for _, pairs in groupby(enumerate(numbers), key=lambda x: x[1] - x[0]):
+            consecutive = [number for _, number in pairs]
+            ranges.append(
+                f"{consecutive[0]:0{width}d}"
+                if len(consecutive) == 1
+                else f"{consecutive[0]:0{width}d}-{consecutive[-1]:0{width}d}"
+            )
+        if len(ranges) == 1 and "-" not in ranges[0]:
+            expressions.append(f"{prefix}{ranges[0]}")
+        else:
+            expressions.append(f"{prefix}[{','.join(ranges)}]")
+    return ",".join(expressions)
+
+
+def sacct(start: datetime) -> list[dict[str, Any]]:
+    """Get completed jobs which ended after `start` from the accounting.
+
+    Returns the job ID, user, job name, time limit and elapsed time (seconds)
+    and the end of each job. Jobs without a time limit are skipped.
+    """
+    # sacct reads times without a zone as local time
+    local_start = start.astimezone()
+    cmd = [
+        "sacct",
+        "--allusers",
+        "--allocations",
+        "--noheader",
+        "--parsable2",
+        "--state=COMPLETED",
+        f"--starttime={local_start.strftime('%Y-%m-%dT%H:%M:%S')}",
+        "--format=JobID,User,JobName,Timelimit,Elapsed,End",
+    ]
+    return parse_sacct(check_output(cmd).decode())
+
+
+def parse_sacct(sacct_output: str) -> list[dict[str, Any]]:
+    """Parse the output of `sacct --parsable2 --noheader`
+    with the format JobID,User,JobName,Timelimit,Elapsed,End.
+    """
+    records = []
+    for line in sacct_output.splitlines():
+        fields = line.split("|")
+        if len(fields) != 6:
+            continue
+        job_id, user, name, timelimit, elapsed, end = fields
+        timelimit, elapsed = parse_duration(timelimit), parse_duration(elapsed)
+        if timelimit is None or elapsed is None:
+            continue
+        records.append(
+            {
+                "job_id": job_id,
+                "user": user,
+                "name": name,
+                "timelimit": timelimit,
+                "elapsed": elapsed,
+                "end": end,
+            }
+        )
+    return records
+
+
+def parse_duration(duration: str) -> int | None:
+    """Parse a Slurm duration of the form [days-]hours:minutes:seconds
+    into seconds. Returns None for other values, e.g. 'UNLIMITED'.
+    """
+    match = re.fullmatch(r"(?:(\d+)-)?(\d+):(\d{2}):(\d{2})", duration.strip())
+    if match is None:
+        return None
+    days, hours, minutes, seconds = (int(group or 0) for group in match.groups())
+    return ((days * 24 + hours) * 60 + minutes) * 60 + seconds
+
+
 def read_sinfo(path_to_json: Path | None = None) -> dict:
     """Parses the output of 'scontrol show node --json'."""
     if path_to_json is None:
@@ -65,6 +166,54 @@ def get_gpu_tdp(node_name: str, meta_info: NodesMeta) -> int | None:
     return meta_info.get_gpu_tdp(node=node_name)
 
 
+def get_speed(node_name: str, meta_info: NodesMeta) -> float:
+    """Get the speed factor of a node, e.g. 1.4 if it runs jobs
+    in 1 / 1.4 of the time of a reference node.
+
+    If no speed was provided, returns 1.0.
+    """
+    return meta_info.get_speed(node=node_name)
+
+
+def get_gpu_count(gres: str) -> int:
+    """Get the amount of GPUs from a generic resource string,
+    e.g. 'gpu:a100:2(S:0-1)'.
+    """
+    amount = 0
+    for gres_item in gres.split(","):
+        gres_fields = gres_item.split(":")
+        if gres_fields[0] == "gpu" and len(gres_fields) > 2:
+            amount += int(gres_fields[2].split("(")[0])
+    return amount
+
+
+def get_node_resources(node: dict[str, Any]) -> dict[str, int]:
+    """Get the capacity of a node: CPUs, memory (MB) and GPUs."""
+    return {
+        "cpus": node["cpus"],
+        "memory": node["real_memory"],
+        "gpus": get_gpu_count(node["gres"]),
+    }
+
+
+# Node states in which no jobs start on a node
+UNAVAILABLE_STATES = {"DOWN", "DRAIN", "FAIL"}
+
+
+def is_available(node: dict[str, Any]) -> bool:
+    """Check if jobs can start on a node, i.e. it is not down or drained."""
+    return UNAVAILABLE_STATES.isdisjoint(node.get("state", []))
+
+
+def get_unavailable_nodes(path_to_json: Path | None = None) -> list[str]:
+    """Get the names of all nodes which are down or drained."""
+    return [
+        node["name"]
+        for node in get_nodes(path_to_json=path_to_json)
+        if not is_available(node)
+    ]
+
+
 def get_partitions(path_to_json: Path | None = None) -> dict[str, dict[str, Any]]:
     """Get nodes for every partition."""
     part_dict = {}
@@ -128,3 +277,21 @@ def cancel_job(job_id: str) -> int:
         int: Return code of scancel.
     """
     return call(["scancel", job_id], stderr=PIPE)
+
+
+def update_jobs(updates: list[str]) -> int:
+    """Update several jobs in a single scontrol process.
+
+    Args:
+        updates (list[str]): Arguments of `scontrol update` for each job,
+            e.g. 'JobId=42 StartTime=now+3600'.
+
+    Returns:
+        int: Return code of scontrol.
+    """
+    if len(updates) == 0:
+        return 0
+    commands = "".join(f"update {update}\n" for update in updates)
+    return run(
+        ["scontrol"], input=commands + "quit\n", text=True, stderr=PIPE
+    ).returncode
@@ -30,6 +30,24 @@ class NodesMeta(IniConfig):
         except ValueError:
             return None
 
+    def get_speed(self, node: str) -> float:
+        """Get the speed factor of a node relative to a reference node (1.0).
+        It is read from the node or from its class in a [classes.<name>] section.
+        """
+        if not self._check_node_section(node=node):
+            return 1.0
+        section = f"nodes.{node}"
+        if not self.conf.has_option(section, "speed"):
+            node_class = self.conf.get(section, "class", fallback=None)
+            section = f"classes.{node_class}"
+            if node_class is None or not self.conf.has_option(section, "speed"):
+                return 1.0
+        try:
+            speed = float(self.conf.get(section, "speed"))
+        except ValueError:
+            return 1.0
+        return speed if speed > 0 else 1.0
+
     def _check_node_section(self, node: str) -> None:
         return self.conf.has_section(f"nodes.{node}")
 
@@ -43,6 +43,72 @@ class SquirrelConfig(IniConfig):
         }
         return c_dict
 
+    def get_sites(self) -> list[dict]:
+        """Get all sites for multi-site scheduling.
+        Each site is a cluster in an energy zone with its own schedule.
+        """
+        sites = []
+        for section in self.conf.sections():
+            if not section.startswith("site."):
+                continue
+            site_dict = self.conf[section]
+            sites.append(
+                {
+                    "name": section.removeprefix("site."),
+                    "zone": site_dict["zone"],
+                    "cluster_json": Path(site_dict["cluster_json"]),
+                    "schedule": Path(site_dict["schedule"]),
+                    "meta": Path(site_dict["meta"]) if "meta" in site_dict else None,
+                }
+            )
+        return sites
+
+    def get_placement_cache(self) -> dict | None:
+        """Get the path and job shapes of the placement cache.
+        Returns None if there is no [cache] section.
+        """
+        if not self.conf.has_section("cache"):
+            return None
+        cache_dict = self.conf["cache"]
+        shapes = [
+            {
+                "hours": int(hours),
+                "partitions": [partition],
+                "num_gpus": int(gpus) or None,
+            }
+            for partition in cache_dict["partitions"].split(",")
+            for hours in cache_dict["hours"].split(",")
+            for gpus in cache_dict.get("gpus", "0").split(",")
+        ]
+        return {"path": Path(cache_dict["path"]), "shapes": shapes}
+
+    def get_runtime_prediction(self) -> dict | None:
+        """Get the options of the runtime prediction.
+        Returns None if there is no [runtime] section.
+        """
+        if not self.conf.has_section("runtime"):
+            return None
+        return {
+            "path": Path(self.conf.get("runtime", "path")),
+            "quantile": self.conf.getfloat("runtime", "quantile", fallback=0.9),
+            "margin": self.conf.getfloat("runtime", "margin", fallback=0.2),
+            "min_samples": self.conf.getint("runtime", "min_samples", fallback=3),
+            "refresh_minutes": self.conf.getint(
+                "runtime", "refresh_minutes", fallback=60
+            ),
+        }
+
+    def get_power_cap(self) -> float | None:
+        """Get the facility power cap in W.
+        Returns None if there is no power cap.
+        """
+        power_cap = self.conf.getfloat("facility", "power_cap", fallback=0)
+        return power_cap if power_cap > 0 else None
+
+    def use_best_fit(self) -> bool:
+        """Check if shared jobs are packed onto the nodes they fill best."""
+        return self.conf.getboolean("facility", "best_fit", fallback=False)
+
     def use_builtin_forecast(self) -> bool:
         """Check if forecast should be used built-in or should be fetched."""
         return self.conf.getboolean("forecast", "use_builtin")
@@ -51,6 +117,31 @@ class SquirrelConfig(IniConfig):
         """Get amount of days for the forecast."""
         return int(self.conf.get("forecast", "forecast_days"))
 
+    def get_max_horizon_days(self) -> int:
+        """Get amount of days up to which the scheduling range
+        is extended for long jobs. Defaults to the forecast days.
+        """
+        return self.conf.getint(
+            "forecast", "max_horizon_days", fallback=self.get_forecast_days()
+        )
+
+    def get_block_hours(self) -> int | None:
+        """Get size of blocks for the coarse-to-fine window search.
+        Returns None if the search should not use blocks.
+        """
+        block_hours = self.conf.getint("forecast", "block_hours", fallback=0)
+        return block_hours if block_hours > 0 else None
+
+    def get_slot_minutes(self) -> int:
+        """Get the length of timeslots in minutes, e.g. 15, 30 or 60."""
+        return self.conf.getint("forecast", "slot_minutes", fallback=60)
+
+    def get_journal_kib(self) -> int:
+        """Get the size (KiB) from which the journal is compacted into
+        the schedule. With 0, the whole schedule is written every time.
+        """
+        return self.conf.getint("journal", "max_kib", fallback=256)
+
     def get_lookback_days(self) -> int:
         """Get amount of lookback days for the forecast."""
         return int(self.conf.get("forecast.builtin", "lookback_days"))
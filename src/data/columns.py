@@ -0,0 +1,339 @@
+"""Columnar storage of the schedule in typed, fixed-width numpy arrays."""
+
+from datetime import datetime, timedelta, UTC
+import json
+import os
+from pathlib import Path
+import shutil
+
+import numpy as np
+
+from src.sched.timeslot import ConstrainedTimeslot
+
+EPOCH = datetime(1970, 1, 1, tzinfo=UTC)
+
+# Placeholders for optional values of reservations
+NO_INT = -1
+NO_TIME = np.iinfo(np.int64).min
+
+# Reservation keys with a column of their own, all others are kept as JSON
+KNOWN_KEYS = {
+    "start",
+    "end",
+    "node",
+    "nodes",
+    "cpus",
+    "memory",
+    "gpu_ids",
+    "power",
+    "begin_after",
+    "deadline",
+    "hours",
+    "partitions",
+    "num_gpus",
+    "gpu_name",
+}
+
+
+def to_columns(timeslots: list[ConstrainedTimeslot]) -> dict[str, np.ndarray]:
+    """Encode timeslots and their reservations as columns.
+
+    Slots are rows of `slot_*` columns. Reservations are rows of `res_*`
+    columns, ordered by slot: the reservations of slot i are the rows
+    `slot_offset[i]` to `slot_offset[i + 1]`. Times are microseconds since
+    the epoch, lists are comma separated strings.
+    """
+    rows = [
+        (job_id, res_id, timeslot.reserved_resources[res_id])
+        for timeslot in timeslots
+        for job_id, res_id in timeslot.jobs.items()
+    ]
+    reservations = [row[2] for row in rows]
+    return {
+        "slot_start": np.array(
+            [to_micros(ts.start) for ts in timeslots], dtype=np.int64
+        ),
+        "slot_end": np.array([to_micros(ts.end) for ts in timeslots], dtype=np.int64),
+        "slot_gci": np.array([ts.gci for ts in timeslots], dtype=float),
+        "slot_estimated": np.array([ts.estimated for ts in timeslots], dtype=bool),
+        "slot_offset": np.concatenate(
+            ([0], np.cumsum([len(ts.jobs) for ts in timeslots], dtype=np.int64))
+        ),
+        "res_job": _strings([row[0] for row in rows]),
+        "res_id": _strings([row[1] for row in rows]),
+        "res_start": _times(reservations, "start"),
+        "res_end": _times(reservations, "end"),
+        "res_multi": np.array([("nodes" in r) for r in reservations], dtype=bool),
+        "res_nodes": _strings(
+            [",".join(r.get("nodes", [r.get("node")])) for r in reservations]
+        ),
+        "res_shared": np.array([("cpus" in r) for r in reservations], dtype=bool),
+        "res_cpus": _ints(reservations, "cpus"),
+        "res_memory": _ints(reservations, "memory"),
+        "res_gpu_ids": _strings(
+            [",".join(str(i) for i in r.get("gpu_ids", [])) for r in reservations]
+        ),
+        "res_power": np.array([r.get("power", np.nan) for r in reservations]),
+        "res_begin_after": _times(reservations, "begin_after"),
+        "res_deadline": _times(reservations, "deadline"),
+        "res_hours": np.array([r.get("hours", np.nan) for r in reservations]),
+        "res_partitions": _strings(
+            [",".join(r.get("partitions", [])) for r in reservations]
+        ),
+        "res_num_gpus": _ints(reservations, "num_gpus"),
+        "res_gpu_name": _strings([r.get("gpu_name", "") for r in reservations]),
+        "res_extra": _strings(
+            [
+                (
+                    json.dumps({k: v for k, v in r.items() if k not in KNOWN_KEYS})
+                    if r.keys() - KNOWN_KEYS
+                    else ""
+                )
+                for r in reservations
+            ]
+        ),
+    }
+
+
+def from_columns(
+    columns: dict[str, np.ndarray], first: int = 0, last: int | None = None
+) -> list[ConstrainedTimeslot]:
+    """Decode the timeslots `first` to `last` (exclusive) from columns.
+    Only the reservations of these timeslots are read.
+    """
+    if last is None:
+        last = len(columns["slot_start"])
+    offsets = np.asarray(columns["slot_offset"][first : last + 1])
+    if len(offsets) == 0:
+        return []
+    rows = slice(int(offsets[0]), int(offsets[-1]))
+    reservations = _reservations(
+        {
+            key: np.asarray(value[rows])
+            for key, value in columns.items()
+            if key.startswith("res_")
+        }
+    )
+    job_ids = np.asarray(columns["res_job"][rows]).tolist()
+    res_ids = np.asarray(columns["res_id"][rows]).tolist()
+    bounds = (offsets - offsets[0]).tolist()
+    # Schedules of earlier versions have no estimated timeslots
+    estimated = columns.get("slot_estimated")
+    if estimated is None:
+        estimated = np.zeros(len(columns["slot_start"]), dtype=bool)
+    timeslots = []
+    for index, (start, end, gci, is_estimated) in enumerate(
+        zip(
+            np.asarray(columns["slot_start"][first:last]).tolist(),
+            np.asarray(columns["slot_end"][first:last]).tolist(),
+            np.asarray(columns["slot_gci"][first:last]).tolist(),
+            np.asarray(estimated[first:last]).tolist(),
+        )
+    ):
+        slot_rows = slice(bounds[index], bounds[index + 1])
+        timeslots.append(
+            ConstrainedTimeslot(
+                start=from_micros(start),
+                end=from_micros(end),
+                gci=gci,
+                jobs=dict(zip(job_ids[slot_rows], res_ids[slot_rows])),
+                reserved_resources=dict(
+                    zip(res_ids[slot_rows], reservations[slot_rows])
+                ),
+                estimated=is_estimated,
+            )
+        )
+    return timeslots
+
+
+def write_npz(
+    timeslots: list[ConstrainedTimeslot], path: Path, snapshot_id: str = ""
+) -> None:
+    """Write timeslots to an uncompressed .npz file.
+    The optional `snapshot_id` identifies this version of the file.
+    """
+    # Write to a file object, numpy would append .npz to other suffixes
+    with open(path, "wb") as file:
+        np.savez(file, snapshot_id=np.array(snapshot_id), **to_columns(timeslots))
+
+
+def read_npz(path: Path) -> list[ConstrainedTimeslot]:
+    """Read timeslots from an .npz file."""
+    with np.load(path, allow_pickle=False) as data:
+        return from_columns(
+            {key: data[key] for key in data.files if key != "snapshot_id"}
+        )
+
+
+def read_snapshot_id(path: Path) -> str:
+    """Read the ID of the version of an .npz file."""
+    with np.load(path, allow_pickle=False) as data:
+        return str(data["snapshot_id"]) if "snapshot_id" in data.files else ""
+
+
+def write_columns(
+    timeslots: list[ConstrainedTimeslot], directory: Path, snapshot_id: str
+) -> None:
+    """Write timeslots as one .npy file per column, which can be memory-mapped.
+
+    Each version is written to a subdirectory named by `snapshot_id`. The
+    file CURRENT names the latest one and is replaced atomically. The
+    previous version is kept for readers which just read CURRENT, older
+    ones are removed.
+    """
+    previous = read_columns_snapshot_id(directory)
+    snapshot = directory / snapshot_id
+    snapshot.mkdir(parents=True)
+    for key, column in to_columns(timeslots).items():
+        with open(snapshot / f"{key}.npy", "wb") as file:
+            np.save(file, column, allow_pickle=False)
+            file.flush()
+            os.fsync(file.fileno())
+    # The snapshot is on disk before CURRENT can name it
+    _fsync_directory(snapshot)
+    tmp_path = directory / "CURRENT.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        file.write(snapshot_id)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, directory / "CURRENT")
+    _fsync_directory(directory)
+    for path in directory.iterdir():
+        if path.is_dir() and path.name not in [snapshot_id, previous]:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def read_columns(
+    directory: Path, since: datetime | None = None, until: datetime | None = None
+) -> list[ConstrainedTimeslot]:
+    """Read the timeslots which end after `since` and start before `until`.
+
+    The columns are memory-mapped, and the range is found by binary search
+    over the slot times. Only the pages of this range are read from disk.
+    """
+    snapshot = directory / read_columns_snapshot_id(directory)
+    columns = {
+        path.stem: np.load(path, mmap_mode="r", allow_pickle=False)
+        for path in snapshot.glob("*.npy")
+    }
+    first, last = 0, len(columns["slot_start"])
+    if since is not None:
+        first = int(np.searchsorted(columns["slot_end"], to_micros(since), "right"))
+    if until is not None:
+        last = int(np.searchsorted(columns["slot_start"], to_micros(until), "left"))
+    return from_columns(columns, first, max(first, last))
+
+
+def read_columns_snapshot_id(directory: Path) -> str:
+    """Read the ID of the latest version of memory-mapped columns,
+    empty if there is none.
+    """
+    try:
+        return (directory / "CURRENT").read_text(encoding="utf-8")
+    except FileNotFoundError:
+        return ""
+
+
+def _reservations(res: dict[str, np.ndarray]) -> list[dict]:
+    """Decode reservations from columns. Optional keys are only
+    decoded for the rows which have them.
+    """
+    times = {}
+    # Reservations share few distinct times, which are formatted once each
+    for key in ["res_start", "res_end", "res_begin_after", "res_deadline"]:
+        unique, inverse = np.unique(res[key], return_inverse=True)
+        formatted = [
+            _isoformat(micros) if micros != NO_TIME else None
+            for micros in unique.tolist()
+        ]
+        times[key] = [formatted[i] for i in inverse.tolist()]
+    reservations = [
+        {"start": start, "end": end}
+        for start, end in zip(times["res_start"], times["res_end"])
+    ]
+    for reservation, multi, nodes in zip(
+        reservations, res["res_multi"].tolist(), res["res_nodes"].tolist()
+    ):
+        if multi:
+            reservation.update({"nodes": nodes.split(",")})
+        else:
+            reservation.update({"node": nodes})
+    shared = np.flatnonzero(res["res_shared"])
+    for row, cpus, memory, gpu_ids in zip(
+        shared.tolist(),
+        res["res_cpus"][shared].tolist(),
+        res["res_memory"][shared].tolist(),
+        res["res_gpu_ids"][shared].tolist(),
+    ):
+        reservations[row].update(
+            {
+                "cpus": cpus,
+                "memory": memory,
+                "gpu_ids": [int(i) for i in gpu_ids.split(",")] if gpu_ids else [],
+            }
+        )
+    decoders = {
+        "power": (lambda values: ~np.isnan(values), float),
+        "hours": (lambda values: ~np.isnan(values), float),
+        "begin_after": (lambda values: values != NO_TIME, None),
+        "deadline": (lambda values: values != NO_TIME, None),
+        "num_gpus": (lambda values: values != NO_INT, int),
+        "partitions": (lambda values: values != "", lambda value: value.split(",")),
+        "gpu_name": (lambda values: values != "", str),
+    }
+    for key, (present, decode) in decoders.items():
+        rows = np.flatnonzero(present(res[f"res_{key}"]))
+        if decode is None:
+            values = [times[f"res_{key}"][row] for row in rows.tolist()]
+        else:
+            values = [decode(value) for value in res[f"res_{key}"][rows].tolist()]
+        for row, value in zip(rows.tolist(), values):
+            reservations[row].update({key: value})
+    extra = np.flatnonzero(res["res_extra"] != "")
+    for row, value in zip(extra.tolist(), res["res_extra"][extra].tolist()):
+        reservations[row].update(json.loads(value))
+    return reservations
+
+
+def to_micros(date: datetime) -> int:
+    """Get the microseconds since the epoch."""
+    return (date - EPOCH) // timedelta(microseconds=1)
+
+
+def from_micros(micros: int) -> datetime:
+    """Get the time from microseconds since the epoch."""
+    return EPOCH + timedelta(microseconds=micros)
+
+
+def _isoformat(micros: int) -> str:
+    return from_micros(micros).isoformat()
+
+
+def _times(reservations: list[dict], key: str) -> np.ndarray:
+    # Reservations share few distinct times, which are parsed once each
+    parsed = {}
+    for reservation in reservations:
+        value = reservation.get(key)
+        if value is not None and value not in parsed:
+            parsed.update({value: to_micros(datetime.fromisoformat(value))})
+    return np.array(
+        [parsed.get(r.get(key), NO_TIME) for r in reservations], dtype=np.int64
+    )
+
+
+def _ints(reservations: list[dict], key: str) -> np.ndarray:
+    return np.array([r.get(key, NO_INT) for r in reservations], dtype=np.int64)
+
+
+def _strings(values: list[str]) -> np.ndarray:
+    """Fixed-width unicode array, which needs no pickling."""
+    return np.array(values, dtype=str) if values else np.empty(0, dtype="<U1")
+
+
+def _fsync_directory(directory: Path) -> None:
+    """Flush the entries of a directory to disk."""
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
@@ -0,0 +1,132 @@
+"""Append-only journal of schedule changes since the last snapshot."""
+
+from datetime import datetime
+import json
+import os
+from pathlib import Path
+from typing import Any
+
+from src.sched.timeslot import ConstrainedTimeslot
+from src.sched.timetable import Timetable
+
+
+def journal_path(schedule_path: Path) -> Path:
+    """Get the path of the journal which belongs to a schedule."""
+    return schedule_path.with_suffix(".journal")
+
+
+def append_records(path: Path, records: list[dict[str, Any]]) -> None:
+    """Append records as JSON lines and flush them to disk."""
+    if len(records) == 0:
+        return
+    with open(path, "a", encoding="utf-8") as file:
+        file.write("".join(json.dumps(record) + "\n" for record in records))
+        file.flush()
+        os.fsync(file.fileno())
+
+
+def slot_records(timetable: Timetable, since: datetime | None) -> list[dict[str, Any]]:
+    """Get a record of the timeslots which start at or after `since`."""
+    slots = [
+        [ts.start.isoformat(), ts.end.isoformat(), ts.gci, ts.estimated]
+        for ts in timetable.timeslots
+        if since is None or ts.start >= since
+    ]
+    if len(slots) == 0:
+        return []
+    return [{"op": "slots", "slots": slots}]
+
+
+def job_records(timetable: Timetable, job_ids: list[str]) -> list[dict[str, Any]]:
+    """Get a record of the current reservations of each job.
+    Jobs without reservations are cancelled.
+    """
+    slots = {job_id: [] for job_id in job_ids}
+    for timeslot in timetable.timeslots:
+        for job_id in slots.keys() & timeslot.jobs.keys():
+            res_id = timeslot.jobs[job_id]
+            slots[job_id].append(
+                [
+                    timeslot.start.isoformat(),
+                    res_id,
+                    timeslot.reserved_resources[res_id],
+                ]
+            )
+    return [
+        (
+            {"op": "reserve", "job_id": job_id, "slots": job_slots}
+            if job_slots
+            else {"op": "cancel", "job_id": job_id}
+        )
+        for job_id, job_slots in slots.items()
+    ]
+
+
+def header_record(snapshot_id: str) -> dict[str, Any]:
+    """Get the first record of a journal, which names its snapshot."""
+    return {"op": "snapshot", "id": snapshot_id}
+
+
+def replay(timetable: Timetable, path: Path, snapshot_id: str) -> int:
+    """Apply the records of a journal to the timetable.
+
+    Journals which belong to another snapshot are outdated and ignored.
+    A torn last line of an interrupted write is ignored as well.
+    Returns the amount of applied records.
+    """
+    if not path.exists():
+        return 0
+    slot_index = {ts.start.isoformat(): ts for ts in timetable.timeslots}
+    applied = 0
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                break
+            if record["op"] == "snapshot":
+                if record["id"] != snapshot_id:
+                    return 0
+                continue
+            _apply(timetable, record, slot_index)
+            applied += 1
+    return applied
+
+
+def _apply(
+    timetable: Timetable,
+    record: dict[str, Any],
+    slot_index: dict[str, ConstrainedTimeslot],
+) -> None:
+    if record["op"] == "slots":
+        for start, end, gci, *flags in record["slots"]:
+            # Records of earlier versions have no estimated timeslots
+            estimated = bool(flags and flags[0])
+            if start in slot_index:
+                # The forecast replaces the GCI of estimated timeslots
+                if slot_index[start].estimated and not estimated:
+                    slot_index[start].set_gci(gci)
+                    slot_index[start].estimated = False
+                continue
+            timeslot = ConstrainedTimeslot(
+                start=datetime.fromisoformat(start),
+                end=datetime.fromisoformat(end),
+                gci=gci,
+                jobs={},
+                reserved_resources={},
+                estimated=estimated,
+            )
+            if timetable.append_timeslot(timeslot):
+                slot_index.update({start: timeslot})
+        return
+    job_id = record["job_id"]
+    timetable.remove_job(job_id)
+    if record["op"] == "cancel":
+        return
+    for start, res_id, reservation in record["slots"]:
+        timeslot = slot_index.get(start)
+        if timeslot is None:
+            # The timeslot is in the past
+            continue
+        timeslot.reserved_resources.update({res_id: reservation})
+        timeslot.jobs.update({job_id: res_id})
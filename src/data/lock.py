@@ -0,0 +1,63 @@
+"""Lock and version of a schedule file, for concurrent submissions."""
+
+from contextlib import contextmanager
+import fcntl
+import os
+from pathlib import Path
+from typing import Iterator
+
+# Depth of the locks this process holds, flock does not nest
+_DEPTHS: dict[Path, int] = {}
+
+
+def lock_path(schedule_path: Path) -> Path:
+    """Get the path of the lock file which belongs to a schedule."""
+    return schedule_path.with_suffix(".lock")
+
+
+def version_path(schedule_path: Path) -> Path:
+    """Get the path of the version counter which belongs to a schedule."""
+    return schedule_path.with_suffix(".version")
+
+
+@contextmanager
+def file_lock(schedule_path: Path) -> Iterator[None]:
+    """Hold an exclusive lock of the schedule, waiting for other processes.
+    Locks of the same schedule in this process nest.
+    """
+    path = lock_path(schedule_path)
+    if _DEPTHS.get(path, 0) > 0:
+        _DEPTHS[path] += 1
+        try:
+            yield
+        finally:
+            _DEPTHS[path] -= 1
+        return
+    with open(path, "a", encoding="utf-8") as file:
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+        _DEPTHS[path] = 1
+        try:
+            yield
+        finally:
+            _DEPTHS[path] = 0
+            fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+
+
+def read_version(schedule_path: Path) -> int:
+    """Read how often the schedule was written, 0 if never."""
+    try:
+        return int(version_path(schedule_path).read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def bump_version(schedule_path: Path) -> int:
+    """Count a write of the schedule, while holding its lock.
+    The counter is replaced atomically, so readers never see a partial one.
+    """
+    version = read_version(schedule_path) + 1
+    path = version_path(schedule_path)
+    tmp_path = path.with_suffix(".version-tmp")
+    tmp_path.write_text(str(version), encoding="utf-8")
+    os.replace(tmp_path, path)
+    return version
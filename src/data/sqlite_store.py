@@ -0,0 +1,212 @@
+"""Schedule in an SQLite database, for concurrent submissions."""
+
+from contextlib import contextmanager
+from datetime import datetime
+import json
+from pathlib import Path
+import sqlite3
+from typing import Iterator
+
+from src.data.columns import NO_TIME, from_micros, to_micros
+from src.sched.timeslot import ConstrainedTimeslot
+from src.sched.timetable import Timetable
+
+SQLITE_SUFFIXES = {".db", ".sqlite", ".sqlite3"}
+
+# Times are microseconds since the epoch, reservations are JSON
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS slots (
+    start INTEGER PRIMARY KEY,
+    end INTEGER NOT NULL,
+    gci REAL NOT NULL,
+    estimated INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS reservations (
+    slot_start INTEGER NOT NULL,
+    res_id TEXT NOT NULL,
+    job_id TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (slot_start, res_id)
+);
+CREATE INDEX IF NOT EXISTS reservations_job ON reservations (job_id);
+"""
+
+# The timeslots which end after a time, found by their start. Timeslots do
+# not overlap, so the first one starts at the latest start up to that time.
+LOAD_SLOTS = """
+SELECT start, end, gci, estimated FROM slots
+WHERE start >= (SELECT COALESCE(MAX(start), :after) FROM slots WHERE start <= :after)
+    AND end > :after
+ORDER BY start
+"""
+
+
+def is_sqlite(schedule_path: Path) -> bool:
+    """Check whether the schedule is kept in an SQLite database."""
+    return schedule_path.suffix in SQLITE_SUFFIXES
+
+
+class SqliteStore:
+    """Timeslots and reservations in an SQLite database.
+
+    Timeslots are keyed and reservations are indexed by their start, so a
+    time range is loaded with range queries. Writes run as transactions which
+    lock the database, so submissions from several login nodes serialise.
+    """
+
+    def __init__(self, path: Path, timeout: float = 30) -> None:
+        """Open the database, and create the tables if necessary.
+        Waits up to `timeout` seconds for locks of other processes.
+        """
+        self.path = path
+        # Transactions are started explicitly, see transaction()
+        self.connection = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+        self.connection.executescript(SCHEMA)
+        columns = [
+            row[1] for row in self.connection.execute("PRAGMA table_info(slots)")
+        ]
+        if "estimated" not in columns:
+            # Databases of earlier versions have no estimated timeslots
+            self.connection.execute(
+                "ALTER TABLE slots ADD COLUMN estimated INTEGER NOT NULL DEFAULT 0"
+            )
+
+    def close(self) -> None:
+        """Close the database."""
+        self.connection.close()
+
+    def is_empty(self) -> bool:
+        """Check whether there are no timeslots."""
+        return self.connection.execute("SELECT 1 FROM slots LIMIT 1").fetchone() is None
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """Run reads and writes as one transaction, which is rolled back on errors.
+
+        The database is locked for writing from the start, so concurrent
+        transactions wait instead of allocating the same resources.
+        Nested transactions are part of the outer one.
+        """
+        if self.connection.in_transaction:
+            yield
+            return
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self.connection.rollback()
+            raise
+        self.connection.commit()
+
+    def load(self, timetable: Timetable, since: datetime | None = None) -> bool:
+        """Append the timeslots which end after `since` to the timetable.
+        Returns False if there are none.
+        """
+        after = to_micros(since) if since is not None else int(NO_TIME)
+        slots = self.connection.execute(LOAD_SLOTS, {"after": after}).fetchall()
+        if len(slots) == 0:
+            return False
+        timeslots = {
+            start: ConstrainedTimeslot(
+                start=from_micros(start),
+                end=from_micros(end),
+                gci=gci,
+                jobs={},
+                reserved_resources={},
+                estimated=bool(estimated),
+            )
+            for start, end, gci, estimated in slots
+        }
+        for slot_start, res_id, job_id, data in self.connection.execute(
+            "SELECT slot_start, res_id, job_id, data FROM reservations "
+            "WHERE slot_start >= ?",
+            (slots[0][0],),
+        ):
+            timeslot = timeslots[slot_start]
+            timeslot.reserved_resources.update({res_id: json.loads(data)})
+            timeslot.jobs.update({job_id: res_id})
+        for timeslot in timeslots.values():
+            timetable.append_timeslot(timeslot)
+        return True
+
+    def write(self, timetable: Timetable) -> None:
+        """Replace the stored schedule by the timetable."""
+        with self.transaction():
+            for table in ["slots", "reservations"]:
+                self.connection.execute(f"DELETE FROM {table}")
+            self._insert_slots(timetable.timeslots)
+            self._insert_reservations(
+                [
+                    (timeslot, job_id)
+                    for timeslot in timetable.timeslots
+                    for job_id in timeslot.jobs
+                ]
+            )
+            self.bump_version()
+
+    def write_jobs(self, timetable: Timetable, job_ids: list[str]) -> None:
+        """Store the current reservations of some jobs, and new timeslots.
+        Reservations in timeslots before the timetable are kept.
+        """
+        if timetable.is_empty():
+            return
+        first = to_micros(timetable.timeslots[0].start)
+        with self.transaction():
+            self._insert_slots(timetable.timeslots)
+            self.connection.executemany(
+                "DELETE FROM reservations WHERE job_id = ? AND slot_start >= ?",
+                [(job_id, first) for job_id in job_ids],
+            )
+            self._insert_reservations(
+                [
+                    (timeslot, job_id)
+                    for timeslot in timetable.timeslots
+                    for job_id in timeslot.jobs.keys() & set(job_ids)
+                ]
+            )
+            self.bump_version()
+
+    def get_version(self) -> int:
+        """Read how often the schedule was written."""
+        (version,) = self.connection.execute("PRAGMA user_version").fetchone()
+        return version
+
+    def bump_version(self) -> int:
+        """Count a write of the schedule, as part of the current transaction."""
+        version = self.get_version() + 1
+        self.connection.execute(f"PRAGMA user_version = {version}")
+        return version
+
+    def get_end(self) -> datetime | None:
+        """Get the end of the last stored timeslot."""
+        (end,) = self.connection.execute("SELECT MAX(end) FROM slots").fetchone()
+        return from_micros(end) if end is not None else None
+
+    def _insert_slots(self, timeslots: list[ConstrainedTimeslot]) -> None:
+        # Existing timeslots keep their GCI like in the journal, unless the
+        # forecast replaces an estimated GCI
+        self.connection.executemany(
+            "INSERT INTO slots (start, end, gci, estimated) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (start) DO UPDATE SET gci = excluded.gci, estimated = 0 "
+            "WHERE slots.estimated AND NOT excluded.estimated",
+            [
+                (to_micros(ts.start), to_micros(ts.end), ts.gci, int(ts.estimated))
+                for ts in timeslots
+            ],
+        )
+
+    def _insert_reservations(
+        self, reservations: list[tuple[ConstrainedTimeslot, str]]
+    ) -> None:
+        rows = []
+        for timeslot, job_id in reservations:
+            res_id = timeslot.jobs[job_id]
+            reservation = timeslot.reserved_resources[res_id]
+            rows.append(
+                (to_micros(timeslot.start), res_id, job_id, json.dumps(reservation))
+            )
+        self.connection.executemany(
+            "INSERT INTO reservations (slot_start, res_id, job_id, data) "
+            "VALUES (?, ?, ?, ?)",
+            rows,
+        )
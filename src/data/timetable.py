@@ -1,28 +1,301 @@
 """Persist state of scheduler on disk."""
 
+from contextlib import AbstractContextManager
 from datetime import datetime, timedelta
+from pathlib import Path
+import threading
+from typing import Callable, TypeVar
+from uuid import uuid4
+
+import pandas as pd
 
 from src.config.squirrel_conf import Config
+from src.data.columns import read_columns_snapshot_id, read_snapshot_id, write_columns
+from src.data.journal import (
+    append_records,
+    header_record,
+    job_records,
+    journal_path,
+    replay,
+    slot_records,
+)
+from src.data.lock import bump_version, file_lock, read_version
+from src.data.sqlite_store import is_sqlite, SqliteStore
+from src.errors.scheduling import ScheduleConflictException
 from src.sched.timetable import Timetable
 
+T = TypeVar("T")
 
-def tt_from_csv(start: datetime) -> Timetable | None:
-    timetable = Timetable()
-    schedule_path = Config.get_local_paths().get("schedule")
-    # Check csv
-    if schedule_path.exists():
-        # Load state from csv
-        timetable.read_csv(schedule_path)
-        # Remove past time points from time table
-        timetable.truncate_history(latest=start + timedelta(hours=1))
-    # Get forecast data if necessary
+# Attempts of tt_update, before concurrent writes are given up on
+MAX_ATTEMPTS = 5
+
+# Open SQLite stores by schedule path, per thread like their connections
+_STORES = threading.local()
+
+
+def tt_from_csv(
+    start: datetime, schedule_path: Path | None = None, options: dict | None = None
+) -> Timetable | None:
+    """Load the schedule and append the forecast.
+    By default, the configured schedule and GCI data are used. Only the hours
+    of the forecast horizon which the schedule does not cover are fetched.
+    """
+    if schedule_path is None:
+        schedule_path = Config.get_local_paths().get("schedule")
+    timetable = _load(start, schedule_path)
     timetable.append_forecast(
         start=start,
         forecast_days=Config.get_forecast_days(),
         lookback_days=Config.get_lookback_days(),
+        options=options,
     )
     return timetable
 
 
-def tt_to_csv(timetable: Timetable):
-    timetable.write_csv(Config.get_local_paths()["schedule"])
+def tt_update(
+    start: datetime,
+    update: Callable[[Timetable], T],
+    schedule_path: Path | None = None,
+    options: dict | None = None,
+    forecast: bool = True,
+    rewrite: bool = False,
+) -> T:
+    """Change the schedule in a read-modify-write cycle, which is safe for
+    concurrent submissions. Returns the result of `update`.
+
+    The schedule is loaded and changed by `update` without locking it. Then
+    the lock is taken for writing the jobs whose reservations changed, or the
+    whole schedule with `rewrite`. If another process wrote the schedule in
+    the meantime, its version differs, and only loading and `update` are
+    repeated. The missing hours of the forecast are fetched once, if
+    `forecast` is set, and never under the lock.
+    """
+    if schedule_path is None:
+        schedule_path = Config.get_local_paths()["schedule"]
+    gci_data = None
+    for _ in range(MAX_ATTEMPTS):
+        version = tt_version(schedule_path)
+        timetable = _load(start, schedule_path)
+        if forecast:
+            gci_data = _append_forecast(timetable, start, gci_data, options)
+        before = _get_reservations(timetable)
+        result = update(timetable)
+        after = _get_reservations(timetable)
+        changed = [
+            job_id
+            for job_id in sorted(before.keys() | after.keys())
+            if before.get(job_id) != after.get(job_id)
+        ]
+        if tt_commit(timetable, changed, schedule_path, version, rewrite=rewrite):
+            return result
+    raise ScheduleConflictException(
+        f"The schedule changed during {MAX_ATTEMPTS} attempts to update it."
+    )
+
+
+def tt_commit(
+    timetable: Timetable,
+    job_ids: list[str],
+    schedule_path: Path | None,
+    version: int,
+    rewrite: bool = False,
+) -> bool:
+    """Persist the reservations of some jobs, or the whole schedule with
+    `rewrite`, if the schedule is still at the version it was loaded at.
+    Returns False if another process wrote it in the meantime.
+    """
+    if schedule_path is None:
+        schedule_path = Config.get_local_paths()["schedule"]
+    with schedule_lock(schedule_path):
+        if tt_version(schedule_path) != version:
+            return False
+        if rewrite:
+            tt_to_csv(timetable, schedule_path=schedule_path)
+        else:
+            tt_append(timetable, job_ids, schedule_path=schedule_path)
+    return True
+
+
+def tt_version(schedule_path: Path | None = None) -> int:
+    """Get how often the schedule was written, by default at the configured path.
+    Read it before loading the schedule, to commit changes with tt_commit.
+    """
+    if schedule_path is None:
+        schedule_path = Config.get_local_paths()["schedule"]
+    if is_sqlite(schedule_path):
+        return get_store(schedule_path).get_version()
+    return read_version(schedule_path)
+
+
+def schedule_lock(schedule_path: Path) -> AbstractContextManager:
+    """Lock the schedule for writing, waiting for other processes.
+    An SQLite database is locked by a transaction.
+    """
+    if is_sqlite(schedule_path):
+        return get_store(schedule_path).transaction()
+    return file_lock(schedule_path)
+
+
+def get_store(schedule_path: Path) -> SqliteStore:
+    """Get the SQLite store of a schedule, which stays open for this thread.
+    SQLite connections cannot be used by other threads, e.g. after the sites
+    of a multi-site submission were loaded in parallel.
+    """
+    if not hasattr(_STORES, "by_path"):
+        _STORES.by_path = {}
+    if schedule_path not in _STORES.by_path:
+        _STORES.by_path.update({schedule_path: SqliteStore(schedule_path)})
+    return _STORES.by_path[schedule_path]
+
+
+def tt_to_csv(timetable: Timetable, schedule_path: Path | None = None):
+    """Persist the whole schedule, by default at the configured path.
+    The schedule is written as memory-mapped columns next to the path,
+    unless the path is an SQLite database.
+
+    The columns are replaced atomically and the journal is compacted into them.
+    """
+    if schedule_path is None:
+        schedule_path = Config.get_local_paths()["schedule"]
+    if is_sqlite(schedule_path):
+        get_store(schedule_path).write(timetable)
+        timetable.stored_end = _get_end(timetable)
+        return
+    with file_lock(schedule_path):
+        # A new snapshot ID outdates the journal, even if it is not removed
+        write_columns(
+            timetable.timeslots, columns_path(schedule_path), snapshot_id=str(uuid4())
+        )
+        journal_path(schedule_path).unlink(missing_ok=True)
+        # Schedules of earlier versions are migrated now
+        schedule_path.with_suffix(".npz").unlink(missing_ok=True)
+        bump_version(schedule_path)
+    timetable.stored_end = _get_end(timetable)
+
+
+def tt_append(
+    timetable: Timetable, job_ids: list[str], schedule_path: Path | None = None
+):
+    """Persist the reservations of some jobs, by default at the configured path.
+
+    The reservations, and timeslots which were added since the schedule
+    was loaded, are appended to the journal. If there is no snapshot yet or
+    the journal grew too large, the whole schedule is written instead.
+    An SQLite database is updated in place.
+    """
+    if schedule_path is None:
+        schedule_path = Config.get_local_paths()["schedule"]
+    if is_sqlite(schedule_path):
+        get_store(schedule_path).write_jobs(timetable, job_ids)
+        timetable.stored_end = _get_end(timetable)
+        return
+    path = journal_path(schedule_path)
+    max_bytes = Config.get_journal_kib() * 1024
+    with file_lock(schedule_path):
+        # Read under the lock, a compaction would outdate the snapshot
+        snapshot_id = read_columns_snapshot_id(columns_path(schedule_path))
+        if (
+            not snapshot_id
+            or timetable.stored_end is None
+            or (path.exists() and path.stat().st_size >= max_bytes)
+            or max_bytes == 0
+        ):
+            tt_to_csv(timetable, schedule_path=schedule_path)
+            return
+        records = []
+        if not path.exists():
+            records.append(header_record(snapshot_id))
+        records += slot_records(timetable, since=timetable.stored_end)
+        records += job_records(timetable, job_ids)
+        append_records(path, records)
+        bump_version(schedule_path)
+    timetable.stored_end = _get_end(timetable)
+
+
+def read_schedule(
+    timetable: Timetable, schedule_path: Path, since: datetime | None = None
+) -> bool:
+    """Load the schedule into the timetable. Returns False if there is none.
+
+    Only the timeslots which end after `since` are read, from the memory-mapped
+    columns next to the path or from an SQLite database. The columns are
+    followed by the changes in their journal. A schedule which only exists
+    as .npz file or CSV is read in full once and migrated with the next write.
+    """
+    # The version is read first, so that it is never newer than the data
+    version = tt_version(schedule_path)
+    directory = columns_path(schedule_path)
+    snapshot_id = read_columns_snapshot_id(directory)
+    npz_path = schedule_path.with_suffix(".npz")
+    if is_sqlite(schedule_path):
+        if not get_store(schedule_path).load(timetable, since=since):
+            return False
+    elif snapshot_id:
+        timetable.read_columns(directory, since=since)
+        replay(timetable, journal_path(schedule_path), snapshot_id)
+    elif npz_path.exists():
+        timetable.read_npz(npz_path)
+        replay(timetable, journal_path(schedule_path), read_snapshot_id(npz_path))
+    elif schedule_path.exists():
+        timetable.read_csv(schedule_path)
+    else:
+        return False
+    timetable.stored_end = _get_end(timetable)
+    timetable.stored_version = version
+    return True
+
+
+def columns_path(schedule_path: Path) -> Path:
+    """Get the directory of the memory-mapped columns of a schedule."""
+    return schedule_path.with_suffix(".cols")
+
+
+def _load(start: datetime, schedule_path: Path) -> Timetable:
+    """Load the schedule from `start` on, without the forecast."""
+    timetable = Timetable(slot_minutes=Config.get_slot_minutes())
+    if read_schedule(timetable, schedule_path, since=start):
+        # Remove past time points from time table
+        timetable.truncate_history(
+            latest=start + timedelta(minutes=timetable.slot_minutes)
+        )
+    return timetable
+
+
+def _append_forecast(
+    timetable: Timetable,
+    start: datetime,
+    gci_data: pd.DataFrame | None,
+    options: dict | None,
+) -> pd.DataFrame | None:
+    """Append the forecast like Timetable.append_forecast, but only fetch it
+    if no `gci_data` was fetched before. Returns the data which was appended.
+    """
+    forecast_days = Config.get_forecast_days()
+    since = timetable.missing_since(start, forecast_days)
+    if since is None:
+        return gci_data
+    if gci_data is None:
+        gci_data = timetable.fetch_forecast(
+            start,
+            forecast_days=forecast_days,
+            lookback_days=Config.get_lookback_days(),
+            options=options,
+            since=since,
+        )
+    timetable.append_tail(gci_data)
+    return gci_data
+
+
+def _get_reservations(timetable: Timetable) -> dict[str, list[str]]:
+    """Get the reservation IDs of each job."""
+    reservations = {}
+    for timeslot in timetable.timeslots:
+        for job_id, res_id in timeslot.jobs.items():
+            reservations.setdefault(job_id, []).append(res_id)
+    return reservations
+
+
+def _get_end(timetable: Timetable) -> datetime | None:
+    if timetable.is_empty():
+        return None
+    return timetable.get_latest().end
@@ -11,3 +11,7 @@ class NoWindowAllocatedException(Exception):
 
 class JobTooLongException(Exception):
     """Raise if requested runtime exceeds timetable size."""
+
+
+class ScheduleConflictException(Exception):
+    """Raise if other processes keep writing the schedule during an update."""
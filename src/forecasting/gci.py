@@ -65,3 +65,33 @@ def builtin_forecast_gci(
                         points.append(fc_point["gci"])
         forecast.append({"time": time_point, "gci": np.median(points)})
     return pd.DataFrame(forecast)
+
+
+def interpolate_gci(data: pd.DataFrame, slot_minutes: int) -> pd.DataFrame:
+    """Split hourly GCI data into timeslots of `slot_minutes`.
+
+    The GCI of a timeslot is linearly interpolated between the
+    centers of the hours, for all timeslots at once.
+
+    Args:
+        data (pd.DataFrame): Hourly data with columns "time" and "gci".
+        slot_minutes (int): Length of the timeslots, a divisor of 60.
+
+    Returns:
+        pd.DataFrame: Data with columns "time" and "gci" for each timeslot.
+    """
+    if slot_minutes == 60 or len(data) == 0:
+        return data
+    slots_per_hour = 60 // slot_minutes
+    hours = pd.DatetimeIndex(data["time"])
+    offsets = pd.to_timedelta(np.arange(slots_per_hour) * slot_minutes, unit="min")
+    slot_times = (hours.values[:, np.newaxis] + offsets.values).ravel()
+    half_slot = np.timedelta64(slot_minutes * 30, "s")
+    gcis = np.interp(
+        (slot_times + half_slot).astype("int64"),
+        (hours.values + np.timedelta64(30, "m")).astype("int64"),
+        data["gci"].to_numpy(dtype=float),
+    )
+    return pd.DataFrame(
+        {"time": pd.DatetimeIndex(slot_times).tz_localize(hours.tz), "gci": gcis}
+    )
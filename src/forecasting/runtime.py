@@ -0,0 +1,107 @@
+"""Runtime prediction based on the accounting history of Slurm."""
+
+from datetime import datetime, timedelta, UTC
+import json
+from math import ceil
+import os
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from src.cluster.commons import sacct
+
+
+class RuntimePredictor:
+    """Predicts how long a job actually runs, given its user, name and
+    requested hours. The elapsed times of past jobs are kept on disk per key.
+
+    The prediction is the `quantile` of the elapsed times plus a relative
+    `margin`, rounded up to full timeslots and never longer than requested.
+    Without at least `min_samples` past jobs, the requested hours are used.
+    The history is due for an update `refresh_minutes` after the last one,
+    with 0 it is only updated explicitly.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        quantile: float = 0.9,
+        margin: float = 0.2,
+        min_samples: int = 3,
+        max_samples: int = 100,
+        refresh_minutes: int = 60,
+    ) -> None:
+        self.path = path
+        self.quantile = quantile
+        self.margin = margin
+        self.min_samples = min_samples
+        self.max_samples = max_samples
+        self.refresh_minutes = refresh_minutes
+        self._history = None
+
+    def predict(
+        self, user: str, name: str, hours: float, slot_minutes: int = 60
+    ) -> float:
+        """Get the amount of hours to reserve for a job."""
+        samples = self._load()["jobs"].get(_key(user, name, ceil(hours)), [])
+        if len(samples) < self.min_samples:
+            return hours
+        seconds = np.quantile(samples, self.quantile) * (1 + self.margin)
+        slots = max(ceil(seconds / 60 / slot_minutes), 1)
+        return min(slots * slot_minutes / 60, hours)
+
+    def is_due(self) -> bool:
+        """Check whether the cached history is older than `refresh_minutes`."""
+        if self.refresh_minutes == 0:
+            return False
+        updated = self._load()["updated"]
+        if updated is None:
+            return True
+        age = datetime.now(tz=UTC) - datetime.fromisoformat(updated)
+        return age >= timedelta(minutes=self.refresh_minutes)
+
+    def update(self, records: list[dict[str, Any]] | None = None) -> int:
+        """Add completed jobs to the history and persist it.
+
+        By default, only jobs which ended since the last update are
+        fetched from `sacct`. Jobs which were fetched by the last update are
+        skipped, since they may be reported again. Returns the amount of
+        added jobs.
+        """
+        history = self._load()
+        if records is None:
+            if history["updated"] is not None:
+                since = datetime.fromisoformat(history["updated"])
+            else:
+                since = datetime.now(tz=UTC) - timedelta(days=30)
+            now = datetime.now(tz=UTC)
+            records = sacct(start=since)
+            history["updated"] = now.isoformat()
+        seen = set(history.get("job_ids", []))
+        history["job_ids"] = [
+            record["job_id"] for record in records if "job_id" in record
+        ]
+        records = [record for record in records if record.get("job_id") not in seen]
+        for record in records:
+            key = _key(record["user"], record["name"], ceil(record["timelimit"] / 3600))
+            samples = history["jobs"].setdefault(key, [])
+            samples.append(record["elapsed"])
+            del samples[: -self.max_samples]
+        # Replace the history atomically, so that readers never see a partial one
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(history))
+        os.replace(tmp_path, self.path)
+        return len(records)
+
+    def _load(self) -> dict[str, Any]:
+        if self._history is None:
+            if self.path.exists():
+                self._history = json.loads(self.path.read_text())
+            else:
+                self._history = {"updated": None, "jobs": {}}
+        return self._history
+
+
+def _key(user: str, name: str, hours: int) -> str:
+    return f"{user}|{name}|{hours}"
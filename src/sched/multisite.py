@@ -0,0 +1,110 @@
+"""Spatial shifting across clusters in different energy zones."""
+
+from concurrent.futures import ThreadPoolExecutor
+from copy import deepcopy
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+from src.config.squirrel_conf import Config
+from src.data.timetable import tt_from_csv, tt_version
+from src.errors.scheduling import (
+    JobTooLongException,
+    NoSuitableNodeException,
+    NoWindowAllocatedException,
+)
+from src.sched.scheduler import Scheduler
+from src.sched.timetable import Timetable
+
+
+class Site:
+    """A cluster in an energy zone, with its own schedule."""
+
+    def __init__(
+        self,
+        name: str,
+        scheduler: Scheduler,
+        zone: str,
+        schedule_path: Path | None = None,
+        timetable: Timetable | None = None,
+    ):
+        self.name = name
+        self.scheduler = scheduler
+        self.zone = zone
+        self.schedule_path = schedule_path
+        self.timetable = timetable
+        # Version of the schedule when it was loaded, see tt_commit
+        self.version = None
+
+    def load(self, start: datetime) -> None:
+        """Load the schedule of the site and the GCI data of its energy zone."""
+        self.version = tt_version(self.schedule_path)
+        self.timetable = tt_from_csv(
+            start=start, schedule_path=self.schedule_path, options=self.get_options()
+        )
+
+    def get_options(self) -> dict:
+        """Get the options of the GCI queries for the energy zone of the site."""
+        if Config.use_builtin_forecast():
+            options = deepcopy(Config.get_influx_config()["gci"]["history"])
+        else:
+            options = deepcopy(Config.get_influx_config()["gci"]["forecast"])
+        options.get("tags").update({"zone": self.zone})
+        return options
+
+
+class MultiSiteScheduler:
+    """Schedules jobs on the site where they cause the lowest carbon footprint."""
+
+    def __init__(self, sites: list[Site]) -> None:
+        self.sites = sites
+
+    def load(self, start: datetime) -> None:
+        """Load the timetables of all sites in parallel, the loads wait for I/O."""
+        with ThreadPoolExecutor(max_workers=len(self.sites)) as executor:
+            list(executor.map(lambda site: site.load(start), self.sites))
+
+    def schedule_sbatch(
+        self, job_id: str, hours: int, **kwargs: Any
+    ) -> tuple[Site, datetime, str]:
+        """Evaluate the job on all sites and keep the placement with the
+        lowest estimated footprint.
+        Takes the same keyword arguments as `Scheduler.schedule_sbatch`.
+
+        The sites are evaluated one after another, scheduling is CPU-bound
+        and threads would only contend for the GIL. Only loading is parallel.
+        """
+        results = [
+            self._schedule_on_site(site, job_id, hours, kwargs) for site in self.sites
+        ]
+        placements = [result for result in results if result is not None]
+        if len(placements) == 0:
+            raise NoWindowAllocatedException("No site can run the job.")
+        best = min(placements, key=lambda placement: placement[0])
+        # Free the resources on all other sites
+        for placement in placements:
+            if placement is not best:
+                placement[1].timetable.remove_job(job_id)
+        _, site, start, node = best
+        return site, start, node
+
+    def _schedule_on_site(
+        self, site: Site, job_id: str, hours: int, kwargs: dict[str, Any]
+    ) -> tuple[float, Site, datetime, str] | None:
+        try:
+            start, node = site.scheduler.schedule_sbatch(
+                timetable=site.timetable, job_id=job_id, hours=hours, **kwargs
+            )
+        except (
+            NoWindowAllocatedException,
+            NoSuitableNodeException,
+            JobTooLongException,
+        ):
+            return None
+        footprint = site.scheduler.strategy.estimate_footprint(
+            timetable=site.timetable,
+            job_id=job_id,
+            uses_gpu=kwargs.get("num_gpus") is not None,
+            power_profile=kwargs.get("power_profile"),
+        )
+        return footprint, site, start, node
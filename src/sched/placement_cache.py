@@ -0,0 +1,106 @@
+"""Cache of precomputed placements for common job shapes."""
+
+from __future__ import annotations
+from datetime import datetime
+import json
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from src.errors.scheduling import (
+    JobTooLongException,
+    NoSuitableNodeException,
+    NoWindowAllocatedException,
+)
+from src.sched.timetable import Timetable
+
+if TYPE_CHECKING:
+    from src.sched.scheduler import Scheduler
+
+
+class PlacementCache:
+    """Best placement of each job shape, valid for one version of the schedule.
+
+    A shape is the amount of hours, the partitions and the amount of GPUs
+    of an exclusive single-node job without time constraints. The version is
+    the counter of writes to the schedule, together with the end of the
+    forecast, so a lookup does not depend on the size of the schedule.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._content = None
+
+    def precompute(
+        self, scheduler: Scheduler, timetable: Timetable, shapes: list[dict]
+    ) -> dict[str, dict]:
+        """Find the best placement of each shape and persist them.
+        The timetable is not changed.
+        """
+        placements = {}
+        for shape in shapes:
+            try:
+                candidates = scheduler.plan(timetable=timetable, k=1, **shape)
+            except (
+                NoWindowAllocatedException,
+                NoSuitableNodeException,
+                JobTooLongException,
+            ):
+                continue
+            placements.update(
+                {
+                    shape_key(**shape): {
+                        "start": candidates[0]["start"].isoformat(),
+                        "node": candidates[0]["node"],
+                    }
+                }
+            )
+        self._content = {
+            "version": _version(timetable),
+            "strategy": type(scheduler.strategy).__name__,
+            "placements": placements,
+        }
+        self.path.write_text(json.dumps(self._content))
+        return placements
+
+    def lookup(
+        self,
+        timetable: Timetable,
+        strategy: str,
+        hours: float,
+        partitions: list[str],
+        num_gpus: int | None,
+    ) -> tuple[datetime, str] | None:
+        """Get the placement of a shape if it was computed
+        for the current version of the schedule.
+        Timetables which were not read from a schedule always miss.
+        """
+        content = self._load()
+        if content is None or content["strategy"] != strategy:
+            return None
+        placement = content["placements"].get(shape_key(hours, partitions, num_gpus))
+        version = _version(timetable)
+        if placement is None or version is None or content["version"] != version:
+            return None
+        return datetime.fromisoformat(placement["start"]), placement["node"]
+
+    def _load(self) -> dict | None:
+        if self._content is None and self.path.exists():
+            try:
+                self._content = json.loads(self.path.read_text())
+            except json.JSONDecodeError:
+                return None
+        return self._content
+
+
+def _version(timetable: Timetable) -> list | None:
+    """Identify the version of the schedule and forecast of a timetable."""
+    if timetable.stored_version is None or timetable.is_empty():
+        return None
+    return [timetable.stored_version, timetable.get_latest().end.isoformat()]
+
+
+def shape_key(hours: float, partitions: list[str], num_gpus: int | None) -> str:
+    """Identify a job shape. The runtime is rounded to minutes like in
+    scheduling, so that 2 and 2.0 hours are the same shape.
+    """
+    return f"{round(hours * 60)}min:{','.join(sorted(partitions))}:{num_gpus or 0}gpu"
@@ -0,0 +1,45 @@
+"""Facility power cap."""
+
+from typing import Callable
+
+import numpy as np
+
+from src.sched.timeslot import ConstrainedTimeslot
+
+
+def planned_power(timeslots: list[ConstrainedTimeslot]) -> np.ndarray:
+    """Aggregate planned power (W) of each timeslot."""
+    return np.fromiter(
+        (ts.get_planned_power() for ts in timeslots), dtype=float, count=len(timeslots)
+    )
+
+
+class PowerLimit:
+    """Power which a job draws in its timeslots, and the cap it has to respect.
+
+    The job draws the hourly power profile if given, otherwise the power of
+    its nodes. Without a cap, every window is allowed.
+    """
+
+    def __init__(
+        self,
+        cap: float | None,
+        node_power: Callable[[str], float],
+        power_profile: list[float] | None = None,
+    ) -> None:
+        self.cap = cap
+        self.node_power = node_power
+        self.power_profile = power_profile
+
+    def job_power(self, nodes: list[str], num_slots: int) -> np.ndarray:
+        """Power (W) of the job in each of its timeslots."""
+        if self.power_profile is not None:
+            return np.asarray(self.power_profile[:num_slots], dtype=float)
+        return np.full(num_slots, sum(self.node_power(node) for node in nodes))
+
+    def allows(self, window: list[ConstrainedTimeslot], nodes: list[str]) -> bool:
+        """Check that no timeslot of the window exceeds the cap with the job."""
+        if self.cap is None:
+            return True
+        power = planned_power(window) + self.job_power(nodes, len(window))
+        return power.max(initial=0) <= self.cap
@@ -0,0 +1,322 @@
+"""Re-plan jobs which did not start yet, e.g. after a forecast update."""
+
+from __future__ import annotations
+from datetime import datetime, timedelta
+from typing import Any, TYPE_CHECKING
+from uuid import uuid4
+
+import numpy as np
+
+from src.errors.scheduling import (
+    JobTooLongException,
+    NoSuitableNodeException,
+    NoWindowAllocatedException,
+)
+from src.sched.power import PowerLimit
+from src.sched.timetable import ConstrainedTimeslot, Timetable
+from src.sched.windows import free_matrix, free_windows, gci_array, window_costs
+
+if TYPE_CHECKING:
+    from src.sched.scheduler import PlanningStrategy, Scheduler
+
+
+def replan(
+    timetable: Timetable,
+    old_gcis: np.ndarray,
+    now: datetime,
+    strategy: PlanningStrategy,
+    threshold: float = 0.1,
+) -> dict[str, datetime]:
+    """Move pending jobs whose window cost changed by more than `threshold`
+    (relative) since the GCI of the timetable was `old_gcis`.
+
+    The cost change of each job is derived from prefix sums of the GCI
+    deltas, so jobs whose window did not change much are not searched.
+    Jobs keep their nodes, time constraints and planned power. They are
+    only moved to windows within the power cap of the `strategy`, if the
+    strategy ranks the new placement better. Only exclusive jobs in
+    consecutive timeslots are moved. Returns the new start of moved jobs.
+    """
+    gcis = gci_array(timetable.timeslots)
+    csum_old = np.concatenate(([0.0], np.cumsum(old_gcis)))
+    csum_delta = np.concatenate(([0.0], np.cumsum(gcis - old_gcis)))
+    changed = []
+    for job_id, (first, last) in _pending_jobs(timetable, now).items():
+        old_cost = csum_old[last + 1] - csum_old[first]
+        delta = csum_delta[last + 1] - csum_delta[first]
+        if abs(delta) > threshold * abs(old_cost):
+            changed.append((abs(delta) / max(abs(old_cost), 1e-9), job_id))
+    moves = {}
+    # Jobs with the largest change first
+    for _, job_id in sorted(changed, reverse=True):
+        start = _move_job(timetable, job_id, now, strategy)
+        if start is not None:
+            moves.update({job_id: start})
+    return moves
+
+
+class NodeIndex:
+    """Index of the reservations on each node: the jobs and the indices
+    of their timeslots.
+
+    It is built in a single pass over the reservations and kept up to date
+    when jobs are removed or placed again, so it can be reused across calls
+    of `replace_nodes` on the same timetable. Removing timeslots from the
+    start of the timetable invalidates it.
+    """
+
+    def __init__(self, timetable: Timetable) -> None:
+        self.timetable = timetable
+        self.nodes: dict[str, dict[str, list[int]]] = {}
+        for slot_index, timeslot in enumerate(timetable.timeslots):
+            for job_id in timeslot.jobs:
+                self._add(job_id, slot_index)
+
+    def jobs(self, node: str) -> dict[str, list[int]]:
+        """Get the jobs on a node and the indices of their timeslots."""
+        return self.nodes.get(node, {})
+
+    def add_job(self, job_id: str, start: datetime) -> None:
+        """Index the consecutive timeslots of a job from its start on."""
+        first = self.timetable.timeslots[0].start
+        slot_index = int(
+            (start - first) / timedelta(minutes=self.timetable.slot_minutes)
+        )
+        while (
+            slot_index < len(self.timetable.timeslots)
+            and job_id in self.timetable.timeslots[slot_index].jobs
+        ):
+            self._add(job_id, slot_index)
+            slot_index += 1
+
+    def remove_job(self, job_id: str, nodes: list[str]) -> None:
+        """Remove a job from the index of its nodes."""
+        for node in nodes:
+            self.nodes.get(node, {}).pop(job_id, None)
+            if self.nodes.get(node) == {}:
+                self.nodes.pop(node)
+
+    def _add(self, job_id: str, slot_index: int) -> None:
+        timeslot = self.timetable.timeslots[slot_index]
+        reservation = timeslot.reserved_resources[timeslot.jobs[job_id]]
+        for node in _nodes(reservation):
+            self.nodes.setdefault(node, {}).setdefault(job_id, []).append(slot_index)
+
+
+def replace_nodes(
+    scheduler: Scheduler,
+    timetable: Timetable,
+    nodes: list[str],
+    now: datetime,
+    node_partitions: dict[str, list[str]] | None = None,
+    index: NodeIndex | None = None,
+) -> dict[str, tuple[datetime, str] | None]:
+    """Place pending jobs with a reservation on any of the `nodes` again,
+    e.g. after the nodes went down or were drained.
+
+    The affected jobs are looked up in the node `index`, which is built if
+    not given and kept up to date. All of them are removed before they are
+    placed again in the order of their old start, so that they do not block
+    each other. Jobs keep their resources and time constraints. Jobs without
+    stored partitions use the partitions of their nodes from
+    `node_partitions`. Returns the new start and node of each job, or None if
+    it does not fit anymore. Such jobs keep their old reservation, since
+    they are still pending in Slurm.
+    """
+    if index is None:
+        index = NodeIndex(timetable)
+    affected = {}
+    for node in nodes:
+        for job_id, slot_indices in index.jobs(node).items():
+            affected.setdefault(job_id, list(slot_indices))
+    requests = []
+    for job_id, slot_indices in affected.items():
+        window = [timetable.timeslots[i] for i in slot_indices]
+        if window[0].start <= now or slot_indices[-1] - slot_indices[0] + 1 != len(
+            slot_indices
+        ):
+            # Running and interruptible jobs are left to Slurm
+            continue
+        reservations = [
+            (timeslot, timeslot.get_reservation(job_id)) for timeslot in window
+        ]
+        requests.append(
+            (
+                slot_indices[0],
+                job_id,
+                _request(window, job_id, now, node_partitions),
+                reservations,
+            )
+        )
+        for timeslot in window:
+            timeslot.remove_job(job_id)
+        index.remove_job(job_id, _nodes(reservations[0][1]))
+    placements = {}
+    for _, job_id, request, reservations in sorted(requests, key=lambda x: x[:2]):
+        try:
+            start, node = scheduler.schedule_sbatch(
+                timetable=timetable,
+                job_id=job_id,
+                exclude_nodes=nodes,
+                **request,
+            )
+        except (
+            JobTooLongException,
+            NoSuitableNodeException,
+            NoWindowAllocatedException,
+        ):
+            # Only the failed nodes are excluded, so the old slots are free
+            for timeslot, reservation in reservations:
+                res_id = str(uuid4())
+                timeslot.reserved_resources.update({res_id: reservation})
+                timeslot.jobs.update({job_id: res_id})
+            index.add_job(job_id, reservations[0][0].start)
+            placements.update({job_id: None})
+            continue
+        index.add_job(job_id, start)
+        placements.update({job_id: (start, node)})
+    return placements
+
+
+def _nodes(reservation: dict) -> list[str]:
+    """Get the nodes of a reservation of one or several nodes."""
+    return reservation.get("nodes", [reservation.get("node")])
+
+
+def _request(
+    window: list[ConstrainedTimeslot],
+    job_id: str,
+    now: datetime,
+    node_partitions: dict[str, list[str]] | None,
+) -> dict[str, Any]:
+    """Get the arguments of `schedule_sbatch` which reproduce a reservation."""
+    reservation = window[0].get_reservation(job_id)
+    last_end = datetime.fromisoformat(window[-1].get_reservation(job_id)["end"])
+    old_nodes = _nodes(reservation)
+    partitions = reservation.get("partitions")
+    if partitions is None:
+        partitions = sorted(
+            {
+                partition
+                for node in old_nodes
+                for partition in (node_partitions or {}).get(node, [])
+            }
+        )
+    num_gpus = reservation.get("num_gpus")
+    if "gpu_ids" in reservation:
+        num_gpus = len(reservation["gpu_ids"]) or None
+    begin_after = now
+    if "begin_after" in reservation:
+        begin_after = max(now, datetime.fromisoformat(reservation["begin_after"]))
+    deadline = None
+    if "deadline" in reservation:
+        deadline = datetime.fromisoformat(reservation["deadline"])
+    return {
+        "hours": reservation.get(
+            "hours", (last_end - window[0].start).total_seconds() / 3600
+        ),
+        "partitions": partitions,
+        "num_gpus": num_gpus,
+        "gpu_name": reservation.get("gpu_name"),
+        "begin_after": begin_after,
+        "deadline": deadline,
+        "shared": "cpus" in reservation,
+        "num_cpus": reservation.get("cpus"),
+        "memory": reservation.get("memory"),
+        "num_nodes": len(old_nodes),
+        "power_profile": reservation.get("power_profile"),
+    }
+
+
+def _pending_jobs(timetable: Timetable, now: datetime) -> dict[str, tuple[int, int]]:
+    """Get the first and last timeslot of exclusive jobs which start after now
+    and are reserved in consecutive timeslots.
+    """
+    slots = {}
+    for index, timeslot in enumerate(timetable.timeslots):
+        for job_id in timeslot.jobs:
+            slots.setdefault(job_id, []).append(index)
+    pending = {}
+    for job_id, indices in slots.items():
+        first_slot = timetable.timeslots[indices[0]]
+        reservation = first_slot.get_reservation(job_id)
+        if (
+            first_slot.start > now
+            and "cpus" not in reservation
+            and indices[-1] - indices[0] + 1 == len(indices)
+        ):
+            pending.update({job_id: (indices[0], indices[-1])})
+    return pending
+
+
+def _move_job(
+    timetable: Timetable, job_id: str, now: datetime, strategy: PlanningStrategy
+) -> datetime | None:
+    """Reserve the cheapest window for the nodes of the job, in which the job
+    does not exceed the power cap, if the strategy ranks it better.
+    Returns the new start if the job moved.
+    """
+    old_window = timetable.get_job_slots(job_id)
+    reservation = old_window[0].get_reservation(job_id)
+    uses_gpu = reservation.get("num_gpus") is not None
+    old_rank = strategy.rank_placement(
+        timetable=timetable, job_id=job_id, uses_gpu=uses_gpu
+    )
+    # The job draws the power it was planned with, or the TDP of its nodes
+    planned = [slot.get_reservation(job_id).get("power") for slot in old_window]
+    power_limit = strategy.get_power_limit(
+        uses_gpu, power_profile=None if None in planned else planned
+    )
+    nodes = _nodes(reservation)
+    begin_after = now
+    if "begin_after" in reservation:
+        begin_after = max(now, datetime.fromisoformat(reservation["begin_after"]))
+    deadline = None
+    if "deadline" in reservation:
+        deadline = datetime.fromisoformat(reservation["deadline"])
+    timetable.remove_job(job_id)
+    hours = len(old_window)
+    timeslots = timetable.constrain(begin_after, deadline)
+    costs = window_costs(gci_array(timeslots), hours)
+    feasible = free_windows(free_matrix(timeslots, nodes), hours).all(axis=0)
+    costs = np.where(feasible, costs, np.inf)
+    old_cost = sum(slot.gci for slot in old_window)
+    for best in np.argsort(costs, kind="stable"):
+        if not costs[best] < old_cost:
+            break
+        candidate = timeslots[best : best + hours]
+        if not power_limit.allows(candidate, nodes):
+            continue
+        _book(job_id, candidate, reservation, nodes, power_limit)
+        rank = strategy.rank_placement(
+            timetable=timetable, job_id=job_id, uses_gpu=uses_gpu
+        )
+        if rank < old_rank:
+            return candidate[0].start
+        timetable.remove_job(job_id)
+        break
+    _book(job_id, old_window, reservation, nodes, power_limit)
+    return None
+
+
+def _book(
+    job_id: str,
+    window: list[ConstrainedTimeslot],
+    reservation: dict,
+    nodes: list[str],
+    power_limit: PowerLimit,
+) -> None:
+    """Reserve the window with a copy of the reservation of the job.
+    The planned power of the job is kept for each timeslot.
+    """
+    powers = power_limit.job_power(nodes, len(window))
+    for timeslot, watts in zip(window, powers):
+        request_uuid = str(uuid4())
+        booked = reservation | {
+            "start": timeslot.start.isoformat(),
+            "end": timeslot.end.isoformat(),
+        }
+        if "power" in reservation:
+            booked.update({"power": float(watts)})
+        timeslot.reserved_resources.update({request_uuid: booked})
+        timeslot.jobs.update({job_id: request_uuid})
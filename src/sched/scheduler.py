@@ -2,18 +2,44 @@
 
 from __future__ import annotations
 from abc import ABC, abstractmethod
-from datetime import datetime
-from functools import reduce
+from copy import deepcopy
+from datetime import datetime, timedelta
+from math import ceil
 from pathlib import Path
+from typing import Any
 
-from src.cluster.commons import get_partitions, get_cpu_tdp, get_gpu_tdp
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from src.cluster.commons import (
+    get_cpu_tdp,
+    get_gpu_tdp,
+    get_node_resources,
+    get_nodes,
+    get_partitions,
+    get_speed,
+    is_available,
+    to_hostlist,
+)
 from src.config.cluster_info import Meta, NodesMeta
 from src.errors.scheduling import (
     NoWindowAllocatedException,
     NoSuitableNodeException,
     JobTooLongException,
 )
+from src.sched.placement_cache import PlacementCache
+from src.sched.power import PowerLimit, planned_power
 from src.sched.timetable import Timetable, ConstrainedTimeslot
+from src.sched.windows import (
+    free_fraction,
+    free_intervals,
+    free_matrix,
+    free_windows,
+    gci_array,
+    pareto_front,
+    promising_starts,
+    window_costs,
+)
 
 
 class Scheduler:
@@ -26,14 +52,24 @@ class Scheduler:
         self,
         strategy: PlanningStrategy,
         cluster_info: Path = None,
+        max_horizon_hours: int | None = None,
+        placement_cache: PlacementCache | None = None,
     ) -> None:
         """
         The scheduler accepts a strategy through the constructor, but
         also provides a setter to change it at runtime.
+
+        If `max_horizon_hours` is set, timetables which are too short for a job
+        are extended on demand up to this amount of hours.
+
+        If a `placement_cache` is given, jobs of a precomputed shape
+        are placed from the cache as long as the timetable did not change.
         """
 
         self._strategy = strategy
         self._cluster_info = cluster_info
+        self._max_horizon_hours = max_horizon_hours
+        self._placement_cache = placement_cache
 
     @property
     def strategy(self) -> PlanningStrategy:
@@ -55,49 +91,472 @@ class Scheduler:
         self,
         timetable: Timetable,
         job_id: str,
-        hours: int,
+        hours: float,
         partitions: list[str],
         num_gpus: int | None = None,
         gpu_name: str | None = None,
+        begin_after: datetime | None = None,
+        deadline: datetime | None = None,
+        shared: bool = False,
+        num_cpus: int | None = None,
+        memory: int | None = None,
+        num_nodes: int = 1,
+        power_profile: list[float] | None = None,
+        exclude_nodes: list[str] | None = None,
+        start_before: datetime | None = None,
     ) -> tuple[datetime, str]:
         """
         Delegates job scheduling to the Strategy object instead of
         implementing multiple versions of the algorithm on its own.
+
+        The optional `begin_after` and `deadline` restrict the search
+        to windows which start and end within these bounds. The optional
+        `start_before` limits the start, e.g. for a maximum delay. It is
+        turned into a deadline for each window length, so that jobs on
+        faster nodes do not start later.
+
+        If `shared` is set, the job only reserves the requested CPUs,
+        memory (MB) and GPUs, so that nodes can be shared between jobs.
+        With the `best_fit` option of the strategy, nodes which the job
+        fills best are tried first among otherwise equal nodes.
+
+        Jobs with multiple nodes get them exclusively for the same window.
+        The nodes are returned as hostlist expression. They cannot be shared.
+
+        The optional `power_profile` holds the expected power draw
+        for each hour of the job.
+
+        Jobs may run for fractions of an hour. Strategies search windows
+        in timeslots of the timetable, the reservation in the last timeslot
+        ends with the job, to the minute.
+
+        Nodes in `exclude_nodes` and nodes which are down or drained
+        are not considered.
+
+        Single-node jobs without a power profile run shorter on faster nodes.
+        Nodes are grouped by the resulting window length and each group is
+        searched once; the strategy ranks the best placement of each group.
         """
         r_window = None
         uses_gpu = num_gpus is not None
-        if hours <= len(timetable.timeslots):
+        demand, capacities = None, None
+        if shared and num_nodes > 1:
+            raise ValueError(
+                "Jobs on multiple nodes reserve them exclusively, "
+                "only single-node jobs can share nodes."
+            )
+        if power_profile is not None and len(power_profile) != ceil(hours):
+            raise ValueError(
+                f"The power profile has {len(power_profile)} values, "
+                f"but the job runs for {ceil(hours)} hours."
+            )
+        # Jobs occupy whole timeslots, except for the end of the last one
+        minutes = round(hours * 60)
+        num_slots = ceil(minutes / timetable.slot_minutes)
+        # The hourly profile is kept with the job, for placing it again
+        hourly_profile = power_profile
+        if power_profile is not None:
+            power_profile = _slot_profile(
+                power_profile, timetable.slot_minutes, num_slots
+            )
+        if (
+            self._placement_cache is not None
+            and not shared
+            and num_nodes == 1
+            and gpu_name is None
+            and begin_after is None
+            and deadline is None
+            and start_before is None
+            and power_profile is None
+            and exclude_nodes is None
+        ):
+            cached = self._schedule_cached(
+                timetable=timetable,
+                job_id=job_id,
+                hours=hours,
+                minutes=minutes,
+                partitions=partitions,
+                num_gpus=num_gpus,
+            )
+            if cached is not None:
+                _store_request(
+                    timetable,
+                    job_id,
+                    hours,
+                    partitions,
+                    num_gpus,
+                    gpu_name,
+                    hourly_profile,
+                )
+                return cached
+        self.extend_horizon(
+            timetable=timetable, num_slots=num_slots, begin_after=begin_after
+        )
+        if num_slots <= len(timetable.timeslots):
             nodes = self._get_nodes(
-                partitions=partitions, num_gpus=num_gpus, gpu_name=gpu_name
+                partitions=partitions,
+                num_gpus=num_gpus,
+                gpu_name=gpu_name,
+                exclude_nodes=exclude_nodes,
             )
+            if shared:
+                demand = {
+                    "cpus": num_cpus or 1,
+                    "memory": memory or 0,
+                    "gpus": num_gpus or 0,
+                }
+                capacities = self._get_capacities(nodes=nodes, demand=demand)
+                nodes = [node for node in nodes if node in capacities]
+                if self._strategy.best_fit:
+                    nodes = _best_fit(
+                        timetable.constrain(begin_after, deadline),
+                        nodes,
+                        demand,
+                        capacities,
+                    )
             if len(nodes) == 0:
                 raise NoSuitableNodeException(
-                    "There is no node which satifies the GPU requirements."
+                    "There is no node which satifies the resource requirements."
                 )
-            r_window, r_node = self._strategy.allocate_resources(
-                job_id=job_id,
-                hours=hours,
+            if num_nodes > 1 or power_profile is not None:
+                lengths = {num_slots: nodes}
+            else:
+                lengths = self._strategy.window_lengths(
+                    nodes, minutes, timetable.slot_minutes
+                )
+            if min(lengths) > len(timetable.constrain(begin_after, deadline)):
+                raise NoWindowAllocatedException(
+                    f"There is no window of {hours} hours "
+                    f"between {begin_after} and {deadline}."
+                )
+            if num_nodes > 1:
+                gang_deadline = _latest_end(
+                    deadline, start_before, num_slots, timetable.slot_minutes
+                )
+                placement = self._schedule_gang(
+                    timetable=timetable,
+                    job_id=job_id,
+                    hours=num_slots,
+                    nodes=nodes,
+                    uses_gpu=uses_gpu,
+                    num_nodes=num_nodes,
+                    begin_after=begin_after,
+                    deadline=gang_deadline,
+                    power_profile=power_profile,
+                )
+                _store_constraints(timetable, job_id, begin_after, gang_deadline)
+                _store_request(
+                    timetable,
+                    job_id,
+                    hours,
+                    partitions,
+                    num_gpus,
+                    gpu_name,
+                    hourly_profile,
+                )
+                return placement
+            r_window, r_node = self._allocate_by_length(
                 timetable=timetable,
-                nodes=nodes,
+                job_id=job_id,
+                minutes=minutes,
+                lengths=lengths,
+                start_before=start_before,
                 uses_gpu=uses_gpu,
+                begin_after=begin_after,
+                deadline=deadline,
+                demand=demand,
+                capacities=capacities,
+                power_profile=power_profile,
             )
         else:
             raise JobTooLongException(
-                f"You requested {hours} hours. "
-                "The maximum amount is {len(timetable.timeslots)} hours."
+                f"You requested {hours} hours. The maximum amount is "
+                f"{len(timetable.timeslots) * timetable.slot_minutes / 60:g} hours."
             )
         if not r_window:
             raise NoWindowAllocatedException("The schedule is full.")
+        _store_constraints(
+            timetable,
+            job_id,
+            begin_after,
+            _latest_end(deadline, start_before, len(r_window), timetable.slot_minutes),
+        )
+        _store_request(
+            timetable,
+            job_id,
+            hours,
+            partitions,
+            num_gpus,
+            gpu_name,
+            hourly_profile,
+        )
         return r_window[0].start, r_node
 
+    def plan(
+        self,
+        timetable: Timetable,
+        hours: int,
+        partitions: list[str],
+        k: int = 3,
+        **kwargs: Any,
+    ) -> list[dict[str, Any]]:
+        """Preview up to `k` placements of a job without changing the timetable.
+
+        The strategy runs repeatedly on an in-memory snapshot. Each candidate
+        stays booked in the snapshot, so that the next run yields a different
+        start or node. Candidates are ordered as the strategy ranks them.
+        Takes the same keyword arguments as `schedule_sbatch`.
+        """
+        snapshot = deepcopy(timetable)
+        uses_gpu = kwargs.get("num_gpus") is not None
+        candidates = []
+        for index in range(k):
+            job_id = f"plan-{index}"
+            try:
+                start, node = self.schedule_sbatch(
+                    timetable=snapshot,
+                    job_id=job_id,
+                    hours=hours,
+                    partitions=partitions,
+                    **kwargs,
+                )
+            except NoWindowAllocatedException:
+                if index == 0:
+                    raise
+                break
+            footprint = self._strategy.estimate_footprint(
+                timetable=snapshot,
+                job_id=job_id,
+                uses_gpu=uses_gpu,
+                power_profile=kwargs.get("power_profile"),
+            )
+            candidates.append({"start": start, "node": node, "footprint": footprint})
+        return candidates
+
+    def pareto_frontier(
+        self,
+        timetable: Timetable,
+        hours: float,
+        partitions: list[str],
+        num_gpus: int | None = None,
+        gpu_name: str | None = None,
+        begin_after: datetime | None = None,
+        deadline: datetime | None = None,
+        power_profile: list[float] | None = None,
+        start_before: datetime | None = None,
+    ) -> list[dict[str, Any]]:
+        """Get the Pareto frontier of start and estimated footprint (gCO2e)
+        of an exclusive single-node job, without changing the timetable.
+        Only starts up to `start_before` are considered, if it is set.
+
+        The footprint of every feasible start and node is computed at once from
+        the window costs, per group of nodes with the same window length.
+        A sweep in order of start keeps each start which is cheaper than all
+        earlier ones, with its cheapest node.
+        """
+        minutes = round(hours * 60)
+        timeslots = timetable.constrain(begin_after, deadline)
+        nodes = self._get_nodes(
+            partitions=partitions, num_gpus=num_gpus, gpu_name=gpu_name
+        )
+        if power_profile is not None:
+            lengths = {ceil(minutes / timetable.slot_minutes): nodes}
+        else:
+            lengths = self._strategy.window_lengths(
+                nodes, minutes, timetable.slot_minutes
+            )
+        lengths = {
+            num_slots: class_nodes
+            for num_slots, class_nodes in lengths.items()
+            if num_slots <= len(timeslots)
+        }
+        if len(nodes) == 0 or len(lengths) == 0:
+            return []
+        power_limit = self._strategy.get_power_limit(num_gpus is not None)
+        row = {node: i for i, node in enumerate(nodes)}
+        footprints = np.full((len(nodes), len(timeslots) - min(lengths) + 1), np.inf)
+        # Each group of nodes with the same window length is evaluated at once
+        for num_slots, class_nodes in lengths.items():
+            node_minutes = np.array(
+                [self._strategy.node_minutes(node, minutes) for node in class_nodes]
+            )
+            node_power = np.array(
+                [power_limit.node_power(node) for node in class_nodes]
+            )
+            if power_profile is not None:
+                node_minutes = np.full(len(class_nodes), minutes)
+                node_power = np.ones(len(class_nodes))
+            footprints[
+                [row[node] for node in class_nodes], : len(timeslots) - num_slots + 1
+            ] = _window_footprints(
+                timeslots=timeslots,
+                nodes=class_nodes,
+                slot_minutes=timetable.slot_minutes,
+                num_slots=num_slots,
+                minutes=node_minutes,
+                node_power=node_power,
+                power_profile=power_profile,
+                power_cap=power_limit.cap,
+            )
+        best_nodes = np.argmin(footprints, axis=0)
+        best = footprints[best_nodes, np.arange(footprints.shape[1])]
+        return [
+            {
+                "start": timeslots[start].start,
+                "node": nodes[best_nodes[start]],
+                "footprint": float(best[start]),
+            }
+            for start in pareto_front(best)
+            if np.isfinite(best[start])
+            and (start_before is None or timeslots[start].start <= start_before)
+        ]
+
+    def _allocate_by_length(
+        self,
+        timetable: Timetable,
+        job_id: str,
+        minutes: int,
+        lengths: dict[int, list[str]],
+        deadline: datetime | None = None,
+        start_before: datetime | None = None,
+        **kwargs: Any,
+    ) -> tuple[list[ConstrainedTimeslot], str]:
+        """Let the strategy allocate a window for each group of nodes with the
+        same window length and keep the placement it ranks best.
+        Windows start at the latest at `start_before`, if it is set.
+        Takes the remaining keyword arguments of `allocate_resources`.
+        """
+
+        def allocate(num_slots: int) -> tuple[list[ConstrainedTimeslot], str]:
+            return self._strategy.allocate_resources(
+                job_id=job_id,
+                hours=num_slots,
+                timetable=timetable,
+                nodes=lengths[num_slots],
+                deadline=_latest_end(
+                    deadline, start_before, num_slots, timetable.slot_minutes
+                ),
+                **kwargs,
+            )
+
+        if len(lengths) == 1:
+            return allocate(next(iter(lengths)))
+        best_length, best_rank = None, None
+        for num_slots in lengths:
+            r_window, r_node = allocate(num_slots)
+            if not r_window:
+                continue
+            rank = self._strategy.rank_placement(
+                timetable=timetable, job_id=job_id, uses_gpu=kwargs["uses_gpu"]
+            )
+            timetable.remove_job(job_id)
+            if best_rank is None or rank < best_rank:
+                best_length, best_rank = num_slots, rank
+        if best_length is None:
+            return None, None
+        return allocate(best_length)
+
+    def _schedule_cached(
+        self,
+        timetable: Timetable,
+        job_id: str,
+        hours: float,
+        minutes: int,
+        partitions: list[str],
+        num_gpus: int | None,
+    ) -> tuple[datetime, str] | None:
+        """Reserve the precomputed placement of the job shape, if it is current."""
+        placement = self._placement_cache.lookup(
+            timetable=timetable,
+            strategy=type(self._strategy).__name__,
+            hours=hours,
+            partitions=partitions,
+            num_gpus=num_gpus,
+        )
+        if placement is None:
+            return None
+        start, node = placement
+        # Nodes which went down since the placement was computed are skipped
+        if node not in self._get_nodes(partitions=partitions, num_gpus=num_gpus):
+            return None
+        minutes = self._strategy.node_minutes(node, minutes)
+        num_slots = ceil(minutes / timetable.slot_minutes)
+        window = timetable.constrain(begin_after=start)[:num_slots]
+        if len(window) < num_slots or window[0].start != start:
+            return None
+        if not _reserve_resources(
+            job_id=job_id,
+            window=window,
+            node=node,
+            power_limit=self._strategy.get_power_limit(num_gpus is not None),
+        ):
+            return None
+        return start, node
+
+    def _schedule_gang(
+        self,
+        timetable: Timetable,
+        job_id: str,
+        hours: int,
+        nodes: list[str],
+        uses_gpu: bool,
+        num_nodes: int,
+        begin_after: datetime | None,
+        deadline: datetime | None,
+        power_profile: list[float] | None,
+    ) -> tuple[datetime, str]:
+        """Schedule a job which needs multiple nodes at once."""
+        if len(nodes) < num_nodes:
+            raise NoSuitableNodeException(
+                f"You requested {num_nodes} nodes, but only {len(nodes)} are suitable."
+            )
+        r_window, r_nodes = self._strategy.allocate_gang(
+            job_id=job_id,
+            hours=hours,
+            timetable=timetable,
+            nodes=nodes,
+            uses_gpu=uses_gpu,
+            num_nodes=num_nodes,
+            begin_after=begin_after,
+            deadline=deadline,
+            power_profile=power_profile,
+        )
+        if not r_window:
+            raise NoWindowAllocatedException("The schedule is full.")
+        return r_window[0].start, to_hostlist(r_nodes)
+
+    def extend_horizon(
+        self, timetable: Timetable, num_slots: int, begin_after: datetime | None
+    ) -> None:
+        """Extend the timetable if a job of `num_slots` timeslots does not fit
+        into it, as long as the maximum horizon is not exceeded.
+        The job starts at the earliest at the end of the timetable or at
+        `begin_after`, whichever is later.
+        """
+        if self._max_horizon_hours is None or timetable.is_empty():
+            return
+        required_slots = num_slots + len(timetable.timeslots)
+        required_slots -= len(timetable.constrain(begin_after=begin_after))
+        end = timetable.get_latest().end
+        if begin_after is not None and begin_after > end:
+            # The gap until `begin_after` has to be covered as well
+            required_slots += ceil(
+                (begin_after - end) / timedelta(minutes=timetable.slot_minutes)
+            )
+        max_slots = self._max_horizon_hours * 60 // timetable.slot_minutes
+        if len(timetable.timeslots) < required_slots <= max_slots:
+            timetable.extend_horizon(num_slots=required_slots)
+
     def _get_nodes(
         self,
         partitions: list[str],
         num_gpus: int | None = None,
         gpu_name: str | None = None,
+        exclude_nodes: list[str] | None = None,
     ) -> list[str]:
         # Get suitable nodes based on partitions and requested GPUs
         # Sort with regards to their weight and name.
+        # Nodes which are excluded, down or drained are skipped.
         cluster = get_partitions(path_to_json=self._cluster_info)
         nodeset = set()
         weighted_nodes = {}
@@ -109,6 +568,8 @@ class Scheduler:
                     if p_name in nodeset:
                         continue
                     nodeset.add(p_name)
+                    if p_name in (exclude_nodes or []) or not is_available(p_node):
+                        continue
                     # Analyze generic resources of node
                     if not self._gres_matches(p_node["gres"], num_gpus, gpu_name):
                         continue
@@ -125,6 +586,19 @@ class Scheduler:
             result = result + value
         return result
 
+    def _get_capacities(
+        self, nodes: list[str], demand: dict[str, int]
+    ) -> dict[str, dict[str, int]]:
+        """Get the resource capacities of the nodes which can satisfy the demand."""
+        capacities = {}
+        for node in get_nodes(path_to_json=self._cluster_info):
+            if node["name"] not in nodes:
+                continue
+            capacity = get_node_resources(node)
+            if all(demand[key] <= capacity[key] for key in demand):
+                capacities.update({node["name"]: capacity})
+        return capacities
+
     def _gres_matches(
         self, gres: str, num_gpus: int | None, gpu_name: str | None
     ) -> bool:
@@ -158,7 +632,15 @@ class PlanningStrategy(ABC):
     strategies.
     """
 
-    # NOTE: Jobs are assumed to be non-interruptible.
+    # NOTE: Jobs are assumed to be non-interruptible,
+    # except for the InterruptibleShifting strategy.
+
+    # Facility power cap (W) which no timeslot may exceed. None disables it.
+    power_cap: float | None = None
+
+    # Try the nodes which a shared job fills best first, so that other nodes
+    # stay free for large jobs. Carbon-aware choices still come first.
+    best_fit: bool = False
 
     def __init__(self, meta_path: Path = None):
         if meta_path is None:
@@ -177,10 +659,164 @@ class PlanningStrategy(ABC):
         timetable: Timetable,
         nodes: list[str],
         uses_gpu: bool,
+        begin_after: datetime | None = None,
+        deadline: datetime | None = None,
+        demand: dict[str, int] | None = None,
+        capacities: dict[str, dict[str, int]] | None = None,
+        power_profile: list[float] | None = None,
     ) -> tuple[list[ConstrainedTimeslot], str]:
         """Exclusively allocate nodes for consecutive window in the timetable.
         The length of the window is determined by the specified hours.
+        If given, the window starts at or after `begin_after` and ends
+        at or before `deadline`.
+        If a resource `demand` is given, nodes are shared with other jobs
+        as long as the `capacities` of the nodes are not exceeded.
+        If an hourly `power_profile` is given, strategies which rank windows
+        by GCI weight each hour with the power drawn in it.
+        """
+
+    def allocate_gang(
+        self,
+        job_id: str,
+        hours: int,
+        timetable: Timetable,
+        nodes: list[str],
+        uses_gpu: bool,
+        num_nodes: int,
+        begin_after: datetime | None = None,
+        deadline: datetime | None = None,
+        power_profile: list[float] | None = None,
+    ) -> tuple[list[ConstrainedTimeslot], list[str]]:
+        """Exclusively allocate multiple nodes for the same window.
+
+        Windows in which enough nodes are free are found by intersecting the
+        free windows of all nodes. In each window, the nodes with the lowest TDP
+        are chosen. Options are ranked by the product of the window's GCI and
+        the combined TDP of the chosen nodes.
+        """
+        timeslots = timetable.constrain(begin_after, deadline)
+        window_free = free_windows(free_matrix(timeslots, nodes), hours)
+        if window_free.shape[1] == 0:
+            return None, None
+        # Nodes without TDP information are assumed to have the highest TDP.
+        tdps = np.array([self._get_tdp(node, uses_gpu) or np.nan for node in nodes])
+        tdps = np.nan_to_num(tdps, nan=np.nanmax(tdps) if any(tdps > 0) else 1.0)
+        order = np.argsort(tdps, kind="stable")
+        sorted_free = window_free[order]
+        # Choose the first free nodes in order of TDP for each start hour
+        chosen = sorted_free & (np.cumsum(sorted_free, axis=0) <= num_nodes)
+        feasible = chosen.sum(axis=0) == num_nodes
+        costs = window_costs(gci_array(timeslots), hours, power_profile) * (
+            tdps[order] @ chosen
+        )
+        for start_hour in np.flatnonzero(feasible)[
+            np.argsort(costs[feasible], kind="stable")
+        ]:
+            window = timeslots[start_hour : start_hour + hours]
+            gang = [nodes[i] for i in order[chosen[:, start_hour]]]
+            if _reserve_gang(
+                job_id=job_id,
+                window=window,
+                nodes=gang,
+                power_limit=self.get_power_limit(uses_gpu, power_profile),
+            ):
+                return window, gang
+        return None, None
+
+    def estimate_footprint(
+        self,
+        timetable: Timetable,
+        job_id: str,
+        uses_gpu: bool,
+        power_profile: list[float] | None = None,
+    ) -> float:
+        """Estimate the carbon footprint (gCO2e) of an allocated job.
+
+        The job is assumed to draw the TDP of its nodes, or the hourly
+        power profile. Returns infinity if the TDP of a node is unknown.
+        """
+        footprint = 0
+        elapsed_seconds = 0
+        for timeslot in timetable.get_job_slots(job_id):
+            reservation = timeslot.get_reservation(job_id)
+            if power_profile is not None:
+                watts = power_profile[int(elapsed_seconds // 3600)]
+            else:
+                tdps = [
+                    self._get_tdp(node, uses_gpu)
+                    for node in reservation.get("nodes", [reservation.get("node")])
+                ]
+                if None in tdps:
+                    return float("inf")
+                watts = sum(tdps)
+            duration = datetime.fromisoformat(
+                reservation.get("end")
+            ) - datetime.fromisoformat(reservation.get("start"))
+            footprint += timeslot.gci * (watts / 1000) * duration.total_seconds() / 3600
+            elapsed_seconds += duration.total_seconds()
+        return footprint
+
+    def rank_placement(
+        self, timetable: Timetable, job_id: str, uses_gpu: bool
+    ) -> tuple[float, ...]:
+        """Rank an allocated job among placements on nodes of different speed.
+        Lower is better: the estimated footprint first, then the earlier end.
+        """
+        end = datetime.fromisoformat(
+            timetable.get_job_slots(job_id)[-1].get_reservation(job_id).get("end")
+        )
+        footprint = self.estimate_footprint(
+            timetable=timetable, job_id=job_id, uses_gpu=uses_gpu
+        )
+        return footprint, end.timestamp()
+
+    def node_minutes(self, node: str, minutes: int) -> int:
+        """Get the minutes a job of `minutes` on a reference node runs on the node."""
+        return max(round(minutes / get_speed(node, self._node_meta)), 1)
+
+    def window_lengths(
+        self, nodes: list[str], minutes: int, slot_minutes: int
+    ) -> dict[int, list[str]]:
+        """Group nodes by the amount of timeslots a job occupies on them,
+        in ascending order. Nodes keep their order within a group.
+        """
+        lengths = {}
+        for node in nodes:
+            num_slots = ceil(self.node_minutes(node, minutes) / slot_minutes)
+            lengths.setdefault(num_slots, []).append(node)
+        return dict(sorted(lengths.items()))
+
+    def get_power_limit(
+        self,
+        uses_gpu: bool,
+        power_profile: list[float] | None = None,
+        demand: dict[str, int] | None = None,
+        capacities: dict[str, dict[str, int]] | None = None,
+    ) -> PowerLimit:
+        """Get the power cap and the power a job draws on a node.
+        Nodes draw their TDP, shared nodes the share of their CPUs.
+        Nodes without TDP information are not counted.
+        """
+
+        def node_power(node: str) -> float:
+            tdp = self._get_tdp(node, uses_gpu) or 0
+            if demand is not None:
+                tdp *= demand["cpus"] / capacities[node]["cpus"]
+            return tdp
+
+        return PowerLimit(self.power_cap, node_power, power_profile)
+
+    def _get_tdp(self, node: str, uses_gpu: bool) -> float | None:
+        """Get the TDP of a node which is relevant for the job.
+        For GPU jobs, it is the mean of the CPU and GPU TDP.
         """
+        cpu_tdp = get_cpu_tdp(node_name=node, meta_info=self._node_meta)
+        if not uses_gpu:
+            return cpu_tdp
+        gpu_tdp = get_gpu_tdp(node_name=node, meta_info=self._node_meta)
+        if cpu_tdp is None or gpu_tdp is None:
+            return None
+        return (gpu_tdp + cpu_tdp) / 2
 
 
 class CarbonAgnosticFifo(PlanningStrategy):
@@ -190,6 +826,15 @@ class CarbonAgnosticFifo(PlanningStrategy):
     Takes into account scheduling weight and node names.
     """
 
+    def rank_placement(
+        self, timetable: Timetable, job_id: str, uses_gpu: bool
+    ) -> tuple[float, ...]:
+        """Rank placements by their end only, the earliest first."""
+        end = datetime.fromisoformat(
+            timetable.get_job_slots(job_id)[-1].get_reservation(job_id).get("end")
+        )
+        return (end.timestamp(),)
+
     def allocate_resources(
         self,
         job_id: str,
@@ -197,8 +842,13 @@ class CarbonAgnosticFifo(PlanningStrategy):
         timetable: Timetable,
         nodes: list[str],
         uses_gpu: bool,
+        begin_after: datetime | None = None,
+        deadline: datetime | None = None,
+        demand: dict[str, int] | None = None,
+        capacities: dict[str, dict[str, int]] | None = None,
+        power_profile: list[float] | None = None,
     ) -> tuple[list[ConstrainedTimeslot], str]:
-        timeslots = timetable.timeslots
+        timeslots = timetable.constrain(begin_after, deadline)
         # Iterate through timetable (sliding window)
         for start_hour in range(0, len(timeslots) - hours + 1):
             window = timeslots[start_hour : start_hour + hours]
@@ -208,7 +858,14 @@ class CarbonAgnosticFifo(PlanningStrategy):
             # Try to reserve a node within the window
             for node in nodes:
                 reserved_ts = _reserve_resources(
-                    job_id=job_id, window=window, node=node
+                    job_id=job_id,
+                    window=window,
+                    node=node,
+                    demand=demand,
+                    capacities=capacities,
+                    power_limit=self.get_power_limit(
+                        uses_gpu, power_profile, demand, capacities
+                    ),
                 )
                 if reserved_ts:
                     return window, node
@@ -216,7 +873,23 @@ class CarbonAgnosticFifo(PlanningStrategy):
 
 
 class TemporalShifting(PlanningStrategy):
-    """Carbon-aware temporal workload shifting."""
+    """Carbon-aware temporal workload shifting.
+
+    If `block_hours` is set, windows are searched coarse-to-fine:
+    First, blocks of `block_hours` are ranked by their GCI and free capacity.
+    Windows starting in the `num_blocks` best blocks are evaluated first,
+    the remaining windows only if allocation fails there.
+    """
+
+    def __init__(
+        self,
+        block_hours: int | None = None,
+        num_blocks: int = 2,
+        meta_path: Path = None,
+    ):
+        super().__init__(meta_path)
+        self.block_hours = block_hours
+        self.num_blocks = num_blocks
 
     def allocate_resources(
         self,
@@ -225,32 +898,40 @@ class TemporalShifting(PlanningStrategy):
         timetable: Timetable,
         nodes: list[str],
         uses_gpu: bool,
+        begin_after: datetime | None = None,
+        deadline: datetime | None = None,
+        demand: dict[str, int] | None = None,
+        capacities: dict[str, dict[str, int]] | None = None,
+        power_profile: list[float] | None = None,
     ) -> tuple[list[ConstrainedTimeslot], str]:
-        timeslots = timetable.timeslots
+        timeslots = timetable.constrain(begin_after, deadline)
         # Find the window where the GCI impact is lowest.
-        fc_hours = len(timeslots)
-        weighted_windows = {}
-        # Iterate through timetable (sliding window)
-        for start_hour in range(0, fc_hours - hours + 1):
-            # Map-reduce to calculate weight of current window
-            window = timeslots[start_hour : start_hour + hours]
-            # Skip window if there is a full slot in it
-            if any(slot.is_full() for slot in window):
-                continue
-            # Calculate weight of window
-            window_gcis = list(map(lambda x: x.gci, window))
-            weight = reduce(lambda x, y: x + y, window_gcis)
-            weighted_windows.update({weight: window})
-        # Greedily allocate window with low carbon intensity
-        for _, window in dict(sorted(weighted_windows.items())).items():
-            reserved_ts = []
-            # Reserve a single node during the timespan
-            for node in nodes:
-                reserved_ts = _reserve_resources(
-                    job_id=job_id, window=window, node=node
-                )
-                if reserved_ts:
-                    return window, node
+        costs = window_costs(gci_array(timeslots), hours, power_profile)
+        for start_hours in _search_stages(
+            timeslots,
+            hours,
+            nodes,
+            self.block_hours,
+            self.num_blocks,
+            timetable.slot_minutes,
+        ):
+            weighted_windows = _weighted_windows(timeslots, costs, hours, start_hours)
+            # Greedily allocate window with low carbon intensity
+            for _, window in sorted(weighted_windows.items()):
+                # Reserve a single node during the timespan
+                for node in nodes:
+                    reserved_ts = _reserve_resources(
+                        job_id=job_id,
+                        window=window,
+                        node=node,
+                        demand=demand,
+                        capacities=capacities,
+                        power_limit=self.get_power_limit(
+                            uses_gpu, power_profile, demand, capacities
+                        ),
+                    )
+                    if reserved_ts:
+                        return window, node
         return None, None
 
 
@@ -264,11 +945,16 @@ class SpatialGreedyShifting(PlanningStrategy):
         timetable: Timetable,
         nodes: list[str],
         uses_gpu: bool,
+        begin_after: datetime | None = None,
+        deadline: datetime | None = None,
+        demand: dict[str, int] | None = None,
+        capacities: dict[str, dict[str, int]] | None = None,
+        power_profile: list[float] | None = None,
     ) -> tuple[list[ConstrainedTimeslot], str]:
         """Allocate node considering its TDP values. Greedy version."""
 
         # Extract the available timeslots from the timetable.
-        timeslots = timetable.timeslots
+        timeslots = timetable.constrain(begin_after, deadline)
 
         # Initialize dictionaries and lists to categorize nodes:
         # 'tdp_box' will store nodes with their corresponding TDP values.
@@ -299,7 +985,14 @@ class SpatialGreedyShifting(PlanningStrategy):
                 if any(slot.is_full() for slot in window):
                     continue
                 reserved_ts = _reserve_resources(
-                    job_id=job_id, window=window, node=node
+                    job_id=job_id,
+                    window=window,
+                    node=node,
+                    demand=demand,
+                    capacities=capacities,
+                    power_limit=self.get_power_limit(
+                        uses_gpu, power_profile, demand, capacities
+                    ),
                 )
                 # If resources are successfully reserved, return the window and node.
                 if reserved_ts:
@@ -313,7 +1006,14 @@ class SpatialGreedyShifting(PlanningStrategy):
                     continue
                 for node in blackbox:
                     reserved_ts = _reserve_resources(
-                        job_id=job_id, window=window, node=node
+                        job_id=job_id,
+                        window=window,
+                        node=node,
+                        demand=demand,
+                        capacities=capacities,
+                        power_limit=self.get_power_limit(
+                            uses_gpu, power_profile, demand, capacities
+                        ),
                     )
                     if reserved_ts:
                         return window, node
@@ -338,11 +1038,16 @@ class SpatialShifting(PlanningStrategy):
         timetable: Timetable,
         nodes: list[str],
         uses_gpu: bool,
+        begin_after: datetime | None = None,
+        deadline: datetime | None = None,
+        demand: dict[str, int] | None = None,
+        capacities: dict[str, dict[str, int]] | None = None,
+        power_profile: list[float] | None = None,
     ) -> tuple[list[ConstrainedTimeslot], str]:
         """Allocate nodes considering their TDP values."""
 
         # Extract the available timeslots from the timetable.
-        timeslots = timetable.timeslots
+        timeslots = timetable.constrain(begin_after, deadline)
 
         # Initialize dictionaries and lists to categorize nodes:
         # 'tdp_box' will store nodes with their corresponding TDP values.
@@ -436,7 +1141,14 @@ class SpatialShifting(PlanningStrategy):
                 for pool in alloc_pools:
                     for node in pool:
                         reserved_ts = _reserve_resources(
-                            job_id=job_id, window=window, node=node
+                            job_id=job_id,
+                            window=window,
+                            node=node,
+                            demand=demand,
+                            capacities=capacities,
+                            power_limit=self.get_power_limit(
+                                uses_gpu, power_profile, demand, capacities
+                            ),
                         )
                         # If resources are successfully reserved, return the window and node.
                         if reserved_ts:
@@ -450,7 +1162,14 @@ class SpatialShifting(PlanningStrategy):
                     continue
                 for node in blackbox:
                     reserved_ts = _reserve_resources(
-                        job_id=job_id, window=window, node=node
+                        job_id=job_id,
+                        window=window,
+                        node=node,
+                        demand=demand,
+                        capacities=capacities,
+                        power_limit=self.get_power_limit(
+                            uses_gpu, power_profile, demand, capacities
+                        ),
                     )
                     if reserved_ts:
                         return window, node
@@ -461,11 +1180,22 @@ class SpatialShifting(PlanningStrategy):
 class SpatiotemporalShifting(PlanningStrategy):
     """Combined spatiotemporal workload shifting with load-balancing windows.
     Allocates workloads during low-GCI time slots and shifts toward nodes with lower TDP.
+
+    If `block_hours` is set, windows are searched coarse-to-fine
+    like in TemporalShifting.
     """
 
-    def __init__(self, switch_threshold: float = 0.75, meta_path: Path = None):
+    def __init__(
+        self,
+        switch_threshold: float = 0.75,
+        block_hours: int | None = None,
+        num_blocks: int = 2,
+        meta_path: Path = None,
+    ):
         super().__init__(meta_path)
         self.switch_threshold = switch_threshold
+        self.block_hours = block_hours
+        self.num_blocks = num_blocks
 
     def allocate_resources(
         self,
@@ -474,9 +1204,14 @@ class SpatiotemporalShifting(PlanningStrategy):
         timetable: Timetable,
         nodes: list[str],
         uses_gpu: bool,
+        begin_after: datetime | None = None,
+        deadline: datetime | None = None,
+        demand: dict[str, int] | None = None,
+        capacities: dict[str, dict[str, int]] | None = None,
+        power_profile: list[float] | None = None,
     ) -> tuple[list[ConstrainedTimeslot], str]:
         """Allocate nodes considering TDP and grid carbon intensity (GCI)."""
-        timeslots = timetable.timeslots
+        timeslots = timetable.constrain(begin_after, deadline)
         tdp_box, blackbox = {}, []
 
         for node in nodes:
@@ -509,59 +1244,445 @@ class SpatiotemporalShifting(PlanningStrategy):
                     curr_pool = []
             else:
                 load_balance_pools.append(curr_pool)
-        first_pool = load_balance_pools[0]
+        # Nodes of the same speed may all lack a TDP, then only the blackbox is left
+        first_pool = load_balance_pools[0] if load_balance_pools else []
 
-        weighted_windows = {}
-        # Iterate through timetable (sliding window)
-        for start_hour in range(0, len(timeslots) - hours + 1):
-            # Map-reduce to calculate weight of current window
-            window = timeslots[start_hour : start_hour + hours]
-            # Skip window if there is a full slot in it
-            if any(slot.is_full() for slot in window):
-                continue
-            # Calculate weight of window
-            window_gcis = list(map(lambda x: x.gci, window))
-            weight = reduce(lambda x, y: x + y, window_gcis)
-            weighted_windows.update({weight: window})
-
-        # Allocate by prioritizing low-GCI windows and using TDP-based load-balancing pools
-        amount_windows = len(weighted_windows)
-        i = 0
-        for gci, window in sorted(weighted_windows.items()):
-            if i > amount_windows * self.switch_threshold:
-                break
-            for node in first_pool:
-                reserved_ts = _reserve_resources(
-                    job_id=job_id, window=window, node=node
-                )
-                if reserved_ts:
-                    return window, node
-            i += 1
-        del i
-        for _, window in sorted(weighted_windows.items()):
-            for pool in load_balance_pools:
-                for node in pool:
+        costs = window_costs(gci_array(timeslots), hours, power_profile)
+        for start_hours in _search_stages(
+            timeslots,
+            hours,
+            nodes,
+            self.block_hours,
+            self.num_blocks,
+            timetable.slot_minutes,
+        ):
+            weighted_windows = _weighted_windows(timeslots, costs, hours, start_hours)
+            # Allocate by prioritizing low-GCI windows and using TDP-based load-balancing pools
+            amount_windows = len(weighted_windows)
+            i = 0
+            for gci, window in sorted(weighted_windows.items()):
+                if i > amount_windows * self.switch_threshold:
+                    break
+                for node in first_pool:
                     reserved_ts = _reserve_resources(
-                        job_id=job_id, window=window, node=node
+                        job_id=job_id,
+                        window=window,
+                        node=node,
+                        demand=demand,
+                        capacities=capacities,
+                        power_limit=self.get_power_limit(
+                            uses_gpu, power_profile, demand, capacities
+                        ),
                     )
                     if reserved_ts:
                         return window, node
-            for node in blackbox:
-                reserved_ts = _reserve_resources(
-                    job_id=job_id, window=window, node=node
+                i += 1
+            del i
+            for _, window in sorted(weighted_windows.items()):
+                for pool in load_balance_pools:
+                    for node in pool:
+                        reserved_ts = _reserve_resources(
+                            job_id=job_id,
+                            window=window,
+                            node=node,
+                            demand=demand,
+                            capacities=capacities,
+                            power_limit=self.get_power_limit(
+                                uses_gpu, power_profile, demand, capacities
+                            ),
+                        )
+                        if reserved_ts:
+                            return window, node
+                for node in blackbox:
+                    reserved_ts = _reserve_resources(
+                        job_id=job_id,
+                        window=window,
+                        node=node,
+                        demand=demand,
+                        capacities=capacities,
+                        power_limit=self.get_power_limit(
+                            uses_gpu, power_profile, demand, capacities
+                        ),
+                    )
+                    if reserved_ts:
+                        return window, node
+        return None, None
+
+
+class InterruptibleShifting(PlanningStrategy):
+    """Carbon-aware temporal shifting for interruptible jobs.
+
+    The job runs during the cheapest hours of the horizon, which do not need
+    to be consecutive. Instead of a window scan, the cheapest feasible hours
+    of each node are selected by a partial sort.
+    The job is suspended and resumed in between, see `src.submit.interruptible`.
+    Power profiles are not considered when selecting the hours.
+    """
+
+    def allocate_resources(
+        self,
+        job_id: str,
+        hours: int,
+        timetable: Timetable,
+        nodes: list[str],
+        uses_gpu: bool,
+        begin_after: datetime | None = None,
+        deadline: datetime | None = None,
+        demand: dict[str, int] | None = None,
+        capacities: dict[str, dict[str, int]] | None = None,
+        power_profile: list[float] | None = None,
+    ) -> tuple[list[ConstrainedTimeslot], str]:
+        """Allocate the cheapest hours of a single node."""
+        timeslots = timetable.constrain(begin_after, deadline)
+        if hours > len(timeslots):
+            return None, None
+        gcis = gci_array(timeslots)
+        if demand is None:
+            available = free_matrix(timeslots, nodes)
+        else:
+            # Shared nodes are checked when reserving
+            available = np.tile(
+                [not slot.is_full() for slot in timeslots], (len(nodes), 1)
+            )
+        costs = np.where(available, gcis, np.inf)
+        cheapest = np.sort(np.argpartition(costs, hours - 1, axis=1)[:, :hours], axis=1)
+        totals = np.take_along_axis(costs, cheapest, axis=1).sum(axis=1)
+        # Try nodes in order of their total GCI
+        for row in np.argsort(totals, kind="stable"):
+            if not np.isfinite(totals[row]):
+                break
+            window = [timeslots[col] for col in cheapest[row]]
+            reserved_ts = _reserve_resources(
+                job_id=job_id,
+                window=window,
+                node=nodes[row],
+                demand=demand,
+                capacities=capacities,
+                power_limit=self.get_power_limit(
+                    uses_gpu, power_profile, demand, capacities
+                ),
+            )
+            if reserved_ts:
+                return window, nodes[row]
+        return None, None
+
+
+class BackfillShifting(PlanningStrategy):
+    """Carbon-aware backfilling into gaps of the schedule.
+
+    Windows which cost at most `tolerance` (relative) more than the cheapest
+    window are considered equally green. Among them, the window in the
+    tightest gap of a node is chosen, preferably adjacent to an existing
+    reservation, so that long free runs stay intact for long jobs.
+    The free run at the end of the horizon counts as unbounded.
+    """
+
+    def __init__(self, tolerance: float = 0.1, meta_path: Path = None):
+        super().__init__(meta_path)
+        self.tolerance = tolerance
+
+    def allocate_resources(
+        self,
+        job_id: str,
+        hours: int,
+        timetable: Timetable,
+        nodes: list[str],
+        uses_gpu: bool,
+        begin_after: datetime | None = None,
+        deadline: datetime | None = None,
+        demand: dict[str, int] | None = None,
+        capacities: dict[str, dict[str, int]] | None = None,
+        power_profile: list[float] | None = None,
+    ) -> tuple[list[ConstrainedTimeslot], str]:
+        timeslots = timetable.constrain(begin_after, deadline)
+        if hours > len(timeslots):
+            return None, None
+        costs = window_costs(gci_array(timeslots), hours, power_profile)
+        if demand is None:
+            free = free_matrix(timeslots, nodes)
+        else:
+            # Shared nodes are checked when reserving
+            free = np.tile([not slot.is_full() for slot in timeslots], (len(nodes), 1))
+        rows, starts, slacks, pieces = [], [], [], []
+        for row, intervals in enumerate(free_intervals(free)):
+            for gap_start, gap_end in intervals:
+                if gap_end - gap_start < hours:
+                    continue
+                gap_starts = np.arange(gap_start, gap_end - hours + 1)
+                slack = gap_end - gap_start - hours
+                if gap_end == len(timeslots):
+                    slack = len(timeslots)
+                rows.append(np.full(len(gap_starts), row))
+                starts.append(gap_starts)
+                slacks.append(np.full(len(gap_starts), slack))
+                # Amount of free pieces the window leaves behind in the gap
+                pieces.append(
+                    (gap_starts > gap_start).astype(int)
+                    + (gap_starts + hours < gap_end)
                 )
-                if reserved_ts:
-                    return window, node
+        if len(rows) == 0:
+            return None, None
+        rows, starts = np.concatenate(rows), np.concatenate(starts)
+        slacks, pieces = np.concatenate(slacks), np.concatenate(pieces)
+        candidate_costs = costs[starts]
+        cheapest = candidate_costs.min()
+        green = candidate_costs <= cheapest + self.tolerance * abs(cheapest)
+        # Green windows by fit, then all others by cost
+        order = np.lexsort(
+            (
+                candidate_costs,
+                np.where(green, pieces, 0),
+                np.where(green, slacks, 0),
+                ~green,
+            )
+        )
+        for index in order:
+            window = timeslots[starts[index] : starts[index] + hours]
+            reserved_ts = _reserve_resources(
+                job_id=job_id,
+                window=window,
+                node=nodes[rows[index]],
+                demand=demand,
+                capacities=capacities,
+                power_limit=self.get_power_limit(
+                    uses_gpu, power_profile, demand, capacities
+                ),
+            )
+            if reserved_ts:
+                return window, nodes[rows[index]]
         return None, None
 
 
+def _best_fit(
+    timeslots: list[ConstrainedTimeslot],
+    nodes: list[str],
+    demand: dict[str, int],
+    capacities: dict[str, dict[str, int]],
+) -> list[str]:
+    """Order nodes by the GPUs and CPUs which would be left free on average
+    over the timeslots with the job on them, fewest first.
+    Nodes with equal leftovers keep their order.
+    """
+    used = {node: {"cpus": 0, "gpus": 0} for node in nodes}
+    for timeslot in timeslots:
+        for reservation in timeslot.reserved_resources.values():
+            for node in reservation.get("nodes", [reservation.get("node")]):
+                if node not in used:
+                    continue
+                if "cpus" in reservation:
+                    used[node]["cpus"] += reservation["cpus"]
+                    used[node]["gpus"] += len(reservation["gpu_ids"])
+                else:
+                    used[node]["cpus"] += capacities[node]["cpus"]
+                    used[node]["gpus"] += capacities[node]["gpus"]
+
+    def leftover(node: str) -> tuple[float, float]:
+        return tuple(
+            capacities[node][key]
+            - demand[key]
+            - used[node][key] / max(len(timeslots), 1)
+            for key in ["gpus", "cpus"]
+        )
+
+    return sorted(nodes, key=leftover)
+
+
+def _search_stages(
+    timeslots: list[ConstrainedTimeslot],
+    num_slots: int,
+    nodes: list[str],
+    block_hours: int | None,
+    num_blocks: int,
+    slot_minutes: int,
+):
+    """Yield the start slots of windows which are evaluated in each search stage.
+
+    Without `block_hours`, all windows are evaluated in a single stage.
+    Otherwise, the windows of the most promising blocks come first.
+    """
+    all_starts = np.arange(max(len(timeslots) - num_slots + 1, 0))
+    if not block_hours:
+        yield all_starts
+        return
+    block_slots = block_hours * (60 // slot_minutes)
+    if len(timeslots) <= block_slots * num_blocks:
+        yield all_starts
+        return
+    coarse_starts = promising_starts(
+        gcis=gci_array(timeslots),
+        free=free_fraction(timeslots, nodes),
+        num_slots=num_slots,
+        block_slots=block_slots,
+        num_blocks=num_blocks,
+    )
+    yield coarse_starts
+    yield np.setdiff1d(all_starts, coarse_starts, assume_unique=True)
+
+
+def _weighted_windows(
+    timeslots: list[ConstrainedTimeslot],
+    costs: np.ndarray,
+    hours: int,
+    start_hours: np.ndarray,
+) -> dict[float, list[ConstrainedTimeslot]]:
+    """Map the GCI weight of windows to the windows."""
+    weighted_windows = {}
+    for start_hour in start_hours:
+        window = timeslots[start_hour : start_hour + hours]
+        # Skip window if there is a full slot in it
+        if any(slot.is_full() for slot in window):
+            continue
+        weighted_windows.update({costs[start_hour]: window})
+    return weighted_windows
+
+
+def _slot_profile(
+    power_profile: list[float], slot_minutes: int, num_slots: int
+) -> list[float]:
+    """Repeat the hourly power profile for each timeslot of the job."""
+    return np.repeat(power_profile, 60 // slot_minutes)[:num_slots].tolist()
+
+
+def _window_footprints(
+    timeslots: list[ConstrainedTimeslot],
+    nodes: list[str],
+    slot_minutes: int,
+    num_slots: int,
+    minutes: np.ndarray,
+    node_power: np.ndarray,
+    power_profile: list[float] | None,
+    power_cap: float | None,
+) -> np.ndarray:
+    """Footprint (gCO2e) of a job on each node (row) for each start (column).
+    The job runs `minutes` on each node, ending in the last of `num_slots`.
+    Where the node is not free or the power cap would be exceeded,
+    the footprint is infinite.
+    """
+    gcis = gci_array(timeslots)
+    weights = np.ones(num_slots)
+    if power_profile is not None:
+        weights = np.asarray(_slot_profile(power_profile, slot_minutes, num_slots))
+    costs = window_costs(
+        gcis, num_slots, None if power_profile is None else list(weights)
+    )
+    # Only the part of the last timeslot until the job ends counts
+    unused = (num_slots * slot_minutes - minutes) / slot_minutes
+    costs = costs - np.outer(unused * weights[-1], gcis[num_slots - 1 :])
+    costs *= node_power[:, np.newaxis] * slot_minutes / 60 / 1000
+    footprints = np.where(
+        free_windows(free_matrix(timeslots, nodes), num_slots), costs, np.inf
+    )
+    if power_cap is not None:
+        planned = sliding_window_view(planned_power(timeslots), num_slots)
+        if power_profile is not None:
+            peak = np.tile((planned + weights).max(axis=1), (len(nodes), 1))
+        else:
+            peak = planned.max(axis=1) + node_power[:, np.newaxis]
+        footprints[peak > power_cap] = np.inf
+    return footprints
+
+
+def _store_request(
+    timetable: Timetable,
+    job_id: str,
+    hours: float,
+    partitions: list[str],
+    num_gpus: int | None,
+    gpu_name: str | None,
+    power_profile: list[float] | None = None,
+) -> None:
+    """Keep the hours, partitions, GPUs and hourly power profile a job
+    requested with its reservations, so that the job can be placed on
+    other nodes later on.
+    """
+    request = {"hours": hours, "partitions": partitions}
+    if num_gpus is not None:
+        request.update({"num_gpus": num_gpus})
+    if gpu_name is not None:
+        request.update({"gpu_name": gpu_name})
+    if power_profile is not None:
+        request.update({"power_profile": list(power_profile)})
+    for timeslot in timetable.get_job_slots(job_id):
+        timeslot.get_reservation(job_id).update(request)
+
+
+def _latest_end(
+    deadline: datetime | None,
+    start_before: datetime | None,
+    num_slots: int,
+    slot_minutes: int,
+) -> datetime | None:
+    """Turn the latest start into a deadline for windows of `num_slots` timeslots."""
+    if start_before is None:
+        return deadline
+    latest_end = start_before + timedelta(minutes=num_slots * slot_minutes)
+    return latest_end if deadline is None else min(deadline, latest_end)
+
+
+def _store_constraints(
+    timetable: Timetable,
+    job_id: str,
+    begin_after: datetime | None,
+    deadline: datetime | None,
+) -> None:
+    """Keep the time constraints of a job with its reservations,
+    so that the job can be moved later on.
+    """
+    constraints = {}
+    if begin_after is not None:
+        constraints.update({"begin_after": begin_after.isoformat()})
+    if deadline is not None:
+        constraints.update({"deadline": deadline.isoformat()})
+    if constraints:
+        for timeslot in timetable.get_job_slots(job_id):
+            timeslot.get_reservation(job_id).update(constraints)
+
+
+def _reserve_gang(
+    job_id: str,
+    window: list[ConstrainedTimeslot],
+    nodes: list[str],
+    power_limit: PowerLimit | None = None,
+) -> list[ConstrainedTimeslot] | None:
+    """Try to reserve multiple nodes for a whole window."""
+    if power_limit is not None and not power_limit.allows(window, nodes):
+        return None
+    reserved_ts = []
+    for timeslot in window:
+        res_id = timeslot.allocate_nodes_exclusive(
+            job_id=job_id,
+            node_names=nodes,
+            start=timeslot.start,
+            end=timeslot.end,
+        )
+        if not res_id:
+            for ts in reserved_ts:
+                ts.remove_job(job_id)
+            return None
+        reserved_ts.append(timeslot)
+    _store_power(job_id, reserved_ts, nodes, power_limit)
+    return reserved_ts
+
+
 def _reserve_resources(
-    job_id: str, window: list[ConstrainedTimeslot], node: str
+    job_id: str,
+    window: list[ConstrainedTimeslot],
+    node: str,
+    demand: dict[str, int] | None = None,
+    capacities: dict[str, dict[str, int]] | None = None,
+    power_limit: PowerLimit | None = None,
 ) -> list[str] | None:
     """Try to reserve node for a whole window.
 
-    Allocates the whole timespan of the slots.
+    Allocates the whole timespan of the slots, occupancy is kept per timeslot:
+    a job which ends within its last timeslot still holds the node until the
+    end of that timeslot.
+    Without a resource demand, the node is reserved exclusively.
+    With a power limit, windows which would exceed the power cap are rejected
+    and the power of the job is kept with its reservations.
     """
+    if power_limit is not None and not power_limit.allows(window, [node]):
+        return None
     reserved_ts = []
     for timeslot in window:
         # If window contains a full timeslot, abort attempt.
@@ -570,13 +1691,22 @@ def _reserve_resources(
                 ts.remove_job(job_id)
             reserved_ts.clear()
             return None
-        # TODO: Allow partial start and end times to support other runtimes than full hours.
-        res_id = timeslot.allocate_node_exclusive(
-            job_id=job_id,
-            node_name=node,
-            start=timeslot.start,
-            end=timeslot.end,
-        )
+        if demand is None:
+            res_id = timeslot.allocate_node_exclusive(
+                job_id=job_id,
+                node_name=node,
+                start=timeslot.start,
+                end=timeslot.end,
+            )
+        else:
+            res_id = timeslot.allocate_node_shared(
+                job_id=job_id,
+                node_name=node,
+                start=timeslot.start,
+                end=timeslot.end,
+                demand=demand,
+                capacity=capacities[node],
+            )
         if res_id:
             # Successful reservation of resources.
             reserved_ts.append(timeslot)
@@ -587,5 +1717,19 @@ def _reserve_resources(
             reserved_ts.clear()
             break
     if len(reserved_ts) > 0:
+        _store_power(job_id, reserved_ts, [node], power_limit)
         return reserved_ts
     return None
+
+
+def _store_power(
+    job_id: str,
+    timeslots: list[ConstrainedTimeslot],
+    nodes: list[str],
+    power_limit: PowerLimit | None,
+) -> None:
+    """Keep the planned power of a job with its reservations."""
+    if power_limit is None:
+        return
+    for timeslot, watts in zip(timeslots, power_limit.job_power(nodes, len(timeslots))):
+        timeslot.get_reservation(job_id).update({"power": float(watts)})
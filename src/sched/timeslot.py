@@ -15,13 +15,17 @@ class ConstrainedTimeslot:
         gci: float,
         jobs: dict,
         reserved_resources: dict[str, dict],
+        estimated: bool = False,
     ) -> None:
-        """Timeslot with constraints."""
+        """Timeslot with constraints.
+        The GCI of `estimated` timeslots was extrapolated beyond the forecast.
+        """
         self.start = start
         self.end = end
         self.gci = gci
         self.jobs = jobs
         self.reserved_resources = reserved_resources
+        self.estimated = estimated
         self.full_flag = False
 
     def get_duration(self):
@@ -53,7 +57,7 @@ class ConstrainedTimeslot:
         # Check if there is a conflicting reservation
         for _, r_batch in self.reserved_resources.items():
             # Check node name
-            if r_batch.get("node") != node_name:
+            if node_name not in _get_nodes(r_batch):
                 continue
             # Check if requested times overlap
             r_start = datetime.fromisoformat(r_batch.get("start"))
@@ -73,10 +77,96 @@ class ConstrainedTimeslot:
         self.jobs.update({job_id: request_uuid})
         return request_uuid
 
+    def allocate_node_shared(
+        self,
+        job_id: str,
+        node_name: str,
+        start: datetime,
+        end: datetime,
+        demand: dict[str, int],
+        capacity: dict[str, int],
+    ) -> str:
+        """Request a share of a node for a specified duration.
+
+        The demand and capacity are resource vectors of CPUs, memory and GPUs.
+        Individual GPUs are tracked by their index on the node.
+        """
+        if not (start >= self.start and end <= self.end):
+            return None
+        used_cpus, used_memory, used_gpus = 0, 0, set()
+        for _, r_batch in self.reserved_resources.items():
+            if node_name not in _get_nodes(r_batch):
+                continue
+            r_start = datetime.fromisoformat(r_batch.get("start"))
+            r_end = datetime.fromisoformat(r_batch.get("end"))
+            if not (start < r_end and r_start < end):
+                continue
+            if "cpus" not in r_batch:
+                # Node is reserved exclusively
+                return None
+            used_cpus += r_batch.get("cpus")
+            used_memory += r_batch.get("memory")
+            used_gpus.update(r_batch.get("gpu_ids"))
+        free_gpus = [i for i in range(capacity["gpus"]) if i not in used_gpus]
+        if (
+            used_cpus + demand["cpus"] > capacity["cpus"]
+            or used_memory + demand["memory"] > capacity["memory"]
+            or demand["gpus"] > len(free_gpus)
+        ):
+            return None
+        # Request successful
+        request_uuid = str(uuid4())
+        reservation = {
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "node": node_name,
+            "cpus": demand["cpus"],
+            "memory": demand["memory"],
+            "gpu_ids": free_gpus[: demand["gpus"]],
+        }
+        self.reserved_resources.update({request_uuid: reservation})
+        self.jobs.update({job_id: request_uuid})
+        return request_uuid
+
+    def allocate_nodes_exclusive(
+        self, job_id: str, node_names: list[str], start: datetime, end: datetime
+    ) -> str:
+        """Request multiple nodes at once for a specified duration.
+        Either all nodes are reserved in a single reservation, or none.
+        """
+        if not (start >= self.start and end <= self.end):
+            return None
+        if self.get_reserved_nodes() & set(node_names):
+            return None
+        # Request successful
+        request_uuid = str(uuid4())
+        reservation = {
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "nodes": list(node_names),
+        }
+        self.reserved_resources.update({request_uuid: reservation})
+        self.jobs.update({job_id: request_uuid})
+        return request_uuid
+
     def get_reservation(self, job_id: str) -> dict[str, Any] | None:
         """Get reserved resources for a specific job ID."""
         return self.reserved_resources.get(self.jobs.get(job_id))
 
+    def get_reserved_nodes(self) -> set[str]:
+        """Get the names of all nodes with a reservation in this time slot."""
+        return {
+            node
+            for r_batch in self.reserved_resources.values()
+            for node in _get_nodes(r_batch)
+        }
+
+    def get_planned_power(self) -> float:
+        """Get the aggregate power (W) planned for reservations in this time slot."""
+        return sum(
+            r_batch.get("power", 0) for r_batch in self.reserved_resources.values()
+        )
+
     def remove_job(self, job_id: str) -> None:
         """Frees allocated resources."""
         res_id = self.jobs.pop(job_id)
@@ -87,3 +177,10 @@ class ConstrainedTimeslot:
         if not isinstance(value, ConstrainedTimeslot):
             return False
         return self.start == value.start and self.end == value.end
+
+
+def _get_nodes(reservation: dict[str, Any]) -> list[str]:
+    """Get the names of the nodes of a single- or multi-node reservation."""
+    if "nodes" in reservation:
+        return reservation.get("nodes")
+    return [reservation.get("node")]
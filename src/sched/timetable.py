@@ -1,14 +1,17 @@
 """Timetable"""
 
+from bisect import bisect_left, bisect_right
 from datetime import datetime, timedelta
 import json
+from math import ceil
 from pathlib import Path
 
 import pandas as pd
 
 from src.config.squirrel_conf import Config
+from src.data.columns import read_columns, read_npz, write_npz
 from src.data.influxdb import get_gci_data
-from src.forecasting.gci import builtin_forecast_gci
+from src.forecasting.gci import builtin_forecast_gci, interpolate_gci
 from src.sched.timeslot import ConstrainedTimeslot
 
 
@@ -18,12 +21,23 @@ class Timetable:
     def __init__(
         self,
         timeslots: list[ConstrainedTimeslot] | None = None,
+        slot_minutes: int = 60,
     ) -> None:
-        """Returns an empty time table."""
+        """Returns an empty time table.
+        New timeslots are `slot_minutes` long, which has to divide an hour.
+        """
+        if 60 % slot_minutes != 0:
+            raise ValueError(f"Timeslots of {slot_minutes} minutes do not fit an hour.")
         if timeslots:
             self.timeslots = timeslots
         else:
             self.timeslots = []
+        self.slot_minutes = slot_minutes
+        # End of the last timeslot on disk, kept by the data adapters.
+        # Timeslots after it are written with the next change.
+        self.stored_end: datetime | None = None
+        # Version of the schedule on disk when it was read, see tt_version
+        self.stored_version: int | None = None
 
     def append_timeslot(self, timeslot: ConstrainedTimeslot) -> bool:
         """Append a timeslot to the latest timeslot.
@@ -45,6 +59,21 @@ class Timetable:
         """Get the latest timeslot."""
         return self.timeslots[-1]
 
+    def constrain(
+        self, begin_after: datetime | None = None, deadline: datetime | None = None
+    ) -> list[ConstrainedTimeslot]:
+        """Get the consecutive timeslots which start at or after `begin_after`
+        and end at or before `deadline`.
+
+        Timeslots are sorted, so the range is found by binary search.
+        """
+        first, last = 0, len(self.timeslots)
+        if begin_after is not None:
+            first = bisect_left(self.timeslots, begin_after, key=lambda ts: ts.start)
+        if deadline is not None:
+            last = bisect_right(self.timeslots, deadline, key=lambda ts: ts.end)
+        return self.timeslots[first:last]
+
     def append_forecast(
         self,
         start: datetime,
@@ -52,67 +81,176 @@ class Timetable:
         lookback_days: int,
         options: dict | None = None,
     ):
-        """Append timeslots using the forecast starting at a certain time."""
+        """Append timeslots using the forecast starting at a certain time.
+        Only the hours which the timetable does not cover yet are fetched.
+        """
+        since = self.missing_since(start, forecast_days)
+        if since is None:
+            return
+        self.append_tail(
+            self.fetch_forecast(start, forecast_days, lookback_days, options, since)
+        )
+
+    def missing_since(self, start: datetime, forecast_days: int) -> datetime | None:
+        """Get the time from which on the forecast horizon of a certain start
+        is not covered by timeslots, None if it is covered.
+        Estimated timeslots do not cover the horizon, so that the forecast
+        replaces their GCI once it is available.
+        """
+        since = start if self.is_empty() else self.get_latest().end
+        for timeslot in self.timeslots:
+            if timeslot.estimated:
+                since = timeslot.start
+                break
+        return since if since < start + timedelta(days=forecast_days) else None
+
+    def fetch_forecast(
+        self,
+        start: datetime,
+        forecast_days: int,
+        lookback_days: int,
+        options: dict | None = None,
+        since: datetime | None = None,
+    ) -> pd.DataFrame:
+        """Get the GCI forecast starting at a certain time.
+        With `since`, only the hours from then on are returned.
+        """
+        # Hourly data, which includes the hour of `since`
+        first = start
+        if since is not None:
+            first = max(start, since.replace(minute=0, second=0, microsecond=0))
         if Config.use_builtin_forecast():
             if not options:
                 options = Config.get_influx_config()["gci"]["history"]
             start_point = start - timedelta(days=lookback_days, hours=1)
             try:
-                gci_history = get_gci_data(start=start_point, stop=start, options=options)
+                gci_history = get_gci_data(
+                    start=start_point, stop=start, options=options
+                )
             except ValueError:
-                raise ValueError("Built-in forecasting: Not enough historical GCI data.")
+                raise ValueError(
+                    "Built-in forecasting: Not enough historical GCI data."
+                )
+            # Later hours depend on earlier ones, the forecast is cut afterwards
             forecast = builtin_forecast_gci(
                 gci_history, days=forecast_days, lookback=lookback_days
             )
+            forecast = forecast[forecast["time"] >= first].reset_index(drop=True)
         else:
             if not options:
                 options = Config.get_influx_config()["gci"]["forecast"]
             try:
                 forecast = get_gci_data(
-                    start=start,
+                    start=first,
                     stop=start + timedelta(days=forecast_days),
                     options=options,
                 )
             except ValueError:
                 raise ValueError("No GCI forecast data in InfluxDB.")
-        # Create new time slots
-        for _, row in forecast.iterrows():
-            ts = ConstrainedTimeslot(
-                start=row["time"],
-                end=row["time"] + timedelta(hours=1),
-                gci=row["gci"],
-                jobs={},
-                reserved_resources={},
-            )
-            self.append_timeslot(ts)
+        return forecast
+
+    def update_gci(self, gci_data: pd.DataFrame):
+        """Overwrite the GCI of existing timeslots, e.g. with a newer hourly forecast."""
+        gci_data = interpolate_gci(gci_data, self.slot_minutes)
+        gcis = dict(zip(gci_data["time"], gci_data["gci"]))
+        for timeslot in self.timeslots:
+            if timeslot.start in gcis:
+                timeslot.set_gci(gcis[timeslot.start])
+                timeslot.estimated = False
+
+    def get_job_slots(self, job_id: str) -> list[ConstrainedTimeslot]:
+        """Get all timeslots in which the job has a reservation."""
+        return [ts for ts in self.timeslots if job_id in ts.jobs]
+
+    def remove_job(self, job_id: str):
+        """Free all resources reserved for a job."""
+        for timeslot in self.get_job_slots(job_id):
+            timeslot.remove_job(job_id)
+
+    def rename_job(self, job_id: str, new_job_id: str):
+        """Change the ID of a job, e.g. to the ID Slurm assigned to it."""
+        for timeslot in self.get_job_slots(job_id):
+            timeslot.jobs.update({new_job_id: timeslot.jobs.pop(job_id)})
+
+    def extend_horizon(self, num_slots: int, lookback_days: int | None = None):
+        """Extend the timetable on demand until it has at least `num_slots` timeslots.
+
+        Only the missing hours are forecasted, using the built-in forecast
+        (median of the same hour in past days) on the GCI of the existing timeslots.
+        The new timeslots stay in the timetable, so they are persisted with it.
+        They are marked as estimated, until the forecast replaces their GCI.
+        """
+        missing_slots = num_slots - len(self.timeslots)
+        if missing_slots <= 0:
+            return
+        hourly_slots = [ts for ts in self.timeslots if ts.start.minute == 0]
+        if len(hourly_slots) < 24:
+            raise ValueError("Extending the horizon requires at least 24 hours.")
+        if lookback_days is None:
+            lookback_days = Config.get_lookback_days()
+        gci_history = pd.DataFrame(
+            {
+                "time": [pd.Timestamp(ts.start) for ts in hourly_slots],
+                "gci": [ts.gci for ts in hourly_slots],
+            }
+        )
+        missing_hours = ceil(missing_slots * self.slot_minutes / 60)
+        forecast = builtin_forecast_gci(
+            gci_history,
+            days=ceil(missing_hours / 24),
+            lookback=max(min(lookback_days, len(hourly_slots) // 24), 1),
+        )
+        first = len(self.timeslots)
+        self.append_direct(forecast.head(missing_hours))
+        for timeslot in self.timeslots[first:]:
+            timeslot.estimated = True
 
     def append_historic(
         self, start: datetime, end: datetime, options: dict | None = None
     ):
         """Append timeslots using historical data."""
         gci_history = get_gci_data(start=start, stop=end, options=options)
-        for _, row in gci_history.iterrows():
-            ts = ConstrainedTimeslot(
-                start=row["time"],
-                end=row["time"] + timedelta(hours=1),
-                gci=row["gci"],
-                jobs={},
-                reserved_resources={},
-            )
-            self.append_timeslot(ts)
+        self.append_direct(gci_history)
 
     def append_direct(self, gci_data: pd.DataFrame):
-        """Append timeslots using data from data frame."""
-        for _, row in gci_data.iterrows():
+        """Append timeslots using hourly data from data frame."""
+        self._append_slots(interpolate_gci(gci_data, self.slot_minutes))
+
+    def _append_slots(self, slot_data: pd.DataFrame):
+        """Append timeslots using data of timeslots from data frame."""
+        for _, row in slot_data.iterrows():
             ts = ConstrainedTimeslot(
                 start=row["time"],
-                end=row["time"] + timedelta(hours=1),
+                end=row["time"] + timedelta(minutes=self.slot_minutes),
                 gci=row["gci"],
                 jobs={},
                 reserved_resources={},
             )
             self.append_timeslot(ts)
 
+    def append_tail(self, gci_data: pd.DataFrame):
+        """Append timeslots using hourly data, which continue the latest timeslot.
+        Data before the end of the latest timeslot only replaces the GCI of
+        estimated timeslots. Those count as not stored anymore.
+
+        Raises:
+            ValueError: If the data starts after the end of the latest timeslot.
+        """
+        slot_data = interpolate_gci(gci_data, self.slot_minutes)
+        gcis = dict(zip(slot_data["time"], slot_data["gci"]))
+        for timeslot in self.timeslots:
+            if timeslot.estimated and timeslot.start in gcis:
+                timeslot.set_gci(gcis[timeslot.start])
+                timeslot.estimated = False
+                if self.stored_end is not None:
+                    self.stored_end = min(self.stored_end, timeslot.start)
+        if not self.is_empty():
+            end = self.get_latest().end
+            slot_data = slot_data[slot_data["time"] >= end]
+            if len(slot_data) > 0 and slot_data["time"].iloc[0] != end:
+                raise ValueError(f"There is no GCI data from {end} on.")
+        self._append_slots(slot_data)
+
     def truncate_history(self, latest: datetime):
         """Discard timeslots from the past."""
         i = 0
@@ -137,6 +275,20 @@ class Timetable:
                 )
             )
 
+    def read_npz(self, npz_path: Path):
+        """Reads state from a columnar .npz file."""
+        for timeslot in read_npz(npz_path):
+            self.append_timeslot(timeslot)
+
+    def read_columns(self, directory: Path, since: datetime | None = None):
+        """Reads the timeslots which end after `since` from memory-mapped columns."""
+        for timeslot in read_columns(directory, since=since):
+            self.append_timeslot(timeslot)
+
+    def write_npz(self, npz_path: Path):
+        """Writes state to a columnar .npz file."""
+        write_npz(self.timeslots, npz_path)
+
     def write_csv(self, csv_path: Path):
         """Writes state to csv file."""
         rows = []
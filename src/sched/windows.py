@@ -0,0 +1,144 @@
+"""Vectorized computations on windows of consecutive timeslots."""
+
+import numpy as np
+
+from src.sched.timeslot import ConstrainedTimeslot
+
+
+def gci_array(timeslots: list[ConstrainedTimeslot]) -> np.ndarray:
+    """Get the grid carbon intensity of each timeslot."""
+    return np.fromiter((ts.gci for ts in timeslots), dtype=float, count=len(timeslots))
+
+
+# Profiles of at least this length are correlated via FFT.
+FFT_MIN_LENGTH = 64
+
+
+def window_costs(
+    gcis: np.ndarray, hours: int, power_profile: list[float] | None = None
+) -> np.ndarray:
+    """Cost of each window with the given length.
+    The index of the result is the start hour of the window.
+
+    Without a power profile, the cost is the sum of GCI in the window.
+    Otherwise, it is the dot product of the hourly power profile and the GCI.
+    """
+    if hours > len(gcis):
+        return np.empty(0)
+    if power_profile is not None:
+        return _correlate(gcis, np.asarray(power_profile, dtype=float))
+    csum = np.concatenate(([0.0], np.cumsum(gcis, dtype=float)))
+    return csum[hours:] - csum[:-hours]
+
+
+def _correlate(gcis: np.ndarray, profile: np.ndarray) -> np.ndarray:
+    """Dot product of the profile with the GCI for every start hour at once."""
+    if len(profile) < FFT_MIN_LENGTH:
+        return np.correlate(gcis, profile, mode="valid")
+    size = len(gcis) + len(profile) - 1
+    full = np.fft.irfft(
+        np.fft.rfft(gcis, n=size) * np.fft.rfft(profile[::-1], n=size), n=size
+    )
+    return full[len(profile) - 1 : len(gcis)]
+
+
+def free_fraction(timeslots: list[ConstrainedTimeslot], nodes: list[str]) -> np.ndarray:
+    """Fraction of the given nodes which have no reservation in each timeslot."""
+    nodeset = set(nodes)
+    busy = np.fromiter(
+        (len(ts.get_reserved_nodes() & nodeset) for ts in timeslots),
+        dtype=float,
+        count=len(timeslots),
+    )
+    return 1 - busy / max(len(nodeset), 1)
+
+
+def free_matrix(timeslots: list[ConstrainedTimeslot], nodes: list[str]) -> np.ndarray:
+    """Boolean matrix which is True where a node (row) has no reservation
+    in a timeslot (column).
+    """
+    index = {node: i for i, node in enumerate(nodes)}
+    free = np.ones((len(nodes), len(timeslots)), dtype=bool)
+    for col, timeslot in enumerate(timeslots):
+        if timeslot.is_full():
+            free[:, col] = False
+            continue
+        for node in timeslot.get_reserved_nodes():
+            row = index.get(node)
+            if row is not None:
+                free[row, col] = False
+    return free
+
+
+def free_windows(free: np.ndarray, hours: int) -> np.ndarray:
+    """Boolean matrix which is True where a node (row) is free for the whole
+    window with the given length, starting at the hour (column).
+    """
+    if hours > free.shape[1]:
+        return np.zeros((free.shape[0], 0), dtype=bool)
+    busy = np.concatenate(
+        (np.zeros((free.shape[0], 1), dtype=int), np.cumsum(~free, axis=1)), axis=1
+    )
+    return (busy[:, hours:] - busy[:, :-hours]) == 0
+
+
+def free_intervals(free: np.ndarray) -> list[np.ndarray]:
+    """Index of the free intervals of each node (row).
+    Each interval is a row [start, end) of consecutive free timeslots.
+    """
+    padded = np.pad(free.astype(np.int8), ((0, 0), (1, 1)))
+    edges = np.diff(padded, axis=1)
+    intervals = []
+    for row in edges:
+        starts = np.flatnonzero(row == 1)
+        ends = np.flatnonzero(row == -1)
+        intervals.append(np.column_stack((starts, ends)))
+    return intervals
+
+
+def pareto_front(footprints: np.ndarray) -> np.ndarray:
+    """Indices of the Pareto-optimal starts, given the footprint of each start
+    in ascending order of delay: each start is cheaper than all earlier ones.
+    """
+    if len(footprints) == 0:
+        return np.empty(0, dtype=int)
+    best_before = np.concatenate(([np.inf], np.minimum.accumulate(footprints)[:-1]))
+    return np.flatnonzero(footprints < best_before)
+
+
+def promising_starts(
+    gcis: np.ndarray,
+    free: np.ndarray,
+    num_slots: int,
+    block_slots: int,
+    num_blocks: int,
+) -> np.ndarray:
+    """Coarse search for start slots of windows of `num_slots`.
+
+    The horizon is split into blocks of `block_slots`. Blocks are ranked by
+    their mean GCI, scaled by the free capacity in the block. Only start slots
+    inside the `num_blocks` best blocks are returned, in ascending order.
+    """
+    amount_starts = len(gcis) - num_slots + 1
+    if amount_starts <= 0:
+        return np.empty(0, dtype=int)
+    amount_blocks = -(-len(gcis) // block_slots)
+    padding = amount_blocks * block_slots - len(gcis)
+    block_gci = np.nanmean(
+        np.pad(gcis, (0, padding), constant_values=np.nan).reshape(
+            amount_blocks, block_slots
+        ),
+        axis=1,
+    )
+    block_free = np.nanmean(
+        np.pad(free, (0, padding), constant_values=np.nan).reshape(
+            amount_blocks, block_slots
+        ),
+        axis=1,
+    )
+    with np.errstate(divide="ignore"):
+        block_score = np.where(block_free > 0, block_gci / block_free, np.inf)
+    best_blocks = np.argsort(block_score, kind="stable")[:num_blocks]
+    best_blocks = best_blocks[np.isfinite(block_score[best_blocks])]
+    starts = (best_blocks[:, np.newaxis] * block_slots + np.arange(block_slots)).ravel()
+    return np.sort(starts[starts < amount_starts])
@@ -0,0 +1,56 @@
+"""Run interruptible jobs only during their reserved timeslots."""
+
+from datetime import datetime, UTC
+import subprocess
+import sys
+import time
+
+from src.cluster.commons import resume_job, suspend_job
+from src.sched.timetable import Timetable
+
+
+def get_run_intervals(
+    timetable: Timetable, job_id: str
+) -> list[tuple[datetime, datetime]]:
+    """Merge the reserved timeslots of a job into intervals in which it runs."""
+    intervals = []
+    for timeslot in timetable.get_job_slots(job_id):
+        if intervals and intervals[-1][1] == timeslot.start:
+            intervals[-1] = (intervals[-1][0], timeslot.end)
+        else:
+            intervals.append((timeslot.start, timeslot.end))
+    return intervals
+
+
+def run_interruptible(
+    slurm_job_id: str, intervals: list[tuple[datetime, datetime]]
+) -> None:
+    """Suspend the job at the end of each interval and resume it
+    at the start of the next one.
+
+    The job is expected to start at the first interval by itself (`--begin`).
+    Note that suspending jobs requires operator privileges in Slurm.
+    """
+    for index, (start, end) in enumerate(intervals):
+        if index > 0:
+            _sleep_until(start)
+            resume_job(slurm_job_id)
+        if index < len(intervals) - 1:
+            _sleep_until(end)
+            suspend_job(slurm_job_id)
+
+
+def start_executor(slurm_job_id: str) -> None:
+    """Run the executor for a job in a detached background process."""
+    subprocess.Popen(  # pylint: disable=consider-using-with
+        [sys.executable, "-m", "cli", "run-interruptible", slurm_job_id],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+
+
+def _sleep_until(point_in_time: datetime) -> None:
+    delta = (point_in_time - datetime.now(tz=UTC)).total_seconds()
+    if delta > 0:
+        time.sleep(delta)
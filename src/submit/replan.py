@@ -0,0 +1,100 @@
+"""Move pending jobs after forecast updates or when nodes fail."""
+
+from datetime import datetime, UTC
+
+from src.cluster.commons import get_nodes, get_unavailable_nodes, update_jobs
+from src.config.squirrel_conf import Config
+from src.data.timetable import tt_from_csv, tt_update
+from src.sched.replan import replace_nodes, replan
+from src.sched.scheduler import Scheduler
+from src.sched.timetable import Timetable
+from src.sched.windows import gci_array
+from src.submit.sbatch import get_strategy
+
+
+def replan_jobs(threshold: float, dry_run: bool = False) -> dict[str, datetime]:
+    """Re-plan pending jobs with the latest forecast.
+
+    The schedule is written before the begin times of all moved Slurm jobs
+    are updated in one scontrol call. The forecast is fetched beforehand, so
+    the schedule is only locked for writing.
+    With `dry_run`, neither Slurm nor the schedule are changed.
+    """
+    now = datetime.now(tz=UTC)
+    strategy = get_strategy(interruptible=False)
+    gci_data = Timetable().fetch_forecast(
+        start=now,
+        forecast_days=Config.get_forecast_days(),
+        lookback_days=Config.get_lookback_days(),
+    )
+
+    def update(timetable: Timetable) -> dict[str, datetime]:
+        old_gcis = gci_array(timetable.timeslots)
+        timetable.update_gci(gci_data)
+        return replan(timetable, old_gcis, now, strategy, threshold)
+
+    if dry_run:
+        return update(tt_from_csv(start=now))
+    # The new GCI of all timeslots is written, not only the moved jobs
+    moves = tt_update(start=now, update=update, forecast=False, rewrite=True)
+    # Only jobs which were submitted to Slurm have a numeric ID
+    update_jobs(
+        [
+            f"JobId={job_id} StartTime=now+{int((start - now).total_seconds())}"
+            for job_id, start in moves.items()
+            if job_id.isdigit()
+        ]
+    )
+    return moves
+
+
+def replace_failed_nodes(
+    nodes: list[str] | None = None, dry_run: bool = False
+) -> dict[str, tuple[datetime, str] | None]:
+    """Place pending jobs on other nodes if their nodes are down or drained.
+    By default, the node states are read from Slurm.
+
+    All moved Slurm jobs are updated in one scontrol call, with one update
+    of their begin time and node list each.
+    With `dry_run`, neither Slurm nor the schedule are changed.
+    """
+    now = datetime.now(tz=UTC)
+    cluster_json = Config.get_local_paths()["cluster_json"]
+    if nodes is None:
+        nodes = get_unavailable_nodes(path_to_json=cluster_json)
+    if len(nodes) == 0:
+        return {}
+    scheduler = Scheduler(
+        strategy=get_strategy(interruptible=False),
+        cluster_info=cluster_json,
+        max_horizon_hours=Config.get_max_horizon_days() * 24,
+    )
+    node_partitions = {
+        node["name"]: node["partitions"]
+        for node in get_nodes(path_to_json=cluster_json)
+    }
+
+    def update(timetable: Timetable) -> dict[str, tuple[datetime, str] | None]:
+        return replace_nodes(
+            scheduler=scheduler,
+            timetable=timetable,
+            nodes=nodes,
+            now=now,
+            node_partitions=node_partitions,
+        )
+
+    if dry_run:
+        return update(tt_from_csv(start=now))
+    placements = tt_update(start=now, update=update)
+    updates = []
+    for job_id, placement in placements.items():
+        # Only jobs which were submitted to Slurm have a numeric ID
+        if placement is None or not job_id.isdigit():
+            continue
+        start, node = placement
+        updates.append(
+            f"JobId={job_id} StartTime=now+{int((start - now).total_seconds())} "
+            f"ReqNodeList={node}"
+        )
+    update_jobs(updates)
+    return placements
@@ -1,64 +1,457 @@
 """Submit sbatch jobs"""
 
-from datetime import datetime, UTC
+from datetime import datetime, timedelta, UTC
+import getpass
+from pathlib import Path
+import subprocess
+import sys
 from uuid import uuid4
 
-from src.cluster.commons import sbatch
+from src.cluster.commons import parse_job_id, sbatch
 from src.config.squirrel_conf import Config
-from src.data.timetable import tt_from_csv, tt_to_csv
-from src.sched.scheduler import Scheduler, SpatiotemporalShifting
+from src.data.timetable import tt_commit, tt_from_csv, tt_update
+from src.forecasting.runtime import RuntimePredictor
+from src.sched.scheduler import (
+    BackfillShifting,
+    CarbonAgnosticFifo,
+    InterruptibleShifting,
+    PlanningStrategy,
+    Scheduler,
+    SpatialGreedyShifting,
+    SpatiotemporalShifting,
+    TemporalShifting,
+)
+from src.sched.multisite import MultiSiteScheduler, Site
+from src.sched.placement_cache import PlacementCache
+from src.submit.interruptible import start_executor
 
 
 def submit_sbatch(
-    command: str, runtime: int, partitions: list[str], num_gpus: int, gpu_name: str
+    command: str,
+    runtime: float,
+    partitions: list[str],
+    num_gpus: int,
+    gpu_name: str,
+    begin_after: datetime | None = None,
+    deadline: datetime | None = None,
+    shared: bool = False,
+    num_cpus: int | None = None,
+    memory: int | None = None,
+    interruptible: bool = False,
+    num_nodes: int = 1,
+    power_profile: list[float] | None = None,
+    multisite: bool = False,
+    max_delay: float | None = None,
 ):
-    """Submit a Slurm job in a carbon-aware manner."""
-    scheduler = Scheduler(
-        strategy=SpatiotemporalShifting(),
-        cluster_info=Config.get_local_paths()["cluster_json"],
-    )
+    """Submit a Slurm job in a carbon-aware manner.
+    With `multisite`, the job is placed on the cheapest of the configured sites.
+    With `max_delay`, the job starts at most this amount of hours from now.
+    """
     now = datetime.now(tz=UTC)
-    timetable = tt_from_csv(start=now)
-    start_timeslot, node = scheduler.schedule_sbatch(
-        timetable=timetable,
-        job_id=str(uuid4()),
-        hours=runtime,
-        partitions=partitions,
-        num_gpus=num_gpus,
-        gpu_name=gpu_name,
-    )
-    delta = (start_timeslot - now).seconds
-    print(
-        f"Schedule job on node {node} in {delta} seconds.",
-        sbatch(
-            suffix=f"{command.strip()} --time={runtime}:00:00 --begin=now+{delta} --nodelist={node} --exclusive"
-        ),
-    )
-    tt_to_csv(timetable)
+    job_id = str(uuid4())
+    # Reserve the predicted runtime, the time limit stays as requested
+    hours = runtime
+    if not interruptible and power_profile is None:
+        hours = _predict_runtime(command, runtime)
+    job_options = {
+        "partitions": partitions,
+        "num_gpus": num_gpus,
+        "gpu_name": gpu_name,
+        "begin_after": begin_after,
+        "deadline": deadline,
+        "start_before": _latest_start(now, max_delay),
+        "shared": shared,
+        "num_cpus": num_cpus,
+        "memory": memory,
+        "num_nodes": num_nodes,
+        "power_profile": power_profile,
+    }
+    # Reserve first, so that concurrent submissions see the reservation
+    if multisite:
+        site, start_timeslot, node = _reserve_multisite(
+            job_id, hours, now, interruptible, job_options
+        )
+        schedule_path, cluster = site.schedule_path, site.name
+    else:
+        scheduler = Scheduler(
+            strategy=get_strategy(interruptible),
+            cluster_info=Config.get_local_paths()["cluster_json"],
+            max_horizon_hours=Config.get_max_horizon_days() * 24,
+            placement_cache=_get_placement_cache(),
+        )
+        start_timeslot, node = tt_update(
+            start=now,
+            update=lambda timetable: scheduler.schedule_sbatch(
+                timetable=timetable, job_id=job_id, hours=hours, **job_options
+            ),
+        )
+        schedule_path, cluster = None, None
+    try:
+        slurm_job_id = _submit_reserved(
+            command,
+            runtime,
+            hours,
+            now,
+            start_timeslot,
+            node,
+            job_options,
+            cluster=cluster,
+        )
+    except BaseException:
+        # Release the reservation of the job which was not submitted
+        tt_update(
+            start=now,
+            update=lambda timetable: timetable.remove_job(job_id),
+            schedule_path=schedule_path,
+            forecast=False,
+        )
+        raise
+    if slurm_job_id is not None:
+        tt_update(
+            start=now,
+            update=lambda timetable: timetable.rename_job(job_id, slurm_job_id),
+            schedule_path=schedule_path,
+            forecast=False,
+        )
+    if interruptible and slurm_job_id is not None:
+        start_executor(slurm_job_id)
+    if not multisite and _get_placement_cache() is not None:
+        _start_precompute()
 
 
 def simulate_submit_sbatch(
     command: str,
-    runtime: int,
+    runtime: float,
     submit_date: datetime,
     partitions: list[str],
     num_gpus: int,
     gpu_name: str,
+    begin_after: datetime | None = None,
+    deadline: datetime | None = None,
+    shared: bool = False,
+    num_cpus: int | None = None,
+    memory: int | None = None,
+    interruptible: bool = False,
+    num_nodes: int = 1,
+    power_profile: list[float] | None = None,
+    max_delay: float | None = None,
 ):
     """Simulate submitting a Slurm job in a carbon-aware manner."""
     scheduler = Scheduler(
-        strategy=SpatiotemporalShifting(),
+        strategy=get_strategy(interruptible),
         cluster_info=Config.get_local_paths()["cluster_json"],
+        max_horizon_hours=Config.get_max_horizon_days() * 24,
+    )
+    job_id = str(uuid4())
+    start_timeslot, node = tt_update(
+        start=submit_date,
+        update=lambda timetable: scheduler.schedule_sbatch(
+            timetable=timetable,
+            job_id=job_id,
+            hours=runtime,
+            partitions=partitions,
+            num_gpus=num_gpus,
+            gpu_name=gpu_name,
+            begin_after=begin_after,
+            deadline=deadline,
+            start_before=_latest_start(submit_date, max_delay),
+            shared=shared,
+            num_cpus=num_cpus,
+            memory=memory,
+            num_nodes=num_nodes,
+            power_profile=power_profile,
+        ),
+    )
+    delta = int((start_timeslot - submit_date).total_seconds())
+    print(f"Schedule job on {node} in {delta} seconds.")
+
+
+def plan_sbatch(
+    runtime: float,
+    submit_date: datetime,
+    partitions: list[str],
+    num_gpus: int,
+    gpu_name: str,
+    k: int = 3,
+    strategy: str | None = None,
+    begin_after: datetime | None = None,
+    deadline: datetime | None = None,
+    shared: bool = False,
+    num_cpus: int | None = None,
+    memory: int | None = None,
+    interruptible: bool = False,
+    num_nodes: int = 1,
+    power_profile: list[float] | None = None,
+    max_delay: float | None = None,
+    pareto: bool = False,
+) -> list[dict]:
+    """Get the top-k placements of a Slurm job without submitting it.
+    With `pareto`, get all placements on the Pareto frontier of delay and
+    footprint instead. Nothing is written to the schedule.
+    """
+    scheduler = Scheduler(
+        strategy=get_strategy(interruptible, name=strategy),
+        cluster_info=Config.get_local_paths()["cluster_json"],
+        max_horizon_hours=Config.get_max_horizon_days() * 24,
     )
     timetable = tt_from_csv(start=submit_date)
-    start_timeslot, node = scheduler.schedule_sbatch(
+    start_before = _latest_start(submit_date, max_delay)
+    if pareto:
+        return scheduler.pareto_frontier(
+            timetable=timetable,
+            hours=runtime,
+            partitions=partitions,
+            num_gpus=num_gpus,
+            gpu_name=gpu_name,
+            begin_after=begin_after,
+            deadline=deadline,
+            power_profile=power_profile,
+            start_before=start_before,
+        )
+    return scheduler.plan(
         timetable=timetable,
-        job_id=str(uuid4()),
         hours=runtime,
         partitions=partitions,
+        k=k,
         num_gpus=num_gpus,
         gpu_name=gpu_name,
+        begin_after=begin_after,
+        deadline=deadline,
+        shared=shared,
+        num_cpus=num_cpus,
+        memory=memory,
+        num_nodes=num_nodes,
+        power_profile=power_profile,
+        start_before=start_before,
+    )
+
+
+def precompute_placements(submit_date: datetime) -> dict[str, dict]:
+    """Precompute the placements of the configured job shapes
+    for the current schedule and forecast.
+    """
+    cache_conf = Config.get_placement_cache()
+    if cache_conf is None:
+        raise ValueError("There is no [cache] section in the configuration.")
+    scheduler = Scheduler(
+        strategy=get_strategy(interruptible=False),
+        cluster_info=Config.get_local_paths()["cluster_json"],
+        max_horizon_hours=Config.get_max_horizon_days() * 24,
+    )
+    return PlacementCache(path=cache_conf["path"]).precompute(
+        scheduler=scheduler,
+        timetable=tt_from_csv(start=submit_date),
+        shapes=cache_conf["shapes"],
     )
-    delta = (start_timeslot - submit_date).seconds
-    print(f"Schedule job on node {node} in {delta} seconds.")
-    tt_to_csv(timetable)
+
+
+def update_runtime_history() -> int:
+    """Add the jobs which completed since the last update to the runtime
+    history. Returns the amount of added jobs.
+    """
+    options = Config.get_runtime_prediction()
+    if options is None:
+        raise ValueError("There is no [runtime] section in the configuration.")
+    return RuntimePredictor(**options).update()
+
+
+# Strategies which can be selected by name
+STRATEGIES = {
+    "fifo": CarbonAgnosticFifo,
+    "temporal": TemporalShifting,
+    "spatial-greedy": SpatialGreedyShifting,
+    "spatiotemporal": SpatiotemporalShifting,
+    "interruptible": InterruptibleShifting,
+    "backfill": BackfillShifting,
+}
+
+
+def _latest_start(submit_date: datetime, max_delay: float | None) -> datetime | None:
+    """Turn a maximum delay of the start (hours) into the latest start."""
+    if max_delay is None:
+        return None
+    return submit_date + timedelta(hours=max_delay)
+
+
+def time_limit(hours: float) -> str:
+    """Format hours as Slurm time limit, e.g. 1.5 becomes '1:30:00'."""
+    minutes = round(hours * 60)
+    return f"{minutes // 60}:{minutes % 60:02d}:00"
+
+
+def get_strategy(
+    interruptible: bool, meta_path: Path | None = None, name: str | None = None
+) -> PlanningStrategy:
+    """Get the planning strategy for a submission.
+    A `name` from STRATEGIES overrides the default strategy.
+    """
+    if name is not None:
+        strategy = STRATEGIES[name](meta_path=meta_path)
+    elif interruptible:
+        strategy = InterruptibleShifting(meta_path=meta_path)
+    else:
+        strategy = SpatiotemporalShifting(
+            block_hours=Config.get_block_hours(), meta_path=meta_path
+        )
+    strategy.power_cap = Config.get_power_cap()
+    strategy.best_fit = Config.use_best_fit()
+    return strategy
+
+
+def _get_multisite_scheduler(interruptible: bool) -> MultiSiteScheduler:
+    """Get a scheduler for all configured sites."""
+    sites = []
+    for site in Config.get_sites():
+        sites.append(
+            Site(
+                name=site["name"],
+                scheduler=Scheduler(
+                    strategy=get_strategy(interruptible, meta_path=site["meta"]),
+                    cluster_info=site["cluster_json"],
+                    max_horizon_hours=Config.get_max_horizon_days() * 24,
+                ),
+                zone=site["zone"],
+                schedule_path=site["schedule"],
+            )
+        )
+    if len(sites) == 0:
+        raise ValueError("There are no sites in the configuration.")
+    return MultiSiteScheduler(sites=sites)
+
+
+def _reserve_multisite(
+    job_id: str, hours: float, now: datetime, interruptible: bool, job_options: dict
+) -> tuple[Site, datetime, str]:
+    """Reserve the job on the site with the lowest footprint.
+    If the schedule of that site changed since it was loaded, the job is
+    placed again on the same site in a read-modify-write cycle.
+    """
+    multisite_scheduler = _get_multisite_scheduler(interruptible)
+    multisite_scheduler.load(start=now)
+    site, start_timeslot, node = multisite_scheduler.schedule_sbatch(
+        job_id=job_id, hours=hours, **job_options
+    )
+    if not tt_commit(site.timetable, [job_id], site.schedule_path, site.version):
+        start_timeslot, node = tt_update(
+            start=now,
+            update=lambda timetable: site.scheduler.schedule_sbatch(
+                timetable=timetable, job_id=job_id, hours=hours, **job_options
+            ),
+            schedule_path=site.schedule_path,
+            options=site.get_options(),
+        )
+    return site, start_timeslot, node
+
+
+def _predict_runtime(command: str, runtime: float) -> float:
+    """Predict the hours a job runs, based on the accounting history.
+    Without runtime prediction, the requested hours are returned.
+    """
+    options = Config.get_runtime_prediction()
+    if options is None:
+        return runtime
+    predictor = RuntimePredictor(**options)
+    # Submissions use the cached history, sacct is only queried when it is due
+    if predictor.is_due():
+        try:
+            predictor.update()
+        except (OSError, subprocess.CalledProcessError):
+            # Accounting is unavailable, use the history as it is
+            pass
+    return predictor.predict(
+        getpass.getuser(),
+        _get_job_name(command),
+        runtime,
+        slot_minutes=Config.get_slot_minutes(),
+    )
+
+
+def _get_job_name(command: str) -> str:
+    """Get the job name like Slurm does: from --job-name or -J,
+    otherwise the name of the batch script.
+    """
+    words = command.split()
+    for index, word in enumerate(words):
+        if word.startswith("--job-name="):
+            return word.removeprefix("--job-name=")
+        if word in ["-J", "--job-name"] and index + 1 < len(words):
+            return words[index + 1]
+    for word in reversed(words):
+        if not word.startswith("-"):
+            return Path(word).name
+    return "sbatch"
+
+
+def _get_placement_cache() -> PlacementCache | None:
+    cache_conf = Config.get_placement_cache()
+    if cache_conf is None:
+        return None
+    return PlacementCache(path=cache_conf["path"])
+
+
+def _start_precompute() -> None:
+    """Refresh the placement cache in a detached background process."""
+    subprocess.Popen(  # pylint: disable=consider-using-with
+        [sys.executable, "-m", "cli", "precompute-placements"],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+
+
+def _submit_reserved(
+    command: str,
+    runtime: float,
+    hours: float,
+    now: datetime,
+    start_timeslot: datetime,
+    node: str,
+    job_options: dict,
+    cluster: str | None = None,
+) -> str | None:
+    """Submit a job with sbatch at the start of its reservation.
+    Returns the Slurm job ID, which identifies the reservation from now on.
+    """
+    cluster_option = f" --clusters={cluster}" if cluster is not None else ""
+    delta = int((start_timeslot - now).total_seconds())
+    sbatch_output = sbatch(
+        suffix=f"{command.strip()} --time={time_limit(runtime)} --begin=now+{delta} --nodelist={node} "
+        + _resource_options(
+            job_options["shared"],
+            job_options["num_cpus"],
+            job_options["memory"],
+            job_options["num_gpus"],
+            job_options["gpu_name"],
+        )
+        + (
+            f" --nodes={job_options['num_nodes']}"
+            if job_options["num_nodes"] > 1
+            else ""
+        )
+        + cluster_option
+    )
+    print(
+        f"Schedule job on {node}{cluster_option} in {delta} seconds "
+        f"for {hours} hours.",
+        sbatch_output,
+    )
+    return parse_job_id(sbatch_output)
+
+
+def _resource_options(
+    shared: bool,
+    num_cpus: int | None,
+    memory: int | None,
+    num_gpus: int | None,
+    gpu_name: str | None,
+) -> str:
+    """Get sbatch options for the resources which were reserved."""
+    if not shared:
+        return "--exclusive"
+    options = f"--ntasks=1 --cpus-per-task={num_cpus or 1}"
+    if memory:
+        options += f" --mem={memory}M"
+    if num_gpus:
+        gpu_type = f"{gpu_name}:" if gpu_name else ""
+        options += f" --gres=gpu:{gpu_type}{num_gpus}"
+    return options
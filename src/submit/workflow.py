@@ -0,0 +1,258 @@
+"""Submit workflows of dependent sbatch jobs in a single scheduler pass."""
+
+from datetime import datetime, timedelta, UTC
+import heapq
+from json import loads
+from math import ceil
+from pathlib import Path
+from typing import Any
+from uuid import uuid4
+
+from src.cluster.commons import parse_job_id, sbatch
+from src.config.squirrel_conf import Config
+from src.data.timetable import tt_update
+from src.sched.scheduler import Scheduler
+from src.sched.timetable import Timetable
+from src.submit.sbatch import get_strategy, time_limit
+
+
+def read_workflow(path: Path) -> list[dict[str, Any]]:
+    """Read the jobs of a workflow from a JSON or YAML file.
+
+    Each job has a unique `name`, a `command`, a `runtime` in hours and
+    a comma separated list of partitions as `partition`. Optional keys are
+    `gpus_per_node`, `nodes` and `after`, the list of jobs which have to
+    finish successfully before.
+    """
+    if path.suffix in [".yaml", ".yml"]:
+        try:
+            import yaml  # pylint: disable=import-outside-toplevel
+        except ImportError as e:
+            raise ValueError("Reading YAML workflows requires PyYAML.") from e
+        workflow = yaml.safe_load(path.read_text())
+    else:
+        workflow = loads(path.read_text())
+    jobs = workflow.get("jobs")
+    names = [job["name"] for job in jobs]
+    if len(set(names)) != len(names):
+        raise ValueError("Job names in a workflow must be unique.")
+    for job in jobs:
+        for parent in job.get("after", []):
+            if parent not in names:
+                raise ValueError(f"Job {job['name']} depends on unknown job {parent}.")
+    return jobs
+
+
+def critical_paths(jobs: list[dict[str, Any]]) -> dict[str, int]:
+    """Get the length of the critical path starting at each job, i.e.
+    the longest chain of runtimes from the job until the end of the workflow.
+    """
+    by_name = {job["name"]: job for job in jobs}
+    children = _get_children(jobs)
+    # Topological order (Kahn's algorithm)
+    topo_order = []
+    missing_parents = {job["name"]: len(job.get("after", [])) for job in jobs}
+    ready = [name for name, amount in missing_parents.items() if amount == 0]
+    while ready:
+        name = ready.pop()
+        topo_order.append(name)
+        for child in children[name]:
+            missing_parents[child] -= 1
+            if missing_parents[child] == 0:
+                ready.append(child)
+    if len(topo_order) != len(jobs):
+        raise ValueError("The workflow contains a cycle.")
+    critical_path = {}
+    for name in reversed(topo_order):
+        critical_path[name] = by_name[name]["runtime"] + max(
+            (critical_path[child] for child in children[name]), default=0
+        )
+    return critical_path
+
+
+def plan_order(jobs: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Order jobs topologically. Among jobs which are ready,
+    jobs on the critical path come first.
+    """
+    by_name = {job["name"]: job for job in jobs}
+    position = {name: index for index, name in enumerate(by_name)}
+    children = _get_children(jobs)
+    critical_path = critical_paths(jobs)
+    missing_parents = {job["name"]: len(job.get("after", [])) for job in jobs}
+    result = []
+    ready = [
+        (-critical_path[name], position[name], name)
+        for name in by_name
+        if missing_parents[name] == 0
+    ]
+    heapq.heapify(ready)
+    while ready:
+        _, _, name = heapq.heappop(ready)
+        result.append(by_name[name])
+        for child in children[name]:
+            missing_parents[child] -= 1
+            if missing_parents[child] == 0:
+                heapq.heappush(ready, (-critical_path[child], position[child], child))
+    return result
+
+
+def schedule_workflow(
+    scheduler: Scheduler, timetable: Timetable, jobs: list[dict[str, Any]]
+) -> dict[str, dict[str, Any]]:
+    """Place all jobs of a workflow, so that no job starts
+    before the jobs it depends on have ended.
+
+    Each job has to end early enough, so that the critical path
+    behind it still fits into the timetable. The timetable is extended
+    for the critical path first, as far as the maximum horizon allows.
+    """
+    critical_path = critical_paths(jobs)
+    placements = {}
+    for job in plan_order(jobs):
+        successor_hours = critical_path[job["name"]] - job["runtime"]
+        num_gpus, gpu_name = _parse_gpus(job.get("gpus_per_node"))
+        parents = [placements[parent] for parent in job.get("after", [])]
+        begin_after = max((parent["end"] for parent in parents), default=None)
+        scheduler.extend_horizon(
+            timetable=timetable,
+            num_slots=ceil(critical_path[job["name"]] * 60 / timetable.slot_minutes),
+            begin_after=begin_after,
+        )
+        job_id = str(uuid4())
+        start, node = scheduler.schedule_sbatch(
+            timetable=timetable,
+            job_id=job_id,
+            hours=job["runtime"],
+            partitions=job["partition"].split(","),
+            num_gpus=num_gpus,
+            gpu_name=gpu_name,
+            begin_after=begin_after,
+            deadline=timetable.get_latest().end - timedelta(hours=successor_hours),
+            num_nodes=job.get("nodes", 1),
+        )
+        placements.update(
+            {
+                job["name"]: {
+                    "job_id": job_id,
+                    "start": start,
+                    "end": timetable.get_job_slots(job_id)[-1].end,
+                    "node": node,
+                }
+            }
+        )
+    return placements
+
+
+def submit_workflow(path: Path):
+    """Submit a workflow of Slurm jobs in a carbon-aware manner."""
+    jobs = read_workflow(path)
+    scheduler = _get_scheduler()
+    now = datetime.now(tz=UTC)
+    # Reserve first, so that concurrent submissions see the reservations
+    placements = tt_update(
+        start=now,
+        update=lambda timetable: schedule_workflow(scheduler, timetable, jobs),
+    )
+    # Submit in topological order, so that dependencies have Slurm job IDs
+    slurm_job_ids = {}
+    try:
+        for job in plan_order(jobs):
+            placement = placements[job["name"]]
+            delta = int((placement["start"] - now).total_seconds())
+            suffix = (
+                f"{job['command'].strip()} --time={time_limit(job['runtime'])} "
+                f"--begin=now+{delta} --nodelist={placement['node']} --exclusive"
+            )
+            if job.get("nodes", 1) > 1:
+                suffix += f" --nodes={job['nodes']}"
+            suffix += _dependency_option(job, slurm_job_ids)
+            sbatch_output = sbatch(suffix=suffix)
+            print(
+                f"Schedule job {job['name']} on {placement['node']} in {delta} seconds.",
+                sbatch_output,
+            )
+            slurm_job_ids.update({job["name"]: parse_job_id(sbatch_output)})
+    finally:
+        tt_update(
+            start=now,
+            update=lambda timetable: _rename_submitted(
+                timetable, placements, slurm_job_ids
+            ),
+            forecast=False,
+        )
+
+
+def simulate_submit_workflow(path: Path, submit_date: datetime):
+    """Simulate submitting a workflow of Slurm jobs in a carbon-aware manner."""
+    jobs = read_workflow(path)
+    scheduler = _get_scheduler()
+    placements = tt_update(
+        start=submit_date,
+        update=lambda timetable: schedule_workflow(scheduler, timetable, jobs),
+    )
+    for job in plan_order(jobs):
+        placement = placements[job["name"]]
+        delta = int((placement["start"] - submit_date).total_seconds())
+        print(f"Schedule job {job['name']} on {placement['node']} in {delta} seconds.")
+
+
+def _rename_submitted(
+    timetable: Timetable,
+    placements: dict[str, dict[str, Any]],
+    slurm_job_ids: dict[str, str | None],
+):
+    """Identify the reservations of submitted jobs by their Slurm job IDs,
+    and release the reservations of jobs which were not submitted.
+    """
+    for name, placement in placements.items():
+        if name not in slurm_job_ids:
+            timetable.remove_job(placement["job_id"])
+        elif slurm_job_ids[name] is not None:
+            timetable.rename_job(placement["job_id"], slurm_job_ids[name])
+            placement["job_id"] = slurm_job_ids[name]
+
+
+def _dependency_option(
+    job: dict[str, Any], slurm_job_ids: dict[str, str | None]
+) -> str:
+    """Get the sbatch option which lets a job wait for its parents.
+
+    Raises:
+        ValueError: If sbatch returned no Slurm job ID for a parent.
+    """
+    parents = job.get("after", [])
+    missing = [parent for parent in parents if slurm_job_ids[parent] is None]
+    if missing:
+        raise ValueError(
+            f"Job {job['name']} cannot depend on {', '.join(missing)}, "
+            "because sbatch returned no Slurm job ID."
+        )
+    if len(parents) == 0:
+        return ""
+    return f" --dependency=afterok:{':'.join(slurm_job_ids[p] for p in parents)}"
+
+
+def _get_children(jobs: list[dict[str, Any]]) -> dict[str, list[str]]:
+    children = {job["name"]: [] for job in jobs}
+    for job in jobs:
+        for parent in job.get("after", []):
+            children[parent].append(job["name"])
+    return children
+
+
+def _get_scheduler() -> Scheduler:
+    return Scheduler(
+        strategy=get_strategy(interruptible=False),
+        cluster_info=Config.get_local_paths()["cluster_json"],
+        max_horizon_hours=Config.get_max_horizon_days() * 24,
+    )
+
+
+def _parse_gpus(gpus_per_node: str | None) -> tuple[int | None, str | None]:
+    """Parse GPU request of the form [type:]number."""
+    if not gpus_per_node:
+        return None, None
+    gpu_options = str(gpus_per_node).split(":")
+    if len(gpu_options) == 2:
+        return int(gpu_options[1]), gpu_options[0]
+    return int(gpu_options[0]), None
@@ -0,0 +1,43 @@
+"""Fixtures shared by the tests: the 3-node cluster and hourly timetables."""
+
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pandas as pd
+
+from src.sched.timetable import Timetable
+
+CLUSTER_PATH = Path("src") / "sim" / "data" / "3-node-cluster.json"
+META_PATH = Path("src") / "sim" / "data" / "3-node-meta.cfg"
+START = datetime.fromisoformat("2024-01-01T00:00:00+00:00")
+
+
+def gci_data(gcis: list[float], first: int = 0) -> pd.DataFrame:
+    """Create hourly GCI data which starts `first` hours after START."""
+    return pd.DataFrame(
+        {
+            "time": [
+                pd.Timestamp(START + timedelta(hours=first + i))
+                for i in range(len(gcis))
+            ],
+            "gci": gcis,
+        }
+    )
+
+
+def rising_gci_data(first: int, amount: int) -> pd.DataFrame:
+    """Create hourly GCI data whose GCI is 100 at START and rises by 1 per hour."""
+    return gci_data([100.0 + i for i in range(first, first + amount)], first)
+
+
+def hourly_timetable(gcis: list[float], slot_minutes: int = 60) -> Timetable:
+    """Create a timetable with hourly GCI data starting at START."""
+    result = Timetable(slot_minutes=slot_minutes)
+    result.append_direct(gci_data(gcis))
+    return result
+
+
+def reserve(timetable: Timetable, job_id: str, index: int, node: str) -> None:
+    """Reserve a node exclusively for a job in one timeslot."""
+    slot = timetable.timeslots[index]
+    slot.allocate_node_exclusive(job_id, node, slot.start, slot.end)
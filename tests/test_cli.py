@@ -0,0 +1,56 @@
+"""Command line interface"""
+
+from pathlib import Path
+from tempfile import TemporaryDirectory
+import unittest
+
+from typer.testing import CliRunner
+
+from cli.main import app
+from src.config.squirrel_conf import Config
+from src.data.timetable import tt_to_csv
+from tests.helpers import hourly_timetable, reserve
+
+
+class TestRunInterruptible(unittest.TestCase):
+    """Test the executor command of interruptible jobs."""
+
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.schedule = Config.conf["local"]["schedule"]
+        Config.conf["local"]["schedule"] = str(Path(self.tmp.name) / "schedule.csv")
+
+    def tearDown(self):
+        Config.conf["local"]["schedule"] = self.schedule
+        self.tmp.cleanup()
+
+    def test_run(self):
+        """A job whose only interval is over is left running."""
+        schedule = hourly_timetable([1.0, 2.0])
+        reserve(schedule, "1", 0, "cx16")
+        reserve(schedule, "1", 1, "cx16")
+        tt_to_csv(schedule)
+        result = CliRunner().invoke(app, ["run-interruptible", "1"])
+        self.assertIsNone(result.exception)
+        self.assertEqual(result.exit_code, 0)
+
+    def test_no_reservation(self):
+        """Jobs without a reservation are reported."""
+        result = CliRunner().invoke(app, ["run-interruptible", "2"])
+        self.assertEqual(result.exit_code, 1)
+        self.assertIn("There is no reservation for job 2.", result.output)
+
+
+class TestParseDate(unittest.TestCase):
+    """Test parsing dates of the options."""
+
+    def test_invalid(self):
+        """Dates which are not in ISO format are reported without a traceback."""
+        result = CliRunner().invoke(app, ["plan", "1", "--deadline", "tomorrow"])
+        self.assertEqual(result.exit_code, 2)
+        self.assertNotIsInstance(result.exception, ValueError)
+        self.assertIn("is not a date in ISO format", result.output)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,167 @@
+"""Columnar schedule storage"""
+
+from datetime import timedelta
+from pathlib import Path
+from tempfile import TemporaryDirectory
+import unittest
+
+from src.data import columns as mut  # module-under-test
+from src.data.timetable import read_schedule, tt_to_csv
+from src.sched.scheduler import Scheduler, TemporalShifting
+from src.sched.timetable import Timetable
+from tests.helpers import CLUSTER_PATH, hourly_timetable, META_PATH, START
+
+
+def _timetable() -> Timetable:
+    """Create a timetable with exclusive, shared and multi-node jobs."""
+    timetable = hourly_timetable([300.5, 200, 250, 100, 150, 50])
+    scheduler = Scheduler(
+        strategy=TemporalShifting(meta_path=META_PATH), cluster_info=CLUSTER_PATH
+    )
+    scheduler.strategy.power_cap = 10000
+    scheduler.schedule_sbatch(
+        timetable=timetable,
+        job_id="1",
+        hours=1.5,
+        partitions=["jinx"],
+        deadline=START + timedelta(hours=4),
+    )
+    scheduler.schedule_sbatch(
+        timetable=timetable,
+        job_id="2",
+        hours=1,
+        partitions=["jinx"],
+        shared=True,
+        num_cpus=2,
+        memory=1024,
+    )
+    scheduler.schedule_sbatch(
+        timetable=timetable, job_id="3", hours=2, partitions=["jinx"], num_nodes=2
+    )
+    return timetable
+
+
+class TestColumns(unittest.TestCase):
+    """Test encoding the schedule as columns."""
+
+    def test_roundtrip(self):
+        """Timeslots and reservations are restored exactly."""
+        timetable = _timetable()
+        timetable.timeslots[0].reserved_resources.update(
+            {"r": {"start": START.isoformat(), "end": START.isoformat(), "node": "x"}}
+        )
+        timetable.timeslots[0].jobs.update({"4": "r"})
+        timetable.timeslots[0].reserved_resources["r"].update({"custom": [1, 2]})
+        timeslots = mut.from_columns(mut.to_columns(timetable.timeslots))
+        self.assertEqual(len(timeslots), len(timetable.timeslots))
+        for restored, original in zip(timeslots, timetable.timeslots):
+            self.assertEqual(
+                (restored.start, restored.end, restored.gci),
+                (original.start, original.end, original.gci),
+            )
+            self.assertEqual(restored.jobs, original.jobs)
+            self.assertEqual(restored.reserved_resources, original.reserved_resources)
+
+    def test_range(self):
+        """Only the requested timeslots are decoded."""
+        timetable = _timetable()
+        timeslots = mut.from_columns(mut.to_columns(timetable.timeslots), 3, 5)
+        self.assertEqual(
+            [ts.start for ts in timeslots],
+            [ts.start for ts in timetable.timeslots[3:5]],
+        )
+        self.assertEqual(
+            [ts.reserved_resources for ts in timeslots],
+            [ts.reserved_resources for ts in timetable.timeslots[3:5]],
+        )
+
+    def test_empty(self):
+        """Empty timetables can be stored as well."""
+        self.assertEqual(mut.from_columns(mut.to_columns([])), [])
+
+
+class TestMappedColumns(unittest.TestCase):
+    """Test memory-mapped columns of the schedule."""
+
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.directory = Path(self.tmp.name) / "schedule.cols"
+        self.timetable = _timetable()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_roundtrip(self):
+        """All timeslots are read without a range."""
+        mut.write_columns(self.timetable.timeslots, self.directory, "a")
+        timeslots = mut.read_columns(self.directory)
+        self.assertEqual(
+            [ts.reserved_resources for ts in timeslots],
+            [ts.reserved_resources for ts in self.timetable.timeslots],
+        )
+
+    def test_range(self):
+        """Only timeslots which end after `since` and start before `until` are read."""
+        mut.write_columns(self.timetable.timeslots, self.directory, "a")
+        timeslots = mut.read_columns(
+            self.directory,
+            since=START + timedelta(hours=1),
+            until=START + timedelta(hours=4),
+        )
+        self.assertEqual(
+            [ts.start for ts in timeslots],
+            [START + timedelta(hours=i) for i in range(1, 4)],
+        )
+        self.assertEqual(
+            timeslots[0].reserved_resources,
+            self.timetable.timeslots[1].reserved_resources,
+        )
+        self.assertEqual(
+            mut.read_columns(self.directory, since=START + timedelta(days=1)), []
+        )
+
+    def test_versions(self):
+        """The latest version is read, the one before is kept for readers."""
+        for snapshot_id in ["a", "b", "c"]:
+            mut.write_columns(self.timetable.timeslots, self.directory, snapshot_id)
+            self.timetable.timeslots = self.timetable.timeslots[1:]
+        self.assertEqual(mut.read_columns_snapshot_id(self.directory), "c")
+        self.assertEqual(len(mut.read_columns(self.directory)), 4)
+        self.assertEqual(
+            sorted(path.name for path in self.directory.iterdir() if path.is_dir()),
+            ["b", "c"],
+        )
+
+
+class TestReadSchedule(unittest.TestCase):
+    """Test reading the schedule from disk."""
+
+    def test_migration(self):
+        """A CSV schedule is read until the columnar one exists."""
+        timetable = _timetable()
+        with TemporaryDirectory() as tmp:
+            csv_path = Path(tmp) / "schedule.csv"
+            loaded = Timetable()
+            self.assertFalse(read_schedule(loaded, csv_path))
+            timetable.write_csv(csv_path)
+            loaded = Timetable()
+            self.assertTrue(read_schedule(loaded, csv_path))
+            self.assertEqual(len(loaded.timeslots), 6)
+            timetable.timeslots = timetable.timeslots[:2]
+            timetable.write_npz(csv_path.with_suffix(".npz"))
+            loaded = Timetable()
+            self.assertTrue(read_schedule(loaded, csv_path))
+            self.assertEqual(len(loaded.timeslots), 2)
+            tt_to_csv(timetable, schedule_path=csv_path)
+            self.assertFalse(csv_path.with_suffix(".npz").exists())
+            loaded = Timetable()
+            self.assertTrue(
+                read_schedule(loaded, csv_path, since=START + timedelta(hours=1))
+            )
+            self.assertEqual(
+                [ts.start for ts in loaded.timeslots], [START + timedelta(hours=1)]
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+"""Schedule journal"""
+
+from pathlib import Path
+from tempfile import TemporaryDirectory
+import unittest
+
+from src.data import journal as mut  # module-under-test
+from src.data.timetable import read_schedule, tt_append, tt_to_csv
+from src.sched.timetable import Timetable
+from tests.helpers import reserve, rising_gci_data, START
+
+
+def _load(schedule_path: Path) -> Timetable:
+    timetable = Timetable()
+    read_schedule(timetable, schedule_path)
+    return timetable
+
+
+class TestJournal(unittest.TestCase):
+    """Test appending changes of the schedule to a journal."""
+
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.schedule_path = Path(self.tmp.name) / "schedule.csv"
+        self.journal = mut.journal_path(self.schedule_path)
+        self.timetable = Timetable()
+        self.timetable.append_direct(rising_gci_data(0, 4))
+        reserve(self.timetable, "1", 0, "cx16")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_first_write(self):
+        """Without a snapshot, the whole schedule is written."""
+        tt_append(self.timetable, ["1"], schedule_path=self.schedule_path)
+        self.assertTrue(self.schedule_path.with_suffix(".cols").exists())
+        self.assertFalse(self.journal.exists())
+        self.assertEqual(_load(self.schedule_path).get_job_slots("1")[0].start, START)
+
+    def test_append(self):
+        """Later jobs and timeslots are appended and replayed."""
+        tt_to_csv(self.timetable, schedule_path=self.schedule_path)
+        self.timetable.append_direct(rising_gci_data(4, 2))
+        reserve(self.timetable, "2", 5, "cx17")
+        self.timetable.remove_job("1")
+        tt_append(self.timetable, ["1", "2"], schedule_path=self.schedule_path)
+        self.assertEqual(len(self.journal.read_text().splitlines()), 4)
+        loaded = _load(self.schedule_path)
+        self.assertEqual(len(loaded.timeslots), 6)
+        self.assertEqual(loaded.timeslots[5].gci, 105.0)
+        self.assertEqual(loaded.get_job_slots("1"), [])
+        self.assertEqual(
+            loaded.get_job_slots("2")[0].get_reservation("2")["node"], "cx17"
+        )
+
+    def test_torn_write(self):
+        """An interrupted last record is ignored."""
+        tt_to_csv(self.timetable, schedule_path=self.schedule_path)
+        reserve(self.timetable, "2", 1, "cx17")
+        tt_append(self.timetable, ["2"], schedule_path=self.schedule_path)
+        with open(self.journal, "a", encoding="utf-8") as file:
+            file.write('{"op": "cancel", "jo')
+        loaded = _load(self.schedule_path)
+        self.assertEqual(len(loaded.get_job_slots("2")), 1)
+
+    def test_compaction(self):
+        """Compaction outdates the journal, even if it is not removed."""
+        tt_to_csv(self.timetable, schedule_path=self.schedule_path)
+        reserve(self.timetable, "2", 1, "cx17")
+        tt_append(self.timetable, ["2"], schedule_path=self.schedule_path)
+        stale = self.journal.read_text()
+        self.timetable.remove_job("2")
+        tt_to_csv(self.timetable, schedule_path=self.schedule_path)
+        self.assertFalse(self.journal.exists())
+        self.journal.write_text(stale)
+        self.assertEqual(_load(self.schedule_path).get_job_slots("2"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+"""Multi-site scheduling"""
+
+from datetime import timedelta
+from pathlib import Path
+from tempfile import TemporaryDirectory
+import unittest
+
+from src.config.squirrel_conf import Config
+from src.data.timetable import tt_commit, tt_to_csv
+from src.sched import multisite as mut  # module-under-test
+from src.sched.scheduler import Scheduler, SpatiotemporalShifting
+from tests.helpers import CLUSTER_PATH, hourly_timetable, META_PATH, START
+
+
+def _site(name: str, gcis: list[float]) -> mut.Site:
+    return mut.Site(
+        name=name,
+        scheduler=Scheduler(
+            strategy=SpatiotemporalShifting(meta_path=META_PATH),
+            cluster_info=CLUSTER_PATH,
+        ),
+        zone=name.upper(),
+        timetable=hourly_timetable(gcis),
+    )
+
+
+class TestMultiSiteScheduler(unittest.TestCase):
+    """Test choosing the site with the lowest footprint."""
+
+    def test_cheapest_site(self):
+        """The job is placed on the greener site and removed from the other."""
+        dirty = _site("dirty", [300, 250, 400, 350])
+        green = _site("green", [200, 50, 80, 300])
+        obj = mut.MultiSiteScheduler(sites=[dirty, green])
+        site, start, node = obj.schedule_sbatch(
+            job_id="1", hours=2, partitions=["jinx"]
+        )
+        self.assertEqual(site.name, "green")
+        self.assertEqual(start, START + timedelta(hours=1))
+        self.assertEqual(
+            green.timetable.get_job_slots("1")[0].get_reservation("1")["node"], node
+        )
+        self.assertEqual(len(dirty.timetable.get_job_slots("1")), 0)
+
+    def test_unsuitable_site(self):
+        """Sites without suitable nodes are skipped."""
+        obj = mut.MultiSiteScheduler(sites=[_site("a", [100, 100])])
+        with self.assertRaises(mut.NoWindowAllocatedException):
+            obj.schedule_sbatch(job_id="1", hours=3, partitions=["jinx"])
+
+
+class TestLoadSites(unittest.TestCase):
+    """Test loading the schedules of the sites in parallel."""
+
+    def test_commit_sqlite(self):
+        """SQLite schedules which were loaded in other threads can be committed."""
+        with TemporaryDirectory() as tmp:
+            sites = []
+            for name in ["a", "b"]:
+                schedule_path = Path(tmp) / f"{name}.db"
+                # The schedules cover the forecast, so nothing is fetched
+                tt_to_csv(
+                    hourly_timetable([100] * 24 * Config.get_forecast_days()),
+                    schedule_path=schedule_path,
+                )
+                site = _site(name, [])
+                site.schedule_path = schedule_path
+                sites.append(site)
+            obj = mut.MultiSiteScheduler(sites=sites)
+            obj.load(start=START)
+            site, _, _ = obj.schedule_sbatch(job_id="1", hours=2, partitions=["jinx"])
+            self.assertTrue(
+                tt_commit(site.timetable, ["1"], site.schedule_path, site.version)
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
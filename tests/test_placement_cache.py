@@ -0,0 +1,130 @@
+"""Placement cache"""
+
+from datetime import timedelta
+import json
+from pathlib import Path
+from tempfile import TemporaryDirectory
+import unittest
+
+from src.sched import placement_cache as mut  # module-under-test
+from src.sched.scheduler import Scheduler, TemporalShifting
+from src.sched.timetable import Timetable
+from tests.helpers import CLUSTER_PATH, hourly_timetable, META_PATH, START
+
+SHAPES = [
+    {"hours": 1, "partitions": ["jinx"], "num_gpus": None},
+    {"hours": 2, "partitions": ["jinx"], "num_gpus": None},
+]
+
+
+def _timetable(gcis: list[float]) -> Timetable:
+    timetable = hourly_timetable(gcis)
+    # As if it was read from the first version of a schedule
+    timetable.stored_version = 1
+    return timetable
+
+
+class TestPlacementCache(unittest.TestCase):
+    """Test precomputing and looking up placements."""
+
+    def setUp(self):
+        self.tmp_dir = TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.cache = mut.PlacementCache(path=Path(self.tmp_dir.name) / "cache.json")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _scheduler(
+        self, cache: mut.PlacementCache | None = None, cluster_info: Path = CLUSTER_PATH
+    ) -> Scheduler:
+        return Scheduler(
+            strategy=TemporalShifting(meta_path=META_PATH),
+            cluster_info=cluster_info,
+            placement_cache=cache,
+        )
+
+    def test_hit(self):
+        """Jobs of a cached shape get the precomputed placement."""
+        timetable = _timetable([300, 100, 50, 300])
+        placements = self.cache.precompute(self._scheduler(), timetable, SHAPES)
+        self.assertEqual(len(placements), 2)
+        self.assertEqual(timetable.get_job_slots("plan-0"), [])
+        # Read the cache from disk
+        cache = mut.PlacementCache(path=self.cache.path)
+        lookup = cache.lookup(timetable, "TemporalShifting", 2, ["jinx"], None)
+        self.assertEqual(lookup[0], START + timedelta(hours=1))
+        start, node = self._scheduler(cache).schedule_sbatch(
+            timetable=timetable, job_id="1", hours=2, partitions=["jinx"]
+        )
+        self.assertEqual((start, node), lookup)
+        self.assertEqual(len(timetable.get_job_slots("1")), 2)
+
+    def test_float_hours(self):
+        """Runtimes of the same minutes are the same shape, int or float."""
+        timetable = _timetable([300, 100, 50, 300])
+        self.cache.precompute(self._scheduler(), timetable, SHAPES)
+        self.assertEqual(
+            self.cache.lookup(timetable, "TemporalShifting", 2.0, ["jinx"], None),
+            self.cache.lookup(timetable, "TemporalShifting", 2, ["jinx"], None),
+        )
+        self.assertIsNotNone(
+            self.cache.lookup(timetable, "TemporalShifting", 1.0, ["jinx"], None)
+        )
+        self.assertIsNone(
+            self.cache.lookup(timetable, "TemporalShifting", 1.5, ["jinx"], None)
+        )
+
+    def test_stale_version(self):
+        """Writes to the schedule invalidate the cache."""
+        timetable = _timetable([300, 100, 50, 300])
+        self.cache.precompute(self._scheduler(), timetable, SHAPES)
+        timetable.timeslots[0].set_gci(10)
+        timetable.stored_version = 2
+        self.assertIsNone(
+            self.cache.lookup(timetable, "TemporalShifting", 1, ["jinx"], None)
+        )
+        start, _ = self._scheduler(self.cache).schedule_sbatch(
+            timetable=timetable, job_id="1", hours=1, partitions=["jinx"]
+        )
+        self.assertEqual(start, START)
+
+    def test_unstored(self):
+        """Timetables which were not read from a schedule miss."""
+        timetable = _timetable([300, 100, 50, 300])
+        self.cache.precompute(self._scheduler(), timetable, SHAPES)
+        timetable.stored_version = None
+        self.assertIsNone(
+            self.cache.lookup(timetable, "TemporalShifting", 1, ["jinx"], None)
+        )
+
+    def test_node_down(self):
+        """Placements on nodes which went down are not used."""
+        timetable = _timetable([300, 100, 50, 300])
+        self.cache.precompute(self._scheduler(), timetable, SHAPES)
+        _, node = self.cache.lookup(timetable, "TemporalShifting", 1, ["jinx"], None)
+        cluster = json.loads(CLUSTER_PATH.read_text())
+        for cluster_node in cluster["nodes"]:
+            if cluster_node["name"] == node:
+                cluster_node["state"] = ["DOWN"]
+        cluster_path = Path(self.tmp_dir.name) / "cluster.json"
+        cluster_path.write_text(json.dumps(cluster))
+        start, other = self._scheduler(self.cache, cluster_path).schedule_sbatch(
+            timetable=timetable, job_id="1", hours=1, partitions=["jinx"]
+        )
+        self.assertEqual(start, START + timedelta(hours=2))
+        self.assertNotEqual(other, node)
+
+    def test_unknown_shape(self):
+        """Shapes which are not cached and other strategies miss."""
+        timetable = _timetable([300, 100, 50, 300])
+        self.cache.precompute(self._scheduler(), timetable, SHAPES)
+        self.assertIsNone(
+            self.cache.lookup(timetable, "TemporalShifting", 3, ["jinx"], None)
+        )
+        self.assertIsNone(
+            self.cache.lookup(timetable, "CarbonAgnosticFifo", 1, ["jinx"], None)
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
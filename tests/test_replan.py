@@ -0,0 +1,201 @@
+"""Re-planning"""
+
+from datetime import datetime, timedelta
+import unittest
+
+from src.sched import replan as mut  # module-under-test
+from src.sched.scheduler import Scheduler, TemporalShifting
+from src.sched.windows import gci_array
+from tests.helpers import CLUSTER_PATH, gci_data, hourly_timetable, META_PATH, START
+
+NOW = START - timedelta(minutes=30)
+
+
+class TestReplan(unittest.TestCase):
+    """Test moving pending jobs after forecast updates."""
+
+    def setUp(self):
+        self.timetable = hourly_timetable([100, 100, 300, 300, 300, 300])
+        self.scheduler = Scheduler(
+            strategy=TemporalShifting(meta_path=META_PATH), cluster_info=CLUSTER_PATH
+        )
+
+    def _schedule(self, job_id: str, **kwargs) -> tuple[datetime, str]:
+        return self.scheduler.schedule_sbatch(
+            timetable=self.timetable,
+            job_id=job_id,
+            hours=2,
+            partitions=["jinx"],
+            **kwargs,
+        )
+
+    def test_move(self):
+        """Jobs move to the new cheapest window on the same node."""
+        start, node = self._schedule("1")
+        self.assertEqual(start, START)
+        old_gcis = gci_array(self.timetable.timeslots)
+        self.timetable.update_gci(gci_data([300, 300, 300, 300, 50, 50]))
+        moves = mut.replan(self.timetable, old_gcis, NOW, self.scheduler.strategy)
+        self.assertEqual(moves, {"1": START + timedelta(hours=4)})
+        slots = self.timetable.get_job_slots("1")
+        self.assertEqual(
+            [slot.start for slot in slots], [START + timedelta(hours=i) for i in [4, 5]]
+        )
+        self.assertEqual(slots[0].get_reservation("1")["node"], node)
+
+    def test_threshold(self):
+        """Jobs whose window cost barely changed are not moved."""
+        self._schedule("1")
+        old_gcis = gci_array(self.timetable.timeslots)
+        self.timetable.update_gci(gci_data([105, 105, 300, 300, 50, 50]))
+        self.assertEqual(
+            mut.replan(
+                self.timetable, old_gcis, NOW, self.scheduler.strategy, threshold=0.1
+            ),
+            {},
+        )
+        self.assertEqual(self.timetable.get_job_slots("1")[0].start, START)
+
+    def test_deadline(self):
+        """Jobs are not moved beyond their deadline."""
+        self._schedule("1", deadline=START + timedelta(hours=4))
+        old_gcis = gci_array(self.timetable.timeslots)
+        self.timetable.update_gci(gci_data([300, 300, 200, 200, 50, 50]))
+        moves = mut.replan(self.timetable, old_gcis, NOW, self.scheduler.strategy)
+        self.assertEqual(moves, {"1": START + timedelta(hours=2)})
+
+    def test_power_cap(self):
+        """Jobs are not moved into windows which would exceed the power cap."""
+        self.scheduler.strategy.power_cap = 1000
+        self._schedule("1")
+        power = self.timetable.timeslots[0].get_reservation("1")["power"]
+        for slot in self.timetable.timeslots[4:]:
+            slot.allocate_node_exclusive("2", "gx03", slot.start, slot.end)
+            slot.get_reservation("2").update({"power": 1000 - power / 2})
+        old_gcis = gci_array(self.timetable.timeslots)
+        self.timetable.update_gci(gci_data([300, 300, 200, 200, 50, 50]))
+        moves = mut.replan(self.timetable, old_gcis, NOW, self.scheduler.strategy)
+        self.assertEqual(moves, {"1": START + timedelta(hours=2)})
+        reservation = self.timetable.timeslots[2].get_reservation("1")
+        self.assertEqual(reservation["power"], power)
+
+    def test_node_power(self):
+        """Jobs without planned power draw the TDP of their nodes under the cap."""
+        self._schedule("1")
+        for slot in self.timetable.get_job_slots("1"):
+            del slot.get_reservation("1")["power"]
+        # There is room for 100 W besides the other job, cx16 draws 125 W
+        for slot in self.timetable.timeslots[4:]:
+            slot.allocate_node_exclusive("2", "gx03", slot.start, slot.end)
+            slot.get_reservation("2").update({"power": 900})
+        self.scheduler.strategy.power_cap = 1000
+        old_gcis = gci_array(self.timetable.timeslots)
+        self.timetable.update_gci(gci_data([300, 300, 200, 200, 50, 50]))
+        moves = mut.replan(self.timetable, old_gcis, NOW, self.scheduler.strategy)
+        self.assertEqual(moves, {"1": START + timedelta(hours=2)})
+
+    def test_started(self):
+        """Jobs which already started stay."""
+        self._schedule("1")
+        old_gcis = gci_array(self.timetable.timeslots)
+        self.timetable.update_gci(gci_data([300, 300, 300, 300, 50, 50]))
+        later = START + timedelta(minutes=10)
+        self.assertEqual(
+            mut.replan(self.timetable, old_gcis, later, self.scheduler.strategy), {}
+        )
+
+
+class TestReplaceNodes(unittest.TestCase):
+    """Test placing jobs again after nodes failed."""
+
+    def setUp(self):
+        self.timetable = hourly_timetable([100, 100, 300, 300, 300, 300])
+        self.scheduler = Scheduler(
+            strategy=TemporalShifting(meta_path=META_PATH), cluster_info=CLUSTER_PATH
+        )
+
+    def test_node_index(self):
+        """The index holds the timeslots of each job per node."""
+        self.scheduler.schedule_sbatch(
+            timetable=self.timetable, job_id="1", hours=2, partitions=["jinx"]
+        )
+        self.assertEqual(mut.NodeIndex(self.timetable).nodes, {"cx16": {"1": [0, 1]}})
+
+    def test_replace(self):
+        """Jobs on a failed node move to other nodes and keep their request."""
+        for job_id in ["1", "2"]:
+            self.scheduler.schedule_sbatch(
+                timetable=self.timetable, job_id=job_id, hours=2, partitions=["jinx"]
+            )
+        index = mut.NodeIndex(self.timetable)
+        self.assertEqual(set(index.nodes), {"cx16", "cx17"})
+        placements = mut.replace_nodes(
+            self.scheduler, self.timetable, ["cx16"], NOW, index=index
+        )
+        self.assertEqual(list(placements), ["1"])
+        start, node = placements["1"]
+        self.assertEqual((start, node), (START, "gx03"))
+        reservation = self.timetable.timeslots[0].get_reservation("1")
+        self.assertEqual(reservation["partitions"], ["jinx"])
+        # The index was kept up to date
+        self.assertEqual(index.nodes, mut.NodeIndex(self.timetable).nodes)
+        self.assertEqual(index.jobs("cx16"), {})
+
+    def test_power_profile(self):
+        """Jobs keep their power profile on the other node."""
+        self.scheduler.schedule_sbatch(
+            timetable=self.timetable,
+            job_id="1",
+            hours=2,
+            partitions=["jinx"],
+            power_profile=[300.0, 100.0],
+        )
+        placements = mut.replace_nodes(self.scheduler, self.timetable, ["cx16"], NOW)
+        self.assertNotEqual(placements["1"][1], "cx16")
+        self.assertEqual(
+            [
+                slot.get_reservation("1")["power"]
+                for slot in self.timetable.get_job_slots("1")
+            ],
+            [300.0, 100.0],
+        )
+
+    def test_running_job(self):
+        """Jobs which already started are left to Slurm."""
+        self.scheduler.schedule_sbatch(
+            timetable=self.timetable, job_id="1", hours=2, partitions=["jinx"]
+        )
+        placements = mut.replace_nodes(
+            self.scheduler, self.timetable, ["cx16"], START + timedelta(minutes=30)
+        )
+        self.assertEqual(placements, {})
+        self.assertEqual(len(self.timetable.get_job_slots("1")), 2)
+
+    def test_no_fit(self):
+        """Jobs which do not fit on other nodes keep their reservation."""
+        slot = self.timetable.timeslots[0]
+        slot.reserved_resources.update(
+            {
+                "r": {
+                    "start": slot.start.isoformat(),
+                    "end": slot.end.isoformat(),
+                    "node": "cx16",
+                }
+            }
+        )
+        slot.jobs.update({"1": "r"})
+        # Without stored partitions, the partitions of the failed node are used
+        placements = mut.replace_nodes(
+            self.scheduler,
+            self.timetable,
+            ["cx16", "cx17", "gx03"],
+            NOW,
+            node_partitions={"cx16": ["jinx"]},
+        )
+        self.assertEqual(placements, {"1": None})
+        self.assertEqual(self.timetable.get_job_slots("1"), [slot])
+        self.assertEqual(slot.get_reservation("1")["node"], "cx16")
+
+
+if __name__ == "__main__":
+    unittest.main()
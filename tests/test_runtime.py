@@ -0,0 +1,92 @@
+"""Runtime prediction"""
+
+from datetime import datetime, UTC
+import os
+from pathlib import Path
+from tempfile import TemporaryDirectory
+import time
+import unittest
+from unittest.mock import patch
+
+from src.cluster.commons import parse_sacct, sacct
+from src.forecasting import runtime as mut  # module-under-test
+
+SACCT_OUTPUT = """1|alice|train|04:00:00|01:10:00|2024-01-01T10:00:00
+2|alice|train|04:00:00|01:30:00|2024-01-02T10:00:00
+3|alice|train|04:00:00|01:20:00|2024-01-03T10:00:00
+4|alice|train|1-00:00:00|20:00:00|2024-01-03T12:00:00
+5|bob|sim|UNLIMITED|01:00:00|2024-01-03T12:00:00
+"""
+
+
+class TestRuntimePredictor(unittest.TestCase):
+    """Test predicting the runtime of jobs."""
+
+    def setUp(self):
+        self.tmp_dir = TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.path = Path(self.tmp_dir.name) / "history.json"
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_parse_sacct(self):
+        """Jobs without a time limit are skipped."""
+        records = parse_sacct(SACCT_OUTPUT)
+        self.assertEqual(len(records), 4)
+        self.assertEqual(records[0]["job_id"], "1")
+        self.assertEqual(records[0]["timelimit"], 4 * 3600)
+        self.assertEqual(records[3]["timelimit"], 24 * 3600)
+        self.assertEqual(records[3]["elapsed"], 20 * 3600)
+
+    def test_predict(self):
+        """Reserve the quantile of past runtimes plus margin."""
+        predictor = mut.RuntimePredictor(path=self.path, margin=0.2)
+        predictor.update(parse_sacct(SACCT_OUTPUT))
+        # Read history from disk
+        predictor = mut.RuntimePredictor(path=self.path, margin=0.2)
+        self.assertEqual(predictor.predict("alice", "train", 4), 2)
+        # Too few samples
+        self.assertEqual(predictor.predict("alice", "train", 24), 24)
+        self.assertEqual(predictor.predict("bob", "sim", 3), 3)
+
+    def test_duplicates(self):
+        """Jobs which the last update fetched already are not counted twice."""
+        predictor = mut.RuntimePredictor(path=self.path)
+        self.assertEqual(predictor.update(parse_sacct(SACCT_OUTPUT)), 4)
+        self.assertEqual(predictor.update(parse_sacct(SACCT_OUTPUT)), 0)
+        predictor = mut.RuntimePredictor(path=self.path)
+        self.assertEqual(len(predictor._load()["jobs"]["alice|train|4"]), 3)
+        self.assertEqual(list(self.path.parent.iterdir()), [self.path])
+
+    def test_sacct_local_time(self):
+        """The start of the query is passed to sacct in local time."""
+        start = datetime(2024, 1, 1, 12, tzinfo=UTC)
+        with patch.dict(os.environ, {"TZ": "Europe/Berlin"}):
+            time.tzset()
+            with patch("src.cluster.commons.check_output", return_value=b"") as output:
+                sacct(start)
+        time.tzset()
+        self.assertIn("--starttime=2024-01-01T13:00:00", output.call_args.args[0])
+
+    def test_never_longer_than_requested(self):
+        """The prediction is capped by the requested hours."""
+        predictor = mut.RuntimePredictor(path=self.path, margin=1.0, min_samples=1)
+        predictor.update(parse_sacct("6|carol|x|02:00:00|01:59:00|2024-01-01T10:00:00"))
+        self.assertEqual(predictor.predict("carol", "x", 2), 2)
+
+    def test_due(self):
+        """The history is only fetched from sacct again after `refresh_minutes`."""
+        predictor = mut.RuntimePredictor(path=self.path)
+        self.assertTrue(predictor.is_due())
+        with patch("src.forecasting.runtime.sacct", return_value=[]):
+            predictor.update()
+        self.assertFalse(mut.RuntimePredictor(path=self.path).is_due())
+        # Only explicit updates refresh the history
+        predictor = mut.RuntimePredictor(
+            path=self.path.with_name("other.json"), refresh_minutes=0
+        )
+        self.assertFalse(predictor.is_due())
+
+
+if __name__ == "__main__":
+    unittest.main()
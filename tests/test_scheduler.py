@@ -1,9 +1,15 @@
 """Squirrel scheduler"""
 
+from datetime import timedelta
+import json
 from pathlib import Path
+from tempfile import TemporaryDirectory
 import unittest
 
 from src.sched import scheduler as mut  # module-under-test
+from src.sched.timetable import Timetable
+from src.submit.interruptible import get_run_intervals
+from tests.helpers import CLUSTER_PATH, hourly_timetable, META_PATH, START
 
 
 class TestSlurmCommons(unittest.TestCase):
@@ -25,6 +31,21 @@ class TestSlurmCommons(unittest.TestCase):
         # Check if the result matches the expected nodes
         self.assertEqual(result, expected_result)
 
+    def test_get_nodes_unavailable(self):
+        """Drained and excluded nodes are skipped."""
+        cluster = json.loads(CLUSTER_PATH.read_text())
+        for node in cluster["nodes"]:
+            if node["name"] == "cx16":
+                node["state"] = ["IDLE", "DRAIN"]
+        with TemporaryDirectory() as tmp:
+            cluster_path = Path(tmp) / "cluster.json"
+            cluster_path.write_text(json.dumps(cluster))
+            obj = mut.Scheduler(
+                strategy=mut.CarbonAgnosticFifo(), cluster_info=cluster_path
+            )
+            result = obj._get_nodes(partitions=["jinx"], exclude_nodes=["gx03"])
+        self.assertEqual(result, ["cx17"])
+
     def test_get_nodes_insufficient_resources(self):
         """Test _get_nodes when requesting too many resources for the cluster."""
 
@@ -58,5 +79,705 @@ class TestSlurmCommons(unittest.TestCase):
         self.assertEqual(result, expected_result)
 
 
+class TestTimeConstraints(unittest.TestCase):
+    """Test earliest start and deadline constraints."""
+
+    def test_begin_after(self):
+        """Windows must not start before the earliest start."""
+        obj = mut.Scheduler(
+            strategy=mut.CarbonAgnosticFifo(meta_path=META_PATH),
+            cluster_info=CLUSTER_PATH,
+        )
+        start, _ = obj.schedule_sbatch(
+            timetable=hourly_timetable([100] * 24),
+            job_id="1",
+            hours=2,
+            partitions=["jinx"],
+            begin_after=START + timedelta(hours=5, minutes=30),
+        )
+        self.assertEqual(start, START + timedelta(hours=6))
+
+    def test_deadline(self):
+        """The cheapest window after the deadline must not be chosen."""
+        obj = mut.Scheduler(
+            strategy=mut.TemporalShifting(meta_path=META_PATH),
+            cluster_info=CLUSTER_PATH,
+        )
+        gcis = [300, 200, 250, 300, 300, 10, 10, 300]
+        start, _ = obj.schedule_sbatch(
+            timetable=hourly_timetable(gcis),
+            job_id="1",
+            hours=2,
+            partitions=["jinx"],
+            deadline=START + timedelta(hours=4),
+        )
+        self.assertEqual(start, START + timedelta(hours=1))
+
+    def test_window_too_small(self):
+        """Constraints which leave no window raise an exception."""
+        obj = mut.Scheduler(
+            strategy=mut.CarbonAgnosticFifo(meta_path=META_PATH),
+            cluster_info=CLUSTER_PATH,
+        )
+        with self.assertRaises(mut.NoWindowAllocatedException):
+            obj.schedule_sbatch(
+                timetable=hourly_timetable([100] * 24),
+                job_id="1",
+                hours=3,
+                partitions=["jinx"],
+                begin_after=START + timedelta(hours=1),
+                deadline=START + timedelta(hours=3),
+            )
+
+
+class TestPowerProfile(unittest.TestCase):
+    """Test ranking windows with a power profile."""
+
+    def test_power_profile(self):
+        """The hour with high power draw is placed in the cheapest hour."""
+        obj = mut.Scheduler(
+            strategy=mut.TemporalShifting(meta_path=META_PATH),
+            cluster_info=CLUSTER_PATH,
+        )
+        gcis = [300, 100, 250, 250, 300, 300]
+        start, _ = obj.schedule_sbatch(
+            timetable=hourly_timetable(gcis),
+            job_id="1",
+            hours=2,
+            partitions=["jinx"],
+            power_profile=[10.0, 200.0],
+        )
+        self.assertEqual(start, START)
+
+
+class TestCoarseToFineSearch(unittest.TestCase):
+    """Test the coarse-to-fine window search for long horizons."""
+
+    def test_same_window_as_full_search(self):
+        """Block search finds the cheapest window of a week-long horizon."""
+        gcis = [300 + (i % 24) for i in range(168)]
+        gcis[100:104] = [50, 40, 45, 60]
+        results = []
+        for block_hours in [None, 6]:
+            obj = mut.Scheduler(
+                strategy=mut.TemporalShifting(
+                    block_hours=block_hours, meta_path=META_PATH
+                ),
+                cluster_info=CLUSTER_PATH,
+            )
+            results.append(
+                obj.schedule_sbatch(
+                    timetable=hourly_timetable(gcis),
+                    job_id="1",
+                    hours=3,
+                    partitions=["jinx"],
+                )
+            )
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(results[1][0], START + timedelta(hours=100))
+
+    def test_fallback_to_remaining_windows(self):
+        """If the promising blocks are booked, other windows are used."""
+        gcis = [300] * 48
+        gcis[6:12] = [10] * 6
+        timetable = hourly_timetable(gcis)
+        for slot in timetable.timeslots[7:12:2]:
+            for node in ["cx16", "cx17", "gx03"]:
+                slot.allocate_node_exclusive(
+                    f"other-{node}", node, slot.start, slot.end
+                )
+        obj = mut.Scheduler(
+            strategy=mut.SpatiotemporalShifting(
+                block_hours=6, num_blocks=1, meta_path=META_PATH
+            ),
+            cluster_info=CLUSTER_PATH,
+        )
+        start, _ = obj.schedule_sbatch(
+            timetable=timetable, job_id="1", hours=2, partitions=["jinx"]
+        )
+        # Windows in the cheap block collide with reservations,
+        # so the best window is found in the fallback stage.
+        self.assertEqual(start, START + timedelta(hours=5))
+
+    def test_blocks_of_shorter_timeslots(self):
+        """Blocks span `block_hours` also with timeslots shorter than an hour."""
+        gcis = [300] * 48
+        gcis[30:36] = [10] * 6
+        timetable = hourly_timetable(gcis, slot_minutes=30)
+        stages = list(
+            mut._search_stages(
+                timetable.timeslots, 4, ["cx16"], 6, 1, timetable.slot_minutes
+            )
+        )
+        # The first stage holds the 12 starts of the cheap block of 6 hours
+        self.assertEqual(stages[0].tolist(), list(range(60, 72)))
+
+
+class TestHorizonExtension(unittest.TestCase):
+    """Test extending the timetable on demand for long jobs."""
+
+    def test_extend_for_long_job(self):
+        """Only the missing hours are appended to the timetable."""
+        obj = mut.Scheduler(
+            strategy=mut.CarbonAgnosticFifo(meta_path=META_PATH),
+            cluster_info=CLUSTER_PATH,
+            max_horizon_hours=72,
+        )
+        timetable = hourly_timetable([100 + i for i in range(48)])
+        start, _ = obj.schedule_sbatch(
+            timetable=timetable, job_id="1", hours=60, partitions=["jinx"]
+        )
+        self.assertEqual(start, START)
+        self.assertEqual(len(timetable.timeslots), 60)
+        # Seasonal repetition of the past days
+        self.assertEqual(timetable.timeslots[50].gci, (102 + 126) / 2)
+
+    def test_begin_after_end(self):
+        """The gap between the timetable and `begin_after` is covered as well."""
+        obj = mut.Scheduler(
+            strategy=mut.CarbonAgnosticFifo(meta_path=META_PATH),
+            cluster_info=CLUSTER_PATH,
+            max_horizon_hours=72,
+        )
+        timetable = hourly_timetable([100] * 24)
+        start, _ = obj.schedule_sbatch(
+            timetable=timetable,
+            job_id="1",
+            hours=2,
+            partitions=["jinx"],
+            begin_after=START + timedelta(hours=30),
+        )
+        self.assertEqual(start, START + timedelta(hours=30))
+        self.assertEqual(len(timetable.timeslots), 32)
+
+    def test_job_too_long(self):
+        """Jobs exceeding the maximum horizon are rejected."""
+        obj = mut.Scheduler(
+            strategy=mut.CarbonAgnosticFifo(meta_path=META_PATH),
+            cluster_info=CLUSTER_PATH,
+            max_horizon_hours=36,
+        )
+        with self.assertRaises(mut.JobTooLongException):
+            obj.schedule_sbatch(
+                timetable=hourly_timetable([100] * 24),
+                job_id="1",
+                hours=48,
+                partitions=["jinx"],
+            )
+
+
+class TestSharedNodes(unittest.TestCase):
+    """Test packing jobs onto shared nodes."""
+
+    def test_pack_gpu_jobs(self):
+        """Two 1-GPU jobs share a 2-GPU node, a third one has to wait."""
+        obj = mut.Scheduler(
+            strategy=mut.CarbonAgnosticFifo(meta_path=META_PATH),
+            cluster_info=CLUSTER_PATH,
+        )
+        timetable = hourly_timetable([100] * 24)
+        results = [
+            obj.schedule_sbatch(
+                timetable=timetable,
+                job_id=str(i),
+                hours=2,
+                partitions=["sorcery"],
+                num_gpus=1,
+                shared=True,
+                num_cpus=8,
+            )
+            for i in range(3)
+        ]
+        self.assertEqual(results[0], (START, "gx03"))
+        self.assertEqual(results[1], (START, "gx03"))
+        self.assertEqual(results[2], (START + timedelta(hours=2), "gx03"))
+        gpu_ids = [
+            timetable.timeslots[0].get_reservation(str(i)).get("gpu_ids")
+            for i in range(2)
+        ]
+        self.assertEqual(gpu_ids, [[0], [1]])
+
+    def test_exclusive_blocks_shared(self):
+        """Exclusive reservations are not shared."""
+        obj = mut.Scheduler(
+            strategy=mut.CarbonAgnosticFifo(meta_path=META_PATH),
+            cluster_info=CLUSTER_PATH,
+        )
+        timetable = hourly_timetable([100] * 24)
+        obj.schedule_sbatch(
+            timetable=timetable, job_id="1", hours=1, partitions=["sorcery"]
+        )
+        start, _ = obj.schedule_sbatch(
+            timetable=timetable,
+            job_id="2",
+            hours=1,
+            partitions=["sorcery"],
+            shared=True,
+        )
+        self.assertEqual(start, START + timedelta(hours=1))
+
+    def test_best_fit(self):
+        """With best fit, shared jobs fill the node with the fewest free CPUs."""
+        timetable = hourly_timetable([100] * 24)
+        for slot in timetable.timeslots:
+            slot.allocate_node_shared(
+                "other",
+                "cx17",
+                slot.start,
+                slot.end,
+                demand={"cpus": 240, "memory": 0, "gpus": 0},
+                capacity={"cpus": 256, "memory": 0, "gpus": 0},
+            )
+        nodes = []
+        for best_fit in [False, True]:
+            strategy = mut.CarbonAgnosticFifo(meta_path=META_PATH)
+            strategy.best_fit = best_fit
+            obj = mut.Scheduler(strategy=strategy, cluster_info=CLUSTER_PATH)
+            _, node = obj.schedule_sbatch(
+                timetable=timetable,
+                job_id=str(best_fit),
+                hours=1,
+                partitions=["jinx"],
+                shared=True,
+                num_cpus=8,
+            )
+            nodes.append(node)
+        self.assertEqual(nodes, ["cx16", "cx17"])
+
+    def test_shared_gang(self):
+        """Jobs on multiple nodes cannot share them."""
+        obj = mut.Scheduler(
+            strategy=mut.CarbonAgnosticFifo(meta_path=META_PATH),
+            cluster_info=CLUSTER_PATH,
+        )
+        with self.assertRaises(ValueError):
+            obj.schedule_sbatch(
+                timetable=hourly_timetable([100] * 24),
+                job_id="1",
+                hours=1,
+                partitions=["jinx"],
+                shared=True,
+                num_nodes=2,
+            )
+
+    def test_demand_exceeds_capacity(self):
+        """Nodes which are too small for the demand are not considered."""
+        obj = mut.Scheduler(
+            strategy=mut.CarbonAgnosticFifo(meta_path=META_PATH),
+            cluster_info=CLUSTER_PATH,
+        )
+        with self.assertRaises(mut.NoSuitableNodeException):
+            obj.schedule_sbatch(
+                timetable=hourly_timetable([100] * 24),
+                job_id="1",
+                hours=1,
+                partitions=["sorcery"],
+                shared=True,
+                num_cpus=64,
+            )
+
+
+class TestInterruptible(unittest.TestCase):
+    """Test scheduling interruptible jobs."""
+
+    def test_cheapest_hours(self):
+        """The cheapest free hours are reserved, even if not consecutive."""
+        obj = mut.Scheduler(
+            strategy=mut.InterruptibleShifting(meta_path=META_PATH),
+            cluster_info=CLUSTER_PATH,
+        )
+        gcis = [300, 10, 300, 20, 30, 300, 5, 300]
+        timetable = hourly_timetable(gcis)
+        slot = timetable.timeslots[6]
+        for node in ["cx16", "cx17"]:
+            slot.allocate_node_exclusive(f"other-{node}", node, slot.start, slot.end)
+        start, node = obj.schedule_sbatch(
+            timetable=timetable, job_id="1", hours=3, partitions=["magic"]
+        )
+        self.assertEqual((start, node), (START + timedelta(hours=1), "cx16"))
+        self.assertEqual(
+            [ts.start for ts in timetable.get_job_slots("1")],
+            [START + timedelta(hours=h) for h in [1, 3, 4]],
+        )
+        intervals = get_run_intervals(timetable, "1")
+        self.assertEqual(
+            intervals,
+            [
+                (START + timedelta(hours=1), START + timedelta(hours=2)),
+                (START + timedelta(hours=3), START + timedelta(hours=5)),
+            ],
+        )
+
+
+class TestGangAllocation(unittest.TestCase):
+    """Test allocating multiple nodes for the same window."""
+
+    def test_lowest_tdp_nodes(self):
+        """Nodes with the lowest TDP are chosen in the cheapest window."""
+        obj = mut.Scheduler(
+            strategy=mut.TemporalShifting(meta_path=META_PATH),
+            cluster_info=CLUSTER_PATH,
+        )
+        timetable = hourly_timetable([300, 100, 100, 300, 50, 50])
+        slot = timetable.timeslots[4]
+        slot.allocate_node_exclusive("other", "cx16", slot.start, slot.end)
+        start, hostlist = obj.schedule_sbatch(
+            timetable=timetable,
+            job_id="1",
+            hours=2,
+            partitions=["jinx"],
+            num_nodes=2,
+        )
+        # 150 * (125 + 180) is lower than 100 * (180 + 225) and 200 * (125 + 180)
+        self.assertEqual((start, hostlist), (START + timedelta(hours=4), "cx17,gx03"))
+        self.assertEqual(
+            timetable.timeslots[4].get_reservation("1").get("nodes"),
+            ["gx03", "cx17"],
+        )
+
+    def test_many_nodes(self):
+        """Gangs are found on large partitions."""
+        strategy = mut.CarbonAgnosticFifo(meta_path=META_PATH)
+        nodes = [f"n{i:04d}" for i in range(1000)]
+        timetable = hourly_timetable([100 + i % 24 for i in range(168)])
+        for slot in timetable.timeslots[:100]:
+            slot.allocate_nodes_exclusive("other", nodes[::2], slot.start, slot.end)
+        window, gang = strategy.allocate_gang(
+            job_id="1",
+            hours=24,
+            timetable=timetable,
+            nodes=nodes,
+            uses_gpu=False,
+            num_nodes=64,
+        )
+        self.assertEqual(len(window), 24)
+        self.assertEqual(len(set(gang)), 64)
+        self.assertEqual(window[0].start, START)
+        self.assertTrue(all(int(node[1:]) % 2 == 1 for node in gang))
+
+    def test_not_enough_nodes(self):
+        """Gangs larger than the partition are rejected."""
+        obj = mut.Scheduler(
+            strategy=mut.TemporalShifting(meta_path=META_PATH),
+            cluster_info=CLUSTER_PATH,
+        )
+        with self.assertRaises(mut.NoSuitableNodeException):
+            obj.schedule_sbatch(
+                timetable=hourly_timetable([100] * 24),
+                job_id="1",
+                hours=2,
+                partitions=["magic"],
+                num_nodes=3,
+            )
+
+
+class TestPlan(unittest.TestCase):
+    """Test previewing placements."""
+
+    def test_top_k(self):
+        """Candidates are distinct and the timetable stays unchanged."""
+        obj = mut.Scheduler(
+            strategy=mut.SpatiotemporalShifting(meta_path=META_PATH),
+            cluster_info=CLUSTER_PATH,
+        )
+        timetable = hourly_timetable([300, 100, 100, 300, 50, 50])
+        candidates = obj.plan(timetable=timetable, hours=2, partitions=["jinx"], k=4)
+        self.assertEqual(len(candidates), 4)
+        self.assertEqual(candidates[0]["start"], START + timedelta(hours=4))
+        placements = {(c["start"], c["node"]) for c in candidates}
+        self.assertEqual(len(placements), 4)
+        self.assertLessEqual(candidates[0]["footprint"], candidates[-1]["footprint"])
+        for timeslot in timetable.timeslots:
+            self.assertEqual(timeslot.reserved_resources, {})
+
+    def test_fewer_candidates(self):
+        """Planning stops when the snapshot is full."""
+        obj = mut.Scheduler(
+            strategy=mut.TemporalShifting(meta_path=META_PATH),
+            cluster_info=CLUSTER_PATH,
+        )
+        candidates = obj.plan(
+            timetable=hourly_timetable([100, 200]), hours=2, partitions=["jinx"], k=10
+        )
+        self.assertEqual(len(candidates), 3)
+
+
+class TestBackfill(unittest.TestCase):
+    """Test packing short jobs into gaps."""
+
+    def _strategy(self, tolerance: float) -> mut.BackfillShifting:
+        return mut.BackfillShifting(tolerance=tolerance, meta_path=META_PATH)
+
+    def _timetable(self, gcis: list[float]) -> Timetable:
+        timetable = hourly_timetable(gcis)
+        # Node a has a gap of 2 hours between reservations
+        for slot in timetable.timeslots[:2] + timetable.timeslots[4:]:
+            slot.allocate_node_exclusive("other", "a", slot.start, slot.end)
+        return timetable
+
+    def test_fill_gap(self):
+        """Short jobs go into the tight gap instead of a long free run."""
+        timetable = self._timetable([100] * 8)
+        window, node = self._strategy(0.1).allocate_resources(
+            job_id="1", hours=2, timetable=timetable, nodes=["b", "a"], uses_gpu=False
+        )
+        self.assertEqual((window[0].start, node), (START + timedelta(hours=2), "a"))
+
+    def test_tolerance(self):
+        """Gaps which are not green enough are not used."""
+        gcis = [100, 100, 120, 120, 100, 100, 100, 100]
+        window, node = self._strategy(0.1).allocate_resources(
+            job_id="1",
+            hours=2,
+            timetable=self._timetable(gcis),
+            nodes=["b", "a"],
+            uses_gpu=False,
+        )
+        self.assertEqual(node, "b")
+        self.assertIn(window[0].start, [START, START + timedelta(hours=6)])
+        window, node = self._strategy(0.25).allocate_resources(
+            job_id="1",
+            hours=2,
+            timetable=self._timetable(gcis),
+            nodes=["b", "a"],
+            uses_gpu=False,
+        )
+        self.assertEqual((window[0].start, node), (START + timedelta(hours=2), "a"))
+
+
+class TestSubHourSlots(unittest.TestCase):
+    """Test timeslots shorter than an hour."""
+
+    def _timetable(self, gcis: list[float]) -> Timetable:
+        return hourly_timetable(gcis, slot_minutes=15)
+
+    def test_interpolation(self):
+        """Hourly GCI is interpolated between the centers of the hours."""
+        timetable = self._timetable([100, 200])
+        self.assertEqual(len(timetable.timeslots), 8)
+        self.assertEqual(timetable.timeslots[1].end, START + timedelta(minutes=30))
+        self.assertEqual(
+            [ts.gci for ts in timetable.timeslots],
+            [100, 100, 112.5, 137.5, 162.5, 187.5, 200, 200],
+        )
+
+    def test_minute_reservation(self):
+        """Short jobs occupy whole timeslots, including the last one."""
+        obj = mut.Scheduler(
+            strategy=mut.TemporalShifting(meta_path=META_PATH),
+            cluster_info=CLUSTER_PATH,
+        )
+        timetable = self._timetable([300, 100, 300])
+        start, node = obj.schedule_sbatch(
+            timetable=timetable, job_id="1", hours=20 / 60, partitions=["jinx"]
+        )
+        self.assertEqual(start, START + timedelta(minutes=75))
+        slots = timetable.get_job_slots("1")
+        self.assertEqual(len(slots), 2)
+        self.assertEqual(
+            slots[-1].get_reservation("1")["end"],
+            (START + timedelta(minutes=105)).isoformat(),
+        )
+        # Quarter-hour jobs only occupy a single timeslot
+        start, _ = obj.schedule_sbatch(
+            timetable=timetable, job_id="2", hours=0.25, partitions=["jinx"]
+        )
+        # Both timeslots have a GCI of 125
+        self.assertIn(start, [START + timedelta(minutes=m) for m in [75, 90]])
+        self.assertEqual(len(timetable.get_job_slots("2")), 1)
+
+
+class TestPowerCap(unittest.TestCase):
+    """Test the facility power cap."""
+
+    def _scheduler(self, power_cap: float | None) -> mut.Scheduler:
+        strategy = mut.TemporalShifting(meta_path=META_PATH)
+        strategy.power_cap = power_cap
+        return mut.Scheduler(strategy=strategy, cluster_info=CLUSTER_PATH)
+
+    def test_planned_power(self):
+        """The power of jobs is kept with their reservations."""
+        timetable = hourly_timetable([100, 300])
+        self._scheduler(None).schedule_sbatch(
+            timetable=timetable, job_id="1", hours=1, partitions=["jinx"]
+        )
+        self._scheduler(None).schedule_sbatch(
+            timetable=timetable, job_id="2", hours=1, partitions=["jinx"]
+        )
+        # Both jobs run in the cheap hour on cx16 (125 W) and cx17 (225 W)
+        self.assertEqual(timetable.timeslots[0].get_planned_power(), 350)
+        self.assertEqual(timetable.timeslots[1].get_planned_power(), 0)
+
+    def test_cap(self):
+        """Windows which would exceed the cap are rejected."""
+        timetable = hourly_timetable([100, 300])
+        obj = self._scheduler(power_cap=200)
+        start, _ = obj.schedule_sbatch(
+            timetable=timetable, job_id="1", hours=1, partitions=["jinx"]
+        )
+        self.assertEqual(start, START)
+        start, node = obj.schedule_sbatch(
+            timetable=timetable, job_id="2", hours=1, partitions=["jinx"]
+        )
+        self.assertEqual(start, START + timedelta(hours=1))
+        self.assertEqual(node, "cx16")
+        with self.assertRaises(mut.NoWindowAllocatedException):
+            obj.schedule_sbatch(
+                timetable=timetable,
+                job_id="3",
+                hours=1,
+                partitions=["jinx"],
+                power_profile=[150],
+            )
+
+
+class TestParetoFrontier(unittest.TestCase):
+    """Test the frontier of delay and footprint."""
+
+    def setUp(self):
+        self.obj = mut.Scheduler(
+            strategy=mut.TemporalShifting(meta_path=META_PATH),
+            cluster_info=CLUSTER_PATH,
+        )
+
+    def test_frontier(self):
+        """Each later start on the frontier is greener."""
+        timetable = hourly_timetable([300, 200, 250, 100, 150, 50])
+        frontier = self.obj.pareto_frontier(
+            timetable=timetable, hours=1, partitions=["jinx"]
+        )
+        self.assertEqual(
+            [point["start"] for point in frontier],
+            [START + timedelta(hours=i) for i in [0, 1, 3, 5]],
+        )
+        # cx16 has the lowest TDP (125 W)
+        self.assertEqual({point["node"] for point in frontier}, {"cx16"})
+        self.assertAlmostEqual(frontier[0]["footprint"], 300 * 0.125)
+        self.assertEqual(timetable.get_job_slots("plan-0"), [])
+
+    def test_busy_nodes(self):
+        """Busy nodes are skipped, the strategy is not needed."""
+        timetable = hourly_timetable([300, 100])
+        slot = timetable.timeslots[1]
+        slot.allocate_node_exclusive("other", "cx16", slot.start, slot.end)
+        frontier = self.obj.pareto_frontier(
+            timetable=timetable, hours=1, partitions=["jinx"]
+        )
+        self.assertEqual(
+            [(point["start"], point["node"]) for point in frontier],
+            [(START, "cx16"), (START + timedelta(hours=1), "gx03")],
+        )
+
+    def test_max_delay(self):
+        """A deadline limits the frontier."""
+        timetable = hourly_timetable([300, 200, 250, 100, 150, 50])
+        frontier = self.obj.pareto_frontier(
+            timetable=timetable,
+            hours=1,
+            partitions=["jinx"],
+            deadline=START + timedelta(hours=3),
+        )
+        self.assertEqual(len(frontier), 2)
+
+
+class TestNodeSpeed(unittest.TestCase):
+    """Test window lengths on nodes of different speed."""
+
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.meta_path = Path(self.tmp.name) / "meta.cfg"
+        self.meta_path.write_text(
+            META_PATH.read_text().replace(
+                "[nodes.cx17]\n", "[nodes.cx17]\nclass = fast\n"
+            )
+            + "\n[classes.fast]\nspeed = 2.0\n"
+        )
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_window_lengths(self):
+        """Nodes are grouped by the amount of timeslots a job occupies."""
+        strategy = mut.TemporalShifting(meta_path=self.meta_path)
+        self.assertEqual(
+            strategy.window_lengths(["cx16", "cx17", "gx03"], 150, 60),
+            {2: ["cx17"], 3: ["cx16", "gx03"]},
+        )
+        self.assertEqual(strategy.node_minutes("cx17", 150), 75)
+
+    def test_faster_node(self):
+        """The job runs for half the time on the fast node, which saves carbon."""
+        obj = mut.Scheduler(
+            strategy=mut.TemporalShifting(meta_path=self.meta_path),
+            cluster_info=CLUSTER_PATH,
+        )
+        timetable = hourly_timetable([100] * 6)
+        _, node = obj.schedule_sbatch(
+            timetable=timetable, job_id="job", hours=2, partitions=["jinx"]
+        )
+        self.assertEqual(node, "cx17")
+        self.assertEqual(len(timetable.get_job_slots("job")), 1)
+
+    def test_fifo_ends_first(self):
+        """Carbon-agnostic FIFO prefers the placement which ends first."""
+        obj = mut.Scheduler(
+            strategy=mut.CarbonAgnosticFifo(meta_path=self.meta_path),
+            cluster_info=CLUSTER_PATH,
+        )
+        timetable = hourly_timetable([100] * 6)
+        slot = timetable.timeslots[0]
+        slot.allocate_node_exclusive("other", "cx17", slot.start, slot.end)
+        start, node = obj.schedule_sbatch(
+            timetable=timetable, job_id="job", hours=4, partitions=["jinx"]
+        )
+        # cx17 ends after 1 + 2 hours, cx16 only after 4 hours
+        self.assertEqual((start, node), (START + timedelta(hours=1), "cx17"))
+
+    def test_start_before(self):
+        """Jobs on the fast node do not start later than the latest start."""
+        obj = mut.Scheduler(
+            strategy=mut.TemporalShifting(meta_path=self.meta_path),
+            cluster_info=CLUSTER_PATH,
+        )
+        start, _ = obj.schedule_sbatch(
+            timetable=hourly_timetable([300, 300, 300, 50, 50, 50]),
+            job_id="job",
+            hours=4,
+            partitions=["jinx"],
+            start_before=START + timedelta(hours=1),
+        )
+        self.assertLessEqual(start, START + timedelta(hours=1))
+
+    def test_pareto_frontier(self):
+        """The frontier evaluates the shorter windows of the fast node."""
+        obj = mut.Scheduler(
+            strategy=mut.TemporalShifting(meta_path=self.meta_path),
+            cluster_info=CLUSTER_PATH,
+        )
+        frontier = obj.pareto_frontier(
+            timetable=hourly_timetable([100] * 6), hours=2, partitions=["jinx"]
+        )
+        self.assertEqual(len(frontier), 1)
+        self.assertEqual(frontier[0]["node"], "cx17")
+        self.assertAlmostEqual(frontier[0]["footprint"], 100 * 0.225)
+
+    def test_group_without_tdp(self):
+        """Speed groups whose nodes have no TDP fall back to the blackbox nodes."""
+        self.meta_path.write_text(
+            self.meta_path.read_text().replace("[nodes.cx17.cpus]\nTDP = 225\n", "")
+        )
+        obj = mut.Scheduler(
+            strategy=mut.SpatiotemporalShifting(meta_path=self.meta_path),
+            cluster_info=CLUSTER_PATH,
+        )
+        timetable = hourly_timetable([100] * 6)
+        _, node = obj.schedule_sbatch(
+            timetable=timetable, job_id="job", hours=2, partitions=["jinx"]
+        )
+        self.assertEqual(
+            timetable.get_job_slots("job")[0].get_reservation("job")["node"], node
+        )
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -22,6 +22,28 @@ class TestSlurmCommons(unittest.TestCase):
         partitions = mut.get_partitions(path_to_json=path_to_json)
         assert len(partitions.keys()) == 3
 
+    def test_node_resources(self):
+        """Tests reading the capacity of nodes."""
+        path_to_json = Path("src") / "sim" / "data" / "3-node-cluster.json"
+        nodes = {node["name"]: node for node in mut.get_nodes(path_to_json)}
+        assert mut.get_node_resources(nodes["gx03"]) == {
+            "cpus": 48,
+            "memory": 512000,
+            "gpus": 2,
+        }
+        assert mut.get_node_resources(nodes["cx16"])["gpus"] == 0
+
+    def test_hostlist(self):
+        """Tests compressing node names into a hostlist expression."""
+        assert mut.to_hostlist(["gx01", "gx02", "gx03", "cx16"]) == "cx16,gx[01-03]"
+        assert mut.to_hostlist(["n001", "n002", "n010"]) == "n[001-002,010]"
+        assert mut.to_hostlist(["login"]) == "login"
+
+    def test_parse_job_id(self):
+        """Tests reading the job ID from the output of sbatch."""
+        assert mut.parse_job_id("Submitted batch job 4242\n") == "4242"
+        assert mut.parse_job_id("") is None
+
 
 if __name__ == "__main__":
     unittest.main()
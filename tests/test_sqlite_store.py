@@ -0,0 +1,121 @@
+"""SQLite schedule store"""
+
+from datetime import datetime, timedelta
+from pathlib import Path
+import sqlite3
+from tempfile import TemporaryDirectory
+import unittest
+
+from src.data import sqlite_store as mut  # module-under-test
+from src.data.timetable import read_schedule, tt_append, tt_to_csv
+from src.sched.timetable import Timetable
+from tests.helpers import gci_data, hourly_timetable, reserve, START
+
+
+class TestSqliteStore(unittest.TestCase):
+    """Test keeping the schedule in an SQLite database."""
+
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "schedule.db"
+        self.store = mut.SqliteStore(self.path)
+        self.timetable = hourly_timetable([100.0 + i for i in range(4)])
+        reserve(self.timetable, "1", 0, "cx16")
+        reserve(self.timetable, "1", 1, "cx16")
+        reserve(self.timetable, "2", 1, "cx17")
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp.cleanup()
+
+    def _load(self, since: datetime | None = None) -> Timetable:
+        timetable = Timetable()
+        self.store.load(timetable, since=since)
+        return timetable
+
+    def test_roundtrip(self):
+        """Timeslots and reservations are restored."""
+        self.assertTrue(self.store.is_empty())
+        self.store.write(self.timetable)
+        loaded = self._load()
+        self.assertEqual(
+            [(ts.start, ts.end, ts.gci) for ts in loaded.timeslots],
+            [(ts.start, ts.end, ts.gci) for ts in self.timetable.timeslots],
+        )
+        self.assertEqual(
+            [ts.reserved_resources for ts in loaded.timeslots],
+            [ts.reserved_resources for ts in self.timetable.timeslots],
+        )
+
+    def test_load_range(self):
+        """Only timeslots which end after `since` are loaded."""
+        self.store.write(self.timetable)
+        loaded = self._load(since=START + timedelta(hours=1))
+        self.assertEqual(loaded.timeslots[0].start, START + timedelta(hours=1))
+        self.assertEqual(len(loaded.get_job_slots("1")), 1)
+
+    def test_write_jobs(self):
+        """Reservations of jobs are replaced and new timeslots are added."""
+        self.store.write(self.timetable)
+        self.timetable.append_direct(gci_data([104.0], first=4))
+        self.timetable.remove_job("1")
+        reserve(self.timetable, "1", 4, "gx03")
+        self.store.write_jobs(self.timetable, ["1"])
+        loaded = self._load()
+        self.assertEqual(
+            [ts.start for ts in loaded.get_job_slots("1")],
+            [START + timedelta(hours=4)],
+        )
+        self.assertEqual(
+            [ts.start for ts in loaded.get_job_slots("2")],
+            [START + timedelta(hours=1)],
+        )
+        self.assertEqual(self.store.get_end(), START + timedelta(hours=5))
+
+    def test_load_plan(self):
+        """Timeslots are found by their start, reservations by their index."""
+        for query in [
+            mut.LOAD_SLOTS,
+            "SELECT slot_start, res_id, job_id, data FROM reservations "
+            "WHERE slot_start >= 0",
+        ]:
+            plan = self.store.connection.execute(
+                f"EXPLAIN QUERY PLAN {query}", {"after": 0}
+            ).fetchall()
+            self.assertTrue(all("SCAN" not in row[-1] for row in plan), plan)
+
+    def test_rollback(self):
+        """Errors in a transaction leave the schedule unchanged."""
+        self.store.write(self.timetable)
+        with self.assertRaises(RuntimeError):
+            with self.store.transaction():
+                self.timetable.remove_job("1")
+                self.store.write_jobs(self.timetable, ["1"])
+                raise RuntimeError()
+        self.assertEqual(len(self._load().get_job_slots("1")), 2)
+
+    def test_concurrent_transaction(self):
+        """Another process cannot write during a transaction."""
+        self.store.write(self.timetable)
+        other = mut.SqliteStore(self.path, timeout=0)
+        try:
+            with self.store.transaction():
+                with self.assertRaises(sqlite3.OperationalError):
+                    with other.transaction():
+                        pass
+        finally:
+            other.close()
+
+    def test_adapters(self):
+        """The schedule is kept in the database if its path names one."""
+        tt_to_csv(self.timetable, schedule_path=self.path)
+        reserve(self.timetable, "3", 2, "gx03")
+        tt_append(self.timetable, ["3"], schedule_path=self.path)
+        loaded = Timetable()
+        self.assertTrue(read_schedule(loaded, self.path))
+        self.assertEqual(len(loaded.get_job_slots("3")), 1)
+        self.assertFalse(self.path.with_suffix(".npz").exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+"""Timetable"""
+
+from datetime import timedelta
+import unittest
+
+from src.sched.timetable import Timetable
+from tests.helpers import rising_gci_data, START
+
+
+class RecordingTimetable(Timetable):
+    """Timetable with a forecast of one day from START, which records fetches."""
+
+    def __init__(self, slot_minutes: int = 60) -> None:
+        super().__init__(slot_minutes=slot_minutes)
+        self.fetches = []
+
+    def fetch_forecast(
+        self, start, forecast_days, lookback_days, options=None, since=None
+    ):
+        self.fetches.append(since)
+        first = int((since - START) / timedelta(hours=1))
+        return rising_gci_data(first, 24 - first)
+
+
+class TestForecastHorizon(unittest.TestCase):
+    """Test appending the missing hours of the forecast."""
+
+    def test_missing_since(self):
+        """The horizon is missing from the end of the latest timeslot on."""
+        timetable = Timetable()
+        self.assertEqual(timetable.missing_since(START, 1), START)
+        timetable.append_direct(rising_gci_data(0, 10))
+        self.assertEqual(timetable.missing_since(START, 1), START + timedelta(hours=10))
+        timetable.append_direct(rising_gci_data(10, 14))
+        self.assertIsNone(timetable.missing_since(START, 1))
+
+    def test_covered(self):
+        """Nothing is fetched if the timetable covers the horizon."""
+        timetable = RecordingTimetable()
+        timetable.append_direct(rising_gci_data(0, 24))
+        timetable.append_forecast(START, forecast_days=1, lookback_days=2)
+        self.assertEqual(timetable.fetches, [])
+
+    def test_tail(self):
+        """Only the missing hours are fetched and appended."""
+        timetable = RecordingTimetable()
+        timetable.append_direct(rising_gci_data(0, 20))
+        timetable.append_forecast(START, forecast_days=1, lookback_days=2)
+        self.assertEqual(timetable.fetches, [START + timedelta(hours=20)])
+        self.assertEqual(len(timetable.timeslots), 24)
+        self.assertEqual(timetable.get_latest().gci, 123.0)
+
+    def test_estimated(self):
+        """Estimated timeslots are refreshed with the forecast."""
+        timetable = RecordingTimetable()
+        timetable.append_direct(rising_gci_data(0, 20))
+        for timeslot in timetable.timeslots[16:]:
+            timeslot.set_gci(0.0)
+            timeslot.estimated = True
+        self.assertEqual(timetable.missing_since(START, 1), START + timedelta(hours=16))
+        timetable.append_forecast(START, forecast_days=1, lookback_days=2)
+        self.assertEqual(timetable.fetches, [START + timedelta(hours=16)])
+        self.assertEqual(
+            [ts.gci for ts in timetable.timeslots[15:]],
+            [100.0 + i for i in range(15, 24)],
+        )
+        self.assertFalse(any(ts.estimated for ts in timetable.timeslots))
+
+    def test_extend_horizon(self):
+        """Timeslots beyond the forecast are marked as estimated."""
+        timetable = Timetable()
+        timetable.append_direct(rising_gci_data(0, 24))
+        timetable.extend_horizon(num_slots=30, lookback_days=1)
+        self.assertEqual(
+            [ts.estimated for ts in timetable.timeslots], [False] * 24 + [True] * 6
+        )
+        self.assertEqual(timetable.missing_since(START, 2), START + timedelta(hours=24))
+
+    def test_tail_within_hour(self):
+        """Hourly data is split and continues timeslots which end within an hour."""
+        timetable = Timetable(slot_minutes=30)
+        timetable.append_direct(rising_gci_data(0, 2))
+        timetable.timeslots.pop()
+        timetable.append_tail(rising_gci_data(1, 2))
+        self.assertEqual(
+            [ts.start for ts in timetable.timeslots],
+            [START + timedelta(minutes=30 * i) for i in range(6)],
+        )
+
+    def test_gap(self):
+        """Data which does not continue the timetable is not dropped silently."""
+        timetable = Timetable()
+        timetable.append_direct(rising_gci_data(0, 2))
+        with self.assertRaises(ValueError):
+            timetable.append_tail(rising_gci_data(3, 2))
+        self.assertEqual(len(timetable.timeslots), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
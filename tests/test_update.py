@@ -0,0 +1,129 @@
+"""Concurrent updates of the schedule"""
+
+import fcntl
+from pathlib import Path
+from tempfile import TemporaryDirectory
+import unittest
+
+from src.data import timetable as mut  # module-under-test
+from src.data.lock import file_lock, lock_path
+from src.errors.scheduling import ScheduleConflictException
+from src.sched.timetable import Timetable
+from tests.helpers import gci_data, hourly_timetable, reserve, START
+
+
+class TestUpdate(unittest.TestCase):
+    """Test read-modify-write cycles of the schedule."""
+
+    schedule_name = "schedule.csv"
+
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.schedule_path = Path(self.tmp.name) / self.schedule_name
+        mut.tt_to_csv(hourly_timetable([100.0] * 4), schedule_path=self.schedule_path)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _update(self, update):
+        return mut.tt_update(
+            START, update, schedule_path=self.schedule_path, forecast=False
+        )
+
+    def _job_slots(self, job_id: str) -> int:
+        timetable = Timetable()
+        mut.read_schedule(timetable, self.schedule_path)
+        return len(timetable.get_job_slots(job_id))
+
+    def test_update(self):
+        """Changed jobs are written, and the version is counted."""
+        version = mut.tt_version(self.schedule_path)
+        self.assertEqual(self._update(lambda tt: reserve(tt, "1", 0, "cx16")), None)
+        self.assertEqual(self._job_slots("1"), 1)
+        self.assertEqual(mut.tt_version(self.schedule_path), version + 1)
+        self.assertEqual(
+            mut._load(START, self.schedule_path).stored_version, version + 1
+        )
+
+    def test_estimated(self):
+        """Estimated timeslots are stored, and so is the forecast replacing them."""
+        timetable = mut._load(START, self.schedule_path)
+        timetable.timeslots[-1].estimated = True
+        mut.tt_to_csv(timetable, schedule_path=self.schedule_path)
+        timetable = mut._load(START, self.schedule_path)
+        self.assertEqual(
+            [ts.estimated for ts in timetable.timeslots][-2:], [False, True]
+        )
+        timetable.append_tail(gci_data([50.0], first=3))
+        mut.tt_append(timetable, [], schedule_path=self.schedule_path)
+        timetable = mut._load(START, self.schedule_path)
+        self.assertFalse(timetable.timeslots[-1].estimated)
+        self.assertEqual(timetable.timeslots[-1].gci, 50.0)
+
+    def test_conflict(self):
+        """Only the update is repeated if another process wrote meanwhile."""
+        calls = []
+
+        def update(timetable: Timetable):
+            if not calls:
+                # Another submission reserves the same node
+                other = mut._load(START, self.schedule_path)
+                reserve(other, "2", 0, "cx16")
+                mut.tt_append(other, ["2"], schedule_path=self.schedule_path)
+            calls.append(timetable.timeslots[0].jobs.copy())
+            reserve(timetable, "1", 1, "cx16")
+
+        self._update(update)
+        self.assertEqual(len(calls), 2)
+        self.assertIn("2", calls[1])
+        self.assertEqual((self._job_slots("1"), self._job_slots("2")), (1, 1))
+
+    def test_commit_outdated(self):
+        """Changes are not committed over a newer version of the schedule."""
+        version = mut.tt_version(self.schedule_path)
+        timetable = mut._load(START, self.schedule_path)
+        reserve(timetable, "1", 0, "cx16")
+        other = mut._load(START, self.schedule_path)
+        reserve(other, "2", 0, "cx16")
+        self.assertTrue(mut.tt_commit(other, ["2"], self.schedule_path, version))
+        self.assertFalse(mut.tt_commit(timetable, ["1"], self.schedule_path, version))
+        self.assertEqual((self._job_slots("1"), self._job_slots("2")), (0, 1))
+
+    def test_give_up(self):
+        """Updates fail if the schedule keeps changing."""
+
+        def update(timetable: Timetable):
+            other = mut._load(START, self.schedule_path)
+            mut.tt_append(other, [], schedule_path=self.schedule_path)
+            reserve(timetable, "1", 1, "cx16")
+
+        with self.assertRaises(ScheduleConflictException):
+            self._update(update)
+        self.assertEqual(self._job_slots("1"), 0)
+
+
+class TestUpdateSqlite(TestUpdate):
+    """Test read-modify-write cycles of an SQLite schedule."""
+
+    schedule_name = "schedule.db"
+
+
+class TestFileLock(unittest.TestCase):
+    """Test locking the schedule file."""
+
+    def test_exclusive(self):
+        """Other processes cannot lock the schedule, this one can nest."""
+        with TemporaryDirectory() as tmp:
+            schedule_path = Path(tmp) / "schedule.csv"
+            with file_lock(schedule_path):
+                with file_lock(schedule_path):
+                    pass
+                with open(lock_path(schedule_path), encoding="utf-8") as other:
+                    with self.assertRaises(BlockingIOError):
+                        fcntl.flock(other.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            with open(lock_path(schedule_path), encoding="utf-8") as other:
+                fcntl.flock(other.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+"""Vectorized window computations"""
+
+import unittest
+
+import numpy as np
+
+from src.sched import windows as mut  # module-under-test
+
+
+class TestWindowCosts(unittest.TestCase):
+    """Test window cost computations."""
+
+    def test_gci_sum(self):
+        """Without power profile, the cost is the sum of GCI."""
+        gcis = np.array([1.0, 2.0, 3.0, 4.0])
+        np.testing.assert_allclose(mut.window_costs(gcis, 2), [3.0, 5.0, 7.0])
+        self.assertEqual(len(mut.window_costs(gcis, 5)), 0)
+
+    def test_power_profile(self):
+        """With power profile, the cost is the dot product for each start."""
+        gcis = np.array([1.0, 2.0, 3.0, 4.0])
+        np.testing.assert_allclose(
+            mut.window_costs(gcis, 2, [100.0, 10.0]), [120.0, 230.0, 340.0]
+        )
+
+    def test_long_power_profile(self):
+        """Correlation via FFT matches the direct computation."""
+        rng = np.random.default_rng(42)
+        gcis = rng.uniform(50, 500, 168)
+        profile = rng.uniform(0, 400, mut.FFT_MIN_LENGTH + 8)
+        expected = [
+            gcis[start : start + len(profile)] @ profile
+            for start in range(len(gcis) - len(profile) + 1)
+        ]
+        np.testing.assert_allclose(
+            mut.window_costs(gcis, len(profile), list(profile)), expected
+        )
+
+
+class TestFreeIntervals(unittest.TestCase):
+    """Test the free interval index."""
+
+    def test_intervals(self):
+        """Runs of free timeslots are found for each node."""
+        free = np.array(
+            [[True, True, False, True], [False, False, False, False]], dtype=bool
+        )
+        intervals = mut.free_intervals(free)
+        np.testing.assert_array_equal(intervals[0], [[0, 2], [3, 4]])
+        self.assertEqual(len(intervals[1]), 0)
+
+    def test_pareto_front(self):
+        """Starts which are cheaper than all earlier ones are kept."""
+        footprints = np.array([5.0, 6.0, 3.0, 3.0, np.inf, 1.0])
+        np.testing.assert_array_equal(mut.pareto_front(footprints), [0, 2, 5])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+"""Workflow submission"""
+
+import unittest
+
+from src.sched.scheduler import Scheduler, TemporalShifting
+from src.submit import workflow as mut  # module-under-test
+from tests.helpers import CLUSTER_PATH, hourly_timetable, META_PATH
+
+JOBS = [
+    {"name": "prep", "command": "", "runtime": 1, "partition": "jinx"},
+    {"name": "side", "command": "", "runtime": 1, "partition": "jinx"},
+    {
+        "name": "train",
+        "command": "",
+        "runtime": 3,
+        "partition": "jinx",
+        "after": ["prep"],
+    },
+    {
+        "name": "eval",
+        "command": "",
+        "runtime": 1,
+        "partition": "jinx",
+        "after": ["train", "side"],
+    },
+]
+
+
+class TestWorkflow(unittest.TestCase):
+    """Test planning workflows of dependent jobs."""
+
+    def test_critical_path_first(self):
+        """Jobs on the critical path are placed first."""
+        order = [job["name"] for job in mut.plan_order(JOBS)]
+        self.assertEqual(order, ["prep", "train", "side", "eval"])
+
+    def test_cycle(self):
+        """Workflows with cycles are rejected."""
+        jobs = [
+            {"name": "a", "runtime": 1, "after": ["b"]},
+            {"name": "b", "runtime": 1, "after": ["a"]},
+        ]
+        with self.assertRaises(ValueError):
+            mut.plan_order(jobs)
+
+    def test_precedence(self):
+        """Jobs start after the jobs they depend on have ended."""
+        timetable = hourly_timetable([300 - i for i in range(24)])
+        scheduler = Scheduler(
+            strategy=TemporalShifting(meta_path=META_PATH), cluster_info=CLUSTER_PATH
+        )
+        placements = mut.schedule_workflow(scheduler, timetable, JOBS)
+        for job in JOBS:
+            for parent in job.get("after", []):
+                self.assertGreaterEqual(
+                    placements[job["name"]]["start"], placements[parent]["end"]
+                )
+
+    def test_extend_horizon(self):
+        """The timetable is extended for the critical path before a job is placed."""
+        timetable = hourly_timetable([100] * 24)
+        scheduler = Scheduler(
+            strategy=TemporalShifting(meta_path=META_PATH),
+            cluster_info=CLUSTER_PATH,
+            max_horizon_hours=72,
+        )
+        jobs = [
+            {"name": "a", "command": "", "runtime": 20, "partition": "jinx"},
+            {
+                "name": "b",
+                "command": "",
+                "runtime": 10,
+                "partition": "jinx",
+                "after": ["a"],
+            },
+        ]
+        placements = mut.schedule_workflow(scheduler, timetable, jobs)
+        self.assertEqual(placements["b"]["start"], placements["a"]["end"])
+        self.assertEqual(len(timetable.timeslots), 30)
+
+
+class TestDependencies(unittest.TestCase):
+    """Test passing the dependencies of a workflow to Slurm."""
+
+    def test_dependency_option(self):
+        """Jobs wait for the Slurm job IDs of their parents."""
+        job = JOBS[3]
+        self.assertEqual(
+            mut._dependency_option(job, {"train": "12", "side": "13"}),
+            " --dependency=afterok:12:13",
+        )
+        self.assertEqual(mut._dependency_option(JOBS[0], {}), "")
+
+    def test_missing_job_id(self):
+        """Parents without a Slurm job ID are named in the error."""
+        with self.assertRaisesRegex(ValueError, "Job eval .* train"):
+            mut._dependency_option(JOBS[3], {"train": None, "side": "13"})
+
+
+if __name__ == "__main__":
+    unittest.main()